@@ -1,5 +1,26 @@
-from django.contrib import admin
-from .models import Customer, Product, Category, Supplier, StockMovement, Order, OrderItem, Warehouse, ProductLocation
+from django.contrib import admin, messages
+from django.db.models import Count, Q, F, Case, When, Value, ExpressionWrapper, IntegerField, FloatField
+from django.db.models.functions import Cast
+from .forms import StockMovementForm
+from .models import Customer, Product, Category, Supplier, StockMovement, Order, OrderItem, Warehouse, ProductLocation, OrderAllocation, BulkActionJob
+from .global_search import reindex_documents
+from .jobs import enqueue_bulk_action
+from .orders import transition_orders
+
+
+def run_bulk_action(modeladmin, request, queryset, action, done_message, params=None):
+    """Run a chunked bulk action and report whether it finished or was queued"""
+    job = enqueue_bulk_action(action, queryset, request.user, params)
+    if job.status == 'done':
+        modeladmin.message_user(request, done_message.format(count=job.total))
+        if job.message:
+            modeladmin.message_user(request, job.message, level=messages.WARNING)
+    elif job.status == 'failed':
+        modeladmin.message_user(request, f'Bulk action failed: {job.message}', level=messages.ERROR)
+    else:
+        modeladmin.message_user(request, f'{job.total} rows queued as bulk action job #{job.pk}; see Bulk action jobs for progress.')
+    return job
+
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
@@ -75,11 +96,17 @@ class CategoryAdmin(admin.ModelAdmin):
     ordering = ['name']
     readonly_fields = ('created_at',)
 
+    def get_queryset(self, request):
+        """Count active products in the changelist query instead of once per row"""
+        return super().get_queryset(request).annotate(
+            active_product_count=Count('products', filter=Q(products__is_active=True))
+        )
+
     def get_product_count(self, obj):
         """Display number of products in category"""
-        return obj.products.filter(is_active=True).count()
+        return obj.active_product_count
     get_product_count.short_description = 'Active Products'
-    get_product_count.admin_order_field = 'products__count'
+    get_product_count.admin_order_field = 'active_product_count'
 
 
 # ========================================================================
@@ -120,20 +147,31 @@ class SupplierAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
     actions = ['activate_suppliers', 'deactivate_suppliers']
 
+    def get_queryset(self, request):
+        """Count active products in the changelist query instead of once per row"""
+        return super().get_queryset(request).annotate(
+            active_product_count=Count('products', filter=Q(products__is_active=True))
+        )
+
     def get_product_count(self, obj):
         """Display number of active products from supplier"""
-        return obj.products.filter(is_active=True).count()
+        return obj.active_product_count
     get_product_count.short_description = 'Active Products'
+    get_product_count.admin_order_field = 'active_product_count'
 
     def activate_suppliers(self, request, queryset):
         """Activate selected suppliers"""
+        ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(is_active=True)
+        reindex_documents('supplier', ids)
         self.message_user(request, f'{updated} suppliers activated.')
     activate_suppliers.short_description = "Activate selected suppliers"
 
     def deactivate_suppliers(self, request, queryset):
         """Deactivate selected suppliers"""
+        ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(is_active=False)
+        reindex_documents('supplier', ids)
         self.message_user(request, f'{updated} suppliers deactivated.')
     deactivate_suppliers.short_description = "Deactivate selected suppliers"
 
@@ -150,6 +188,7 @@ class ProductAdmin(admin.ModelAdmin):
         'selling_price', 'get_profit_margin', 'is_active', 'created_at'
     )
     list_filter = ('category', 'supplier', 'is_active', 'created_at')
+    list_select_related = ('category', 'supplier')
     search_fields = ('name', 'sku', 'description')
     ordering = ['name']
     list_per_page = 25
@@ -177,40 +216,61 @@ class ProductAdmin(admin.ModelAdmin):
 
     actions = ['mark_as_low_stock', 'activate_products', 'deactivate_products']
 
+    STOCK_STATUS_LABELS = {0: "Out of Stock", 1: "Low Stock", 2: "In Stock"}
+
+    def get_queryset(self, request):
+        """Compute stock status and margin in SQL so both columns are sortable"""
+        return super().get_queryset(request).annotate(
+            stock_rank=Case(
+                When(quantity_in_stock=0, then=Value(0)),
+                When(quantity_in_stock__lte=F('minimum_stock_level'), then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField()
+            ),
+            margin=Case(
+                When(selling_price__gt=0, cost_price__gt=0, then=ExpressionWrapper(
+                    (Cast('selling_price', FloatField()) - Cast('cost_price', FloatField())) * 100
+                    / Cast('selling_price', FloatField()),
+                    output_field=FloatField()
+                )),
+                default=Value(None),
+                output_field=FloatField()
+            )
+        )
+
     def get_stock_status(self, obj):
         """Display stock status with color coding"""
-        if obj.quantity_in_stock == 0:
-            return "Out of Stock"
-        elif obj.is_low_stock:
-            return "Low Stock"
-        else:
-            return "In Stock"
+        rank = getattr(obj, 'stock_rank', None)
+        if rank is None:
+            # Unsaved objects (e.g. the add form) are not annotated
+            rank = 0 if obj.quantity_in_stock == 0 else 1 if obj.is_low_stock else 2
+        return self.STOCK_STATUS_LABELS[rank]
     get_stock_status.short_description = 'Stock Status'
+    get_stock_status.admin_order_field = 'stock_rank'
 
     def get_profit_margin(self, obj):
         """Display profit margin percentage"""
-        margin = obj.profit_margin
+        margin = obj.margin if hasattr(obj, 'margin') else obj.profit_margin
         return f"{margin:.1f}%" if margin else "N/A"
     get_profit_margin.short_description = 'Profit Margin'
+    get_profit_margin.admin_order_field = 'margin'
 
     def mark_as_low_stock(self, request, queryset):
         """Set minimum stock level to current stock + 5"""
-        for product in queryset:
-            product.minimum_stock_level = product.quantity_in_stock + 5
-            product.save()
-        self.message_user(request, f'Updated minimum stock levels for {queryset.count()} products.')
+        run_bulk_action(self, request, queryset, 'product.mark_low_stock',
+                        'Updated minimum stock levels for {count} products.')
     mark_as_low_stock.short_description = "Mark as low stock (set min level)"
 
     def activate_products(self, request, queryset):
         """Activate selected products"""
-        updated = queryset.update(is_active=True)
-        self.message_user(request, f'{updated} products activated.')
+        run_bulk_action(self, request, queryset, 'product.set_active',
+                        '{count} products activated.', {'is_active': True})
     activate_products.short_description = "Activate selected products"
 
     def deactivate_products(self, request, queryset):
         """Deactivate selected products"""
-        updated = queryset.update(is_active=False)
-        self.message_user(request, f'{updated} products deactivated.')
+        run_bulk_action(self, request, queryset, 'product.set_active',
+                        '{count} products deactivated.', {'is_active': False})
     deactivate_products.short_description = "Deactivate selected products"
 
 
@@ -220,6 +280,8 @@ class ProductAdmin(admin.ModelAdmin):
 
 @admin.register(StockMovement)
 class StockMovementAdmin(admin.ModelAdmin):
+    # Validates transfers, including stock at the source warehouse
+    form = StockMovementForm
     list_display = (
         'product', 'movement_type', 'quantity', 'reference',
         'created_by', 'created_at'
@@ -232,7 +294,7 @@ class StockMovementAdmin(admin.ModelAdmin):
 
     fieldsets = (
         ('Movement Details', {
-            'fields': ('product', 'movement_type', 'quantity', 'reference'),
+            'fields': ('product', 'movement_type', 'quantity', 'from_warehouse', 'to_warehouse', 'reference'),
             'description': 'Stock movement transaction details'
         }),
         ('Additional Information', {
@@ -301,7 +363,7 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
 
-    actions = ['mark_as_confirmed', 'mark_as_processing', 'mark_as_shipped']
+    actions = ['mark_as_confirmed', 'mark_as_processing', 'mark_as_shipped', 'allocate_warehouse_stock']
 
     def get_customer_or_supplier(self, obj):
         """Display customer for sales orders, supplier for purchase orders"""
@@ -312,24 +374,41 @@ class OrderAdmin(admin.ModelAdmin):
         return "N/A"
     get_customer_or_supplier.short_description = 'Customer/Supplier'
 
+    def save_model(self, request, obj, form, change):
+        """Send status edits through the transition engine so stock is posted"""
+        if not change or 'status' not in form.changed_data:
+            return super().save_model(request, obj, form, change)
+        new_status, obj.status = obj.status, form.initial['status']
+        super().save_model(request, obj, form, change)
+        result = transition_orders([obj.pk], new_status, request.user)
+        for rejected in result['rejected']:
+            self.message_user(request, rejected['error'], level=messages.ERROR)
+        obj.refresh_from_db(fields=['status', 'updated_at'])
+
     def mark_as_confirmed(self, request, queryset):
         """Mark selected orders as confirmed"""
-        updated = queryset.update(status='confirmed')
-        self.message_user(request, f'{updated} orders marked as confirmed.')
+        run_bulk_action(self, request, queryset, 'order.set_status',
+                        '{count} orders marked as confirmed.', {'status': 'confirmed'})
     mark_as_confirmed.short_description = "Mark as confirmed"
 
     def mark_as_processing(self, request, queryset):
         """Mark selected orders as processing"""
-        updated = queryset.update(status='processing')
-        self.message_user(request, f'{updated} orders marked as processing.')
+        run_bulk_action(self, request, queryset, 'order.set_status',
+                        '{count} orders marked as processing.', {'status': 'processing'})
     mark_as_processing.short_description = "Mark as processing"
 
     def mark_as_shipped(self, request, queryset):
         """Mark selected orders as shipped"""
-        updated = queryset.update(status='shipped')
-        self.message_user(request, f'{updated} orders marked as shipped.')
+        run_bulk_action(self, request, queryset, 'order.set_status',
+                        '{count} orders marked as shipped.', {'status': 'shipped'})
     mark_as_shipped.short_description = "Mark as shipped"
 
+    def allocate_warehouse_stock(self, request, queryset):
+        """Pick warehouse locations for the selected sales orders"""
+        run_bulk_action(self, request, queryset, 'order.allocate',
+                        'Allocated warehouse stock for {count} orders.')
+    allocate_warehouse_stock.short_description = "Allocate warehouse stock"
+
     def get_queryset(self, request):
         """Optimize database queries"""
         return super().get_queryset(request).select_related('customer', 'supplier', 'created_by')
@@ -343,6 +422,7 @@ class OrderAdmin(admin.ModelAdmin):
 class WarehouseAdmin(admin.ModelAdmin):
     list_display = ('name', 'manager', 'city', 'state', 'is_active', 'created_at')
     list_filter = ('is_active', 'state', 'created_at')
+    list_select_related = ('manager',)
     search_fields = ('name', 'manager__username', 'city', 'address')
     ordering = ['name']
     readonly_fields = ('created_at',)
@@ -379,6 +459,56 @@ class ProductLocationAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('product', 'warehouse')
 
 
+# ========================================================================
+# ORDER ALLOCATION ADMIN
+# ========================================================================
+
+@admin.register(OrderAllocation)
+class OrderAllocationAdmin(admin.ModelAdmin):
+    list_display = ('order_item', 'warehouse', 'quantity', 'created_at')
+    list_filter = ('warehouse', 'created_at')
+    list_select_related = ('order_item__order', 'order_item__product', 'warehouse')
+    search_fields = ('order_item__order__order_number', 'order_item__product__sku')
+    ordering = ['-created_at']
+    readonly_fields = ('order_item', 'warehouse', 'quantity', 'created_at')
+
+
+# ========================================================================
+# BULK ACTION JOB ADMIN
+# ========================================================================
+
+@admin.register(BulkActionJob)
+class BulkActionJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'action', 'status', 'get_progress', 'total', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'action')
+    list_select_related = ('created_by',)
+    ordering = ['-created_at']
+    exclude = ('object_ids',)
+    readonly_fields = (
+        'action', 'params', 'status', 'total', 'processed', 'get_progress', 'message',
+        'created_by', 'created_at', 'started_at', 'heartbeat_at', 'finished_at'
+    )
+    actions = ['requeue_jobs']
+
+    def get_queryset(self, request):
+        """Keep the stored id lists out of the changelist query"""
+        return super().get_queryset(request).defer('object_ids')
+
+    def get_progress(self, obj):
+        """Display processed rows as a percentage"""
+        return f"{obj.progress}%"
+    get_progress.short_description = 'Progress'
+
+    def has_add_permission(self, request):
+        return False
+
+    def requeue_jobs(self, request, queryset):
+        """Queue failed jobs again; they resume after the last finished chunk"""
+        updated = queryset.filter(status='failed').update(status='queued', message='', finished_at=None)
+        self.message_user(request, f'{updated} jobs queued again.')
+    requeue_jobs.short_description = "Re-queue failed jobs"
+
+
 # ========================================================================
 # ADMIN SITE CUSTOMIZATION
 # ========================================================================
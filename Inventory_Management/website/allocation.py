@@ -0,0 +1,138 @@
+"""Warehouse allocation for batches of sales orders.
+
+``allocate_orders`` decides which warehouses each order line is picked from,
+using the stock recorded in ``ProductLocation``. The locations of every
+product in the batch are locked and loaded in one query into a
+``LocationIndex``; planning then happens in memory. A line is taken from
+the location with the most stock, split over further locations when that is
+not enough. An order is only allocated if all of its lines can be, so stock
+is never held for an order that cannot ship.
+
+The results are written with one ``OrderAllocation`` insert and one
+``UPDATE ... CASE`` per chunk of locations. Pending orders that get allocated
+are confirmed through ``transition_orders``, which deducts the Product
+totals. Orders that were already committed had their totals deducted at
+confirmation, so totals and locations move together either way.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Order, OrderItem, ProductLocation, OrderAllocation
+from .orders import transition_orders
+
+
+ALLOCATABLE_STATUSES = ['pending', 'confirmed', 'processing']
+
+
+class LocationIndex:
+    """Stock per location for the products of one batch, largest first"""
+
+    def __init__(self, rows):
+        # product_id -> [[location_id, warehouse_id, quantity], ...]
+        self.locations = defaultdict(list)
+        for location_id, product_id, warehouse_id, quantity in rows:
+            self.locations[product_id].append([location_id, warehouse_id, quantity])
+        for entries in self.locations.values():
+            entries.sort(key=lambda entry: -entry[2])
+
+    @classmethod
+    def load(cls, product_ids, lock=True):
+        """Read the active warehouses' stock for ``product_ids`` in one query"""
+        locations = ProductLocation.objects.filter(
+            product_id__in=product_ids, quantity__gt=0, warehouse__is_active=True
+        ).order_by('id')
+        if lock:
+            locations = locations.select_for_update(of=('self',))
+        return cls(locations.values_list('id', 'product_id', 'warehouse_id', 'quantity'))
+
+    def plan(self, product_id, quantity):
+        """Return ``[(location_id, warehouse_id, quantity)]`` covering the line, or None"""
+        picks = []
+        for location_id, warehouse_id, available in self.locations.get(product_id, ()):
+            if not available:
+                continue
+            take = min(available, quantity)
+            picks.append((location_id, warehouse_id, take))
+            quantity -= take
+            if not quantity:
+                return picks
+        return None
+
+    def take(self, product_id, picks):
+        """Remove planned quantities from the index"""
+        taken = {location_id: quantity for location_id, _, quantity in picks}
+        entries = self.locations[product_id]
+        for entry in entries:
+            entry[2] -= taken.get(entry[0], 0)
+        entries.sort(key=lambda entry: -entry[2])
+
+
+def plan_allocations(lines, index):
+    """Allocate ``(item_id, order_id, product_id, quantity)`` lines in order.
+
+    Lines must be grouped by order. Returns ``(allocations, shortages)``:
+    ``allocations`` maps order id to ``[(item_id, location_id, warehouse_id,
+    quantity)]`` and ``shortages`` lists ``{'order', 'product', 'quantity'}``
+    for lines that could not be covered.
+    """
+    allocations, shortages = {}, []
+    by_order = defaultdict(list)
+    for line in lines:
+        by_order[line[1]].append(line)
+
+    for order_id, order_lines in by_order.items():
+        planned, short = [], None
+        for item_id, _, product_id, quantity in order_lines:
+            picks = index.plan(product_id, quantity)
+            if picks is None:
+                short = {'order': order_id, 'product': product_id, 'quantity': quantity}
+                break
+            index.take(product_id, picks)
+            planned.append((product_id, item_id, picks))
+        if short is not None:
+            # Give back what earlier lines of this order took
+            for product_id, _, picks in planned:
+                index.take(product_id, [(location_id, w, -quantity) for location_id, w, quantity in picks])
+            shortages.append(short)
+            continue
+        allocations[order_id] = [
+            (item_id, location_id, warehouse_id, quantity)
+            for _, item_id, picks in planned
+            for location_id, warehouse_id, quantity in picks
+        ]
+    return allocations, shortages
+
+
+def allocate_orders(order_ids, user):
+    """Allocate warehouse stock to a batch of sales orders.
+
+    Lines that already have allocations are skipped. Returns
+    ``{'allocated': [order ids], 'short': [...], 'allocations': count}``.
+    """
+    with transaction.atomic():
+        locked = list(Order.objects.select_for_update().filter(
+            pk__in=order_ids, order_type='sale', status__in=ALLOCATABLE_STATUSES
+        ).order_by('id').values_list('id', 'status'))
+        status_of = dict(locked)
+        lines = list(OrderItem.objects.filter(
+            order_id__in=status_of, allocations__isnull=True
+        ).order_by('order_id', 'id').values_list('id', 'order_id', 'product_id', 'quantity'))
+        if not lines:
+            return {'allocated': [], 'short': [], 'allocations': 0}
+
+        index = LocationIndex.load({line[2] for line in lines})
+        allocations, shortages = plan_allocations(lines, index)
+
+        rows, deltas = [], defaultdict(int)
+        for picks in allocations.values():
+            for item_id, location_id, warehouse_id, quantity in picks:
+                rows.append(OrderAllocation(order_item_id=item_id, warehouse_id=warehouse_id, quantity=quantity))
+                deltas[location_id] -= quantity
+        OrderAllocation.objects.bulk_create(rows)
+        ProductLocation.apply_quantity_deltas(deltas)
+
+        pending = [pk for pk in allocations if status_of[pk] not in Order.STOCK_COMMITTED_STATUSES]
+        if pending:
+            transition_orders(pending, 'confirmed', user)
+    return {'allocated': sorted(allocations), 'short': shortages, 'allocations': len(rows)}
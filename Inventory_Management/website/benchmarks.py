@@ -0,0 +1,206 @@
+"""Repeatable benchmarks of the main pages and the model write paths.
+
+Pages are requested through the Django test client as a logged-in user, so
+middleware, sessions and templates are all counted; every run also records
+its queries and database time with ``QueryRecorder``. The write paths,
+``StockMovement.save`` and ``OrderItem.save``, are timed directly inside one
+transaction that is rolled back, so the database is left as it was (each
+save then runs in a savepoint rather than committing on its own).
+
+Results are plain JSON (``run_benchmarks``) with the database size in
+``meta``, so runs against the same data set can be compared with
+``compare_results``. Generate the data set with ``generate_synthetic_data``.
+A page whose template is missing is still timed up to the failed render and
+reported with ``rendered: false``.
+"""
+import logging
+import math
+import platform
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.template import TemplateDoesNotExist
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard_stats
+from .models import Product, Customer, Order, OrderItem, StockMovement
+from .query_metrics import QueryRecorder
+
+
+def view_scenarios():
+    """``[(name, url name, query params, prepare)]``; ``prepare`` runs untimed before each request"""
+    quarter_ago = (timezone.localdate() - timedelta(days=90)).isoformat()
+    return [
+        ('home', 'home', {}, None),
+        ('home_cold', 'home', {}, invalidate_dashboard_stats),
+        ('product_list', 'product_list', {}, None),
+        ('product_list_search', 'product_list', {'search': 'steel'}, None),
+        ('product_list_low_stock', 'product_list', {'stock_status': 'low'}, None),
+        ('order_list', 'order_list', {}, None),
+        ('order_list_pending_sales', 'order_list', {'order_type': 'sale', 'status': 'pending'}, None),
+        ('inventory_reports', 'inventory_reports', {}, None),
+        ('inventory_reports_quarter', 'inventory_reports', {'date_from': quarter_ago}, None),
+    ]
+
+
+def summarize(seconds):
+    """Timing statistics in milliseconds for a list of durations in seconds"""
+    ordered = sorted(seconds)
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(ordered[math.ceil(0.95 * len(ordered)) - 1] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def measure(action, repeat=10, warmup=1, prepare=None):
+    """Time ``action()`` ``repeat`` times after ``warmup`` untimed runs.
+
+    Returns the timing statistics plus the most queries any run made and the
+    median database time; ``action``'s last return value is added when it is
+    a dict (e.g. the response status).
+    """
+    for _ in range(warmup):
+        if prepare:
+            prepare()
+        action()
+    timings, queries, db_seconds, outcome = [], [], [], None
+    for _ in range(repeat):
+        if prepare:
+            prepare()
+        with QueryRecorder() as recorder:
+            started = time.perf_counter()
+            outcome = action()
+            timings.append(time.perf_counter() - started)
+        queries.append(recorder.count)
+        db_seconds.append(recorder.duration)
+    result = summarize(timings)
+    result['queries'] = max(queries)
+    result['db_median_ms'] = round(statistics.median(db_seconds) * 1000, 3)
+    if isinstance(outcome, dict):
+        result.update(outcome)
+    return result
+
+
+@contextmanager
+def _quiet_request_errors():
+    # A missing template is expected on some pages; don't log a traceback per run
+    request_logger = logging.getLogger('django.request')
+    disabled, request_logger.disabled = request_logger.disabled, True
+    try:
+        yield
+    finally:
+        request_logger.disabled = disabled
+
+
+def benchmark_views(client, repeat=10, warmup=1, only=None):
+    """``{scenario: result}`` for the page scenarios, optionally limited to the names in ``only``"""
+    results = {}
+    for name, url_name, params, prepare in view_scenarios():
+        if only and name not in only:
+            continue
+        url = reverse(url_name)
+
+        def request(url=url, params=params):
+            try:
+                response = client.get(url, params)
+            except TemplateDoesNotExist as exc:
+                return {'status': 500, 'rendered': False, 'error': f"Template does not exist: {exc}"}
+            return {'status': response.status_code, 'rendered': True}
+
+        with _quiet_request_errors():
+            results[name] = measure(request, repeat, warmup, prepare)
+        results[name]['url'] = url
+    return results
+
+
+def benchmark_writes(user, repeat=10, warmup=1, seed=1):
+    """``{path: result}`` for ``StockMovement.save`` and ``OrderItem.save``, rolled back afterwards"""
+    product_ids = list(Product.objects.filter(is_active=True).values_list('pk', flat=True)[:10000])
+    if not product_ids:
+        return {}
+    rng = random.Random(seed)
+    customer = Customer.objects.order_by('pk').first()
+    results = {}
+
+    with transaction.atomic():
+        def save_movement():
+            StockMovement(product_id=rng.choice(product_ids), movement_type='in', quantity=rng.randint(1, 50),
+                          reference='BENCHMARK', created_by=user).save()
+
+        results['stock_movement_save'] = measure(save_movement, repeat, warmup)
+
+        # Each line goes on a fresh confirmed sales order, so every save also posts a movement
+        order = None
+
+        def new_order():
+            nonlocal order
+            order = Order.objects.create(order_type='sale', status='confirmed', customer=customer,
+                                         created_by=user)
+
+        def save_order_item():
+            product_id = rng.choice(product_ids)
+            OrderItem(order=order, product_id=product_id, quantity=rng.randint(1, 5),
+                      unit_price=Product.objects.values_list('selling_price', flat=True).get(pk=product_id)).save()
+
+        results['order_item_save'] = measure(save_order_item, repeat, warmup, prepare=new_order)
+        transaction.set_rollback(True)
+    return results
+
+
+def database_meta():
+    return {
+        'vendor': connection.vendor,
+        'products': Product.objects.count(),
+        'customers': Customer.objects.count(),
+        'orders': Order.objects.count(),
+        'order_items': OrderItem.objects.count(),
+        'stock_movements': StockMovement.objects.count(),
+    }
+
+
+def run_benchmarks(user, repeat=10, warmup=1, only=None, seed=1):
+    """Run every benchmark and return ``{'meta': ..., 'results': {name: result}}``"""
+    client = Client()
+    client.force_login(user)
+    # Time the pages as they run in production, not with DEBUG's query logging and error pages
+    with override_settings(DEBUG=False, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        results = benchmark_views(client, repeat, warmup, only)
+        if not only or {'stock_movement_save', 'order_item_save'} & set(only):
+            writes = benchmark_writes(user, repeat, warmup, seed)
+            results.update({name: result for name, result in writes.items() if not only or name in only})
+    return {
+        'meta': {
+            'started_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'warmup': warmup,
+            'database': database_meta(),
+        },
+        'results': results,
+    }
+
+
+def compare_results(previous, current):
+    """``[(name, previous median ms, current median ms, change ratio)]`` for benchmarks in both runs"""
+    rows = []
+    for name, result in current['results'].items():
+        before = previous.get('results', {}).get(name)
+        if not before:
+            continue
+        ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] else None
+        rows.append((name, before['median_ms'], result['median_ms'], ratio))
+    return rows
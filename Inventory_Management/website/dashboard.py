@@ -0,0 +1,74 @@
+"""Cached dashboard statistics, invalidated from model signals"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Customer, Product, StockMovement, Order
+
+
+STATS_KEY = 'website:dashboard:stats'
+HITS_KEY = 'website:dashboard:hits'
+MISSES_KEY = 'website:dashboard:misses'
+
+
+def stats_max_age():
+    """Seconds a snapshot may be served before it is rebuilt (DASHBOARD_STATS_MAX_AGE)"""
+    return getattr(settings, 'DASHBOARD_STATS_MAX_AGE', 60)
+
+
+def _count(key):
+    # add() is a no-op when the counter exists, so incr() never misses the key
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def build_dashboard_stats():
+    """Run the dashboard queries and return a picklable snapshot"""
+    low_stock = Product.objects.filter(quantity_in_stock__lte=F('minimum_stock_level'), is_active=True)
+    return {
+        'total_products': Product.objects.filter(is_active=True).count(),
+        'low_stock_products': low_stock.count(),
+        'total_customers': Customer.objects.count(),
+        'pending_orders': Order.objects.filter(status='pending').count(),
+        'recent_stock_movements': list(StockMovement.objects.select_related('product')[:5]),
+        'recent_orders': list(Order.objects.select_related('customer', 'supplier')[:5]),
+        'low_stock_items': list(low_stock.select_related('category', 'supplier')[:10]),
+        'computed_at': timezone.now(),
+    }
+
+
+def get_dashboard_stats():
+    """Return the cached snapshot, rebuilding it on a miss.
+
+    A hit costs no queries. Snapshots expire after ``stats_max_age()`` seconds
+    even if no signal fired (e.g. after ``queryset.update()`` or bulk writes).
+    """
+    stats = cache.get(STATS_KEY)
+    if stats is not None:
+        _count(HITS_KEY)
+        return stats
+    _count(MISSES_KEY)
+    stats = build_dashboard_stats()
+    cache.set(STATS_KEY, stats, timeout=stats_max_age())
+    return stats
+
+
+def invalidate_dashboard_stats(**kwargs):
+    """Drop the cached snapshot; usable directly as a signal receiver"""
+    cache.delete(STATS_KEY)
+
+
+def dashboard_cache_counters():
+    """Hit/miss counters for the dashboard cache"""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+    }
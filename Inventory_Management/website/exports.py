@@ -0,0 +1,153 @@
+"""Streaming CSV and JSON Lines exports shared by the export views and commands.
+
+Rows are read with ``QuerySet.iterator(chunk_size=...)`` and written one at a
+time, so memory stays flat however many rows are exported. Foreign keys are
+loaded with ``select_related``; order lines are prefetched per chunk.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .filters import filter_products, filter_customers, filter_orders
+from .models import OrderItem
+
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_CHUNK_SIZE = 1000
+
+PRODUCT_COLUMNS = [
+    'id', 'sku', 'name', 'description', 'category', 'supplier', 'cost_price', 'selling_price',
+    'quantity_in_stock', 'minimum_stock_level', 'maximum_stock_level', 'is_active', 'created_at', 'updated_at',
+]
+CUSTOMER_COLUMNS = [
+    'id', 'first_name', 'last_name', 'email', 'phone', 'address', 'city', 'state', 'zipcode',
+    'customer_type', 'credit_limit', 'notes', 'created_at',
+]
+ORDER_COLUMNS = [
+    'order_number', 'order_type', 'status', 'customer', 'supplier', 'order_date', 'expected_delivery_date',
+    'total_amount', 'created_by', 'notes',
+]
+ORDER_ITEM_COLUMNS = ['item_sku', 'item_name', 'item_quantity', 'item_unit_price', 'item_total_price']
+
+
+def _product_row(product):
+    return {
+        'id': product.id,
+        'sku': product.sku,
+        'name': product.name,
+        'description': product.description,
+        'category': product.category.name,
+        'supplier': product.supplier.name,
+        'cost_price': product.cost_price,
+        'selling_price': product.selling_price,
+        'quantity_in_stock': product.quantity_in_stock,
+        'minimum_stock_level': product.minimum_stock_level,
+        'maximum_stock_level': product.maximum_stock_level,
+        'is_active': product.is_active,
+        'created_at': product.created_at,
+        'updated_at': product.updated_at,
+    }
+
+
+def _customer_row(customer):
+    return {column: getattr(customer, column) for column in CUSTOMER_COLUMNS}
+
+
+def _order_row(order):
+    return {
+        'order_number': order.order_number,
+        'order_type': order.order_type,
+        'status': order.status,
+        'customer': f"{order.customer.first_name} {order.customer.last_name}" if order.customer else '',
+        'supplier': order.supplier.name if order.supplier else '',
+        'order_date': order.order_date,
+        'expected_delivery_date': order.expected_delivery_date,
+        'total_amount': order.total_amount,
+        'created_by': order.created_by.username,
+        'notes': order.notes,
+        'items': [
+            {
+                'item_sku': item.product.sku,
+                'item_name': item.product.name,
+                'item_quantity': item.quantity,
+                'item_unit_price': item.unit_price,
+                'item_total_price': item.total_price,
+            }
+            for item in order.items.all()
+        ],
+    }
+
+
+def product_export(params):
+    """``(columns, rows)`` for the products matching ProductSearchForm ``params``"""
+    _, products = filter_products(params)
+    rows = (_product_row(p) for p in products.order_by('id').iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    return PRODUCT_COLUMNS, rows
+
+
+def customer_export(params):
+    """``(columns, rows)`` for the customers matching CustomerSearchForm ``params``"""
+    _, customers = filter_customers(params)
+    rows = (_customer_row(c) for c in customers.order_by('id').iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    return CUSTOMER_COLUMNS, rows
+
+
+def order_export(params):
+    """``(columns, rows)`` for orders matching OrderSearchForm ``params``, each with its ``items``"""
+    _, orders = filter_orders(params)
+    orders = orders.prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('id'))
+    ).order_by('id')
+    rows = (_order_row(o) for o in orders.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    return ORDER_COLUMNS + ORDER_ITEM_COLUMNS, rows
+
+
+EXPORTS = {
+    'products': product_export,
+    'customers': customer_export,
+    'orders': order_export,
+}
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def _flatten(row, columns):
+    """CSV rows for one record; orders give one row per line"""
+    items = row.get('items')
+    if items is None:
+        yield [row[column] for column in columns]
+        return
+    for item in items or [{}]:
+        yield [item.get(column, '') if column.startswith('item_') else row[column] for column in columns]
+
+
+def stream_csv(columns, rows):
+    """Yield CSV text: a header line, then one line per row"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        for values in _flatten(row, columns):
+            yield writer.writerow(values)
+
+
+def stream_jsonl(columns, rows):
+    """Yield one JSON document per row"""
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_export(kind, fmt, params=None):
+    """Text chunks for ``kind`` ('products', 'customers', 'orders') in ``fmt``"""
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export '{kind}'")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'")
+    columns, rows = EXPORTS[kind](params or {})
+    return (stream_csv if fmt == 'csv' else stream_jsonl)(columns, rows)
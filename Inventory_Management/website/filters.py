@@ -0,0 +1,79 @@
+"""Search-form driven querysets shared by list views, JSON APIs and exports"""
+from django.db.models import Q, F
+
+from .forms import ProductSearchForm, CustomerSearchForm, OrderSearchForm
+from .models import Customer, Product, Order
+from .global_search import matching_object_ids
+from .search import matching_product_ids
+
+
+def filter_products(params):
+    """Apply ProductSearchForm filters; returns ``(search_form, queryset)``"""
+    search_form = ProductSearchForm(params or None)
+    products = Product.objects.select_related('category', 'supplier').filter(is_active=True)
+
+    if search_form.is_valid():
+        search = search_form.cleaned_data['search']
+        category = search_form.cleaned_data['category']
+        supplier = search_form.cleaned_data['supplier']
+        stock_status = search_form.cleaned_data['stock_status']
+
+        if search:
+            # Indexed word-prefix search plus an exact SKU fast path
+            products = products.filter(Q(id__in=matching_product_ids(search)) | Q(sku=search))
+        if category:
+            products = products.filter(category=category)
+        if supplier:
+            products = products.filter(supplier=supplier)
+        if stock_status == 'low':
+            products = products.filter(quantity_in_stock__lte=F('minimum_stock_level'))
+        elif stock_status == 'out_of_stock':
+            products = products.filter(quantity_in_stock=0)
+        elif stock_status == 'in_stock':
+            products = products.filter(quantity_in_stock__gt=0)
+    return search_form, products
+
+
+def filter_customers(params):
+    """Apply CustomerSearchForm filters; returns ``(search_form, queryset)``"""
+    search_form = CustomerSearchForm(params or None)
+    customers = Customer.objects.all()
+
+    if search_form.is_valid():
+        search = search_form.cleaned_data['search']
+        customer_type = search_form.cleaned_data['customer_type']
+        if search:
+            customers = customers.filter(
+                Q(first_name__istartswith=search) |
+                Q(last_name__istartswith=search) |
+                Q(email__istartswith=search)
+            )
+        if customer_type:
+            customers = customers.filter(customer_type=customer_type)
+    return search_form, customers
+
+
+def filter_orders(params):
+    """Apply OrderSearchForm filters; returns ``(search_form, queryset)``"""
+    search_form = OrderSearchForm(params or None)
+    orders = Order.objects.select_related('customer', 'supplier', 'created_by')
+
+    if search_form.is_valid():
+        search = search_form.cleaned_data['search']
+        order_type = search_form.cleaned_data['order_type']
+        status = search_form.cleaned_data['status']
+        date_from = search_form.cleaned_data['date_from']
+        date_to = search_form.cleaned_data['date_to']
+
+        if search:
+            # Indexed prefix search over order numbers and customer/supplier names
+            orders = orders.filter(Q(id__in=matching_object_ids('order', search)) | Q(order_number=search))
+        if order_type:
+            orders = orders.filter(order_type=order_type)
+        if status:
+            orders = orders.filter(status=status)
+        if date_from:
+            orders = orders.filter(order_date__gte=date_from)
+        if date_to:
+            orders = orders.filter(order_date__lte=date_to)
+    return search_form, orders
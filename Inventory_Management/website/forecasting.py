@@ -0,0 +1,124 @@
+"""Per-product demand forecasts from the 'out' movement history.
+
+Products are read in id batches of ``batch_size``. For each batch the 'out'
+movements of the history window are streamed (``iterator()``, in product and
+time order) and bucketed into one daily series per product. Only one batch of
+series is held at a time, so memory does not grow with the catalogue. Fitting
+happens in a process pool with a bounded number of batches in flight, and
+each finished batch is saved with one bulk insert.
+
+Every run writes rows with the same ``run_at`` and, once they are all
+saved, a ``DemandForecastRun`` marker; readers use the newest marked run.
+The previous run is removed only then, and a failed run removes its own
+rows, so a run in progress is never read.
+"""
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, time, timedelta
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Product, StockMovement, DemandForecast, DemandForecastRun
+from .smoothing import fit_batch
+
+
+def forecast_settings():
+    """History window and horizon in days (FORECAST_HISTORY_DAYS, FORECAST_HORIZON_DAYS)"""
+    return {
+        'history_days': getattr(settings, 'FORECAST_HISTORY_DAYS', 91),
+        'horizon_days': getattr(settings, 'FORECAST_HORIZON_DAYS', 28),
+    }
+
+
+def iter_daily_series(start, days, batch_size=500, chunk_size=2000):
+    """Yield lists of ``(product_id, daily_series)`` one product batch at a time.
+
+    Products without 'out' movements in the window get an all-zero series.
+    """
+    window_start = timezone.make_aware(datetime.combine(start, time.min))
+    window_end = window_start + timedelta(days=days)
+    first_day = start.toordinal()
+    last_id = 0
+    while True:
+        product_ids = list(Product.objects.filter(is_active=True, pk__gt=last_id).order_by('pk').values_list(
+            'pk', flat=True
+        )[:batch_size])
+        if not product_ids:
+            return
+        last_id = product_ids[-1]
+
+        series = {pk: [0.0] * days for pk in product_ids}
+        movements = StockMovement.objects.filter(
+            product_id__in=product_ids, movement_type='out',
+            created_at__gte=window_start, created_at__lt=window_end
+        ).order_by('product_id', 'created_at').values_list('product_id', 'created_at', 'quantity')
+        for product_id, created_at, quantity in movements.iterator(chunk_size=chunk_size):
+            day = timezone.localtime(created_at).date().toordinal() - first_day
+            if 0 <= day < days:
+                series[product_id][day] += quantity
+        yield list(series.items())
+
+
+def _save(results, run_at, start_date, history_days):
+    DemandForecast.objects.bulk_create([
+        DemandForecast(
+            run_at=run_at,
+            product_id=product_id,
+            method=method,
+            start_date=start_date,
+            daily=[round(value, 3) for value in forecast],
+            next_7_days=round(sum(forecast[:7]), 3),
+            horizon_total=round(sum(forecast), 3),
+            history_days=history_days
+        )
+        for product_id, method, forecast in results
+    ])
+
+
+def run_forecasts(today=None, workers=None, batch_size=500):
+    """Forecast every active product and replace the previous run.
+
+    ``workers`` defaults to the CPU count; 0 or 1 fits in this process.
+    Returns ``(run_at, product_count)``.
+    """
+    options = forecast_settings()
+    history_days, horizon = options['history_days'], options['horizon_days']
+    today = today or timezone.localdate()
+    start = today - timedelta(days=history_days)
+    run_at = timezone.now()
+    workers = os.cpu_count() if workers is None else workers
+    count = 0
+
+    def save(results):
+        nonlocal count
+        _save(results, run_at, today, history_days)
+        count += len(results)
+
+    batches = iter_daily_series(start, history_days, batch_size=batch_size)
+    try:
+        if workers <= 1:
+            for batch in batches:
+                save(fit_batch(batch, horizon))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = set()
+                for batch in batches:
+                    pending.add(pool.submit(fit_batch, batch, horizon))
+                    # Bound the number of batches held in memory
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            save(future.result())
+                for future in pending:
+                    save(future.result())
+    except BaseException:
+        DemandForecast.objects.filter(run_at=run_at).delete()
+        raise
+
+    with transaction.atomic():
+        DemandForecastRun.objects.create(run_at=run_at, product_count=count)
+        DemandForecast.objects.filter(run_at__lt=run_at).delete()
+        DemandForecastRun.objects.filter(run_at__lt=run_at).delete()
+    return run_at, count
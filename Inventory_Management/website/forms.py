@@ -1,7 +1,7 @@
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django import forms
-from .models import Customer, Product, Category, Supplier, StockMovement, Order, OrderItem, Warehouse
+from .models import Customer, Product, Category, Supplier, StockMovement, Order, OrderItem, Warehouse, ProductLocation
 
 class SignUpForm(UserCreationForm):
     email = forms.EmailField(label="", widget=forms.TextInput(attrs={'class':'form-control', 'placeholder': 'Email Address'}))
@@ -117,6 +117,38 @@ class ProductForm(forms.ModelForm):
         self.fields['supplier'].queryset = Supplier.objects.filter(is_active=True)
 
 
+class ProductImportForm(ProductForm):
+    """ProductForm rules for one imported row; category and supplier are given by name"""
+    category = forms.CharField(required=True, label="Category")
+    supplier = forms.CharField(required=True, label="Supplier")
+
+    def __init__(self, *args, categories=None, suppliers=None, **kwargs):
+        # ``categories`` and ``suppliers`` map casefolded names to instances
+        self.categories = categories or {}
+        self.suppliers = suppliers or {}
+        super().__init__(*args, **kwargs)
+
+    def clean_category(self):
+        name = self.cleaned_data['category'].strip()
+        if name.casefold() not in self.categories:
+            raise forms.ValidationError(f"Unknown category '{name}'")
+        return self.categories[name.casefold()]
+
+    def clean_supplier(self):
+        name = self.cleaned_data['supplier'].strip()
+        if name.casefold() not in self.suppliers:
+            raise forms.ValidationError(f"Unknown or inactive supplier '{name}'")
+        return self.suppliers[name.casefold()]
+
+    def _get_validation_exclusions(self):
+        # The names were resolved to loaded instances, so skip the per-row existence queries
+        return set(super()._get_validation_exclusions()) | {'category', 'supplier'}
+
+    def validate_unique(self):
+        # Rows are upserted on SKU, so an existing SKU is an update, not an error
+        pass
+
+
 class StockMovementForm(forms.ModelForm):
     """Form for recording stock movements"""
     product = forms.ModelChoiceField(
@@ -144,10 +176,41 @@ class StockMovementForm(forms.ModelForm):
         widget=forms.Textarea(attrs={"placeholder":"Additional Notes (Optional)", "class":"form-control", "rows":"3"}), 
         label="Notes"
     )
+    from_warehouse = forms.ModelChoiceField(
+        queryset=Warehouse.objects.filter(is_active=True), 
+        widget=forms.Select(attrs={"class":"form-control"}), 
+        label="From Warehouse", empty_label="Select Warehouse", required=False
+    )
+    to_warehouse = forms.ModelChoiceField(
+        queryset=Warehouse.objects.filter(is_active=True), 
+        widget=forms.Select(attrs={"class":"form-control"}), 
+        label="To Warehouse", empty_label="Select Warehouse", required=False
+    )
 
     class Meta:
         model = StockMovement
-        fields = ['product', 'movement_type', 'quantity', 'reference', 'notes']
+        fields = ['product', 'movement_type', 'quantity', 'from_warehouse', 'to_warehouse', 'reference', 'notes']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        source = cleaned_data.get('from_warehouse')
+        destination = cleaned_data.get('to_warehouse')
+        if cleaned_data.get('movement_type') == 'transfer':
+            if not source or not destination:
+                raise forms.ValidationError("Transfers need a source and a destination warehouse.")
+            if source == destination:
+                raise forms.ValidationError("Source and destination warehouses must differ.")
+            # Only a new movement moves stock; StockMovement.save would raise InsufficientLocationStock
+            product, quantity = cleaned_data.get('product'), cleaned_data.get('quantity')
+            if self.instance._state.adding and product and quantity:
+                available = ProductLocation.objects.filter(product=product, warehouse=source).values_list(
+                    'quantity', flat=True
+                ).first() or 0
+                if quantity > available:
+                    self.add_error('quantity', f"Only {available} in stock at {source}.")
+        elif source or destination:
+            raise forms.ValidationError("Warehouses are only used for transfers.")
+        return cleaned_data
 
 
 class OrderForm(forms.ModelForm):
@@ -255,4 +318,17 @@ class OrderSearchForm(forms.Form):
     order_type = forms.ChoiceField(choices=[('', 'All Types')] + Order.ORDER_TYPES, required=False, widget=forms.Select(attrs={"class":"form-control"}))
     status = forms.ChoiceField(choices=[('', 'All Statuses')] + Order.ORDER_STATUS, required=False, widget=forms.Select(attrs={"class":"form-control"}))
     date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={"class":"form-control", "type":"date"}), label="From Date")
-    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={"class":"form-control", "type":"date"}), label="To Date")
\ No newline at end of file
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={"class":"form-control", "type":"date"}), label="To Date")
+
+class ReportDateRangeForm(forms.Form):
+    """Date range for inventory reports"""
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={"class":"form-control", "type":"date"}), label="From Date")
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={"class":"form-control", "type":"date"}), label="To Date")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get('date_from')
+        date_to = cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("From date must be on or before the to date.")
+        return cleaned_data
@@ -0,0 +1,207 @@
+"""Global search across customers, products, orders and suppliers.
+
+Every searchable record has one ``SearchDocument`` holding what a result
+shows (title, subtitle, active flag) and ``SearchDocumentTerm`` rows holding
+its lowercase words with a weight per field, the same scheme as the product
+index in ``search.py``. Signals keep documents in step with single saves;
+bulk writers call ``reindex_documents``. A search is one grouped query over
+the ``(term, document)`` index joined to the documents: every query word is
+a prefix range scan, every word must match, and results are ranked by summed
+weights with exact word matches counted double.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import connection, transaction
+from django.db.models import F, Sum, Max, Case, When, Value, IntegerField
+from django.urls import reverse
+
+from .models import Customer, Product, Order, Supplier, SearchDocument, SearchDocumentTerm
+from .search import tokenize, prefix_q, MAX_QUERY_TERMS, MAX_TERMS_PER_FIELD, TERM_MAX_LENGTH
+
+
+SEARCH_KINDS = [kind for kind, _ in SearchDocument.KIND_CHOICES]
+DETAIL_URLS = {
+    'customer': 'customer_record',
+    'product': 'product_detail',
+    'order': 'order_detail',
+    'supplier': 'supplier_detail',
+}
+
+
+def _add_terms(terms, text, weight, whole=False):
+    for token in tokenize(text)[:MAX_TERMS_PER_FIELD]:
+        terms[token] = terms.get(token, 0) + weight
+    # Codes and emails also match as typed, e.g. 'so-0001' or 'ada@'
+    value = (text or '').strip().lower()[:TERM_MAX_LENGTH]
+    if whole and value:
+        terms[value] = terms.get(value, 0) + weight
+
+
+def _customer_document(customer):
+    name = f"{customer.first_name} {customer.last_name}"
+    terms = {}
+    _add_terms(terms, customer.first_name, 4)
+    _add_terms(terms, customer.last_name, 4)
+    _add_terms(terms, customer.email, 2, whole=True)
+    _add_terms(terms, customer.phone, 1)
+    _add_terms(terms, customer.city, 1)
+    return name, customer.email, True, terms
+
+
+def _product_document(product):
+    terms = {}
+    _add_terms(terms, product.sku, 8, whole=True)
+    _add_terms(terms, product.name, 4)
+    _add_terms(terms, product.description, 1)
+    return product.name, product.sku, product.is_active, terms
+
+
+def _order_document(order):
+    if order.order_type == 'sale':
+        party = f"{order.customer.first_name} {order.customer.last_name}" if order.customer_id else ''
+    else:
+        party = order.supplier.name if order.supplier_id else ''
+    terms = {}
+    _add_terms(terms, order.order_number, 8, whole=True)
+    _add_terms(terms, party, 2)
+    subtitle = order.get_order_type_display() + (f" · {party}" if party else '')
+    return order.order_number, subtitle, True, terms
+
+
+def _supplier_document(supplier):
+    terms = {}
+    _add_terms(terms, supplier.name, 4)
+    _add_terms(terms, supplier.contact_person, 2)
+    _add_terms(terms, supplier.email, 2, whole=True)
+    return supplier.name, supplier.contact_person or supplier.email, supplier.is_active, terms
+
+
+# kind -> (queryset factory, document builder)
+DOCUMENT_SOURCES = {
+    'customer': (lambda: Customer.objects.all(), _customer_document),
+    'product': (lambda: Product.objects.all(), _product_document),
+    'order': (lambda: Order.objects.select_related('customer', 'supplier'), _order_document),
+    'supplier': (lambda: Supplier.objects.all(), _supplier_document),
+}
+
+
+def index_document(kind, obj):
+    """Bring one record's document up to date, writing only what changed.
+
+    Returns True when the title changed, so callers can reindex documents
+    that show it (a customer's orders show the customer's name).
+    """
+    title, subtitle, is_active, wanted = DOCUMENT_SOURCES[kind][1](obj)
+    document, created = SearchDocument.objects.get_or_create(
+        kind=kind, object_id=obj.pk,
+        defaults={'title': title, 'subtitle': subtitle, 'is_active': is_active}
+    )
+    title_changed = not created and document.title != title
+    if not created and (document.title, document.subtitle, document.is_active) != (title, subtitle, is_active):
+        document.title, document.subtitle, document.is_active = title, subtitle, is_active
+        document.save(update_fields=['title', 'subtitle', 'is_active', 'updated_at'])
+
+    current = {} if created else dict(document.terms.values_list('term', 'weight'))
+    if current != wanted:
+        with transaction.atomic():
+            stale = [term for term, weight in current.items() if wanted.get(term) != weight]
+            if stale:
+                document.terms.filter(term__in=stale).delete()
+            SearchDocumentTerm.objects.bulk_create([
+                SearchDocumentTerm(document=document, term=term, weight=weight)
+                for term, weight in wanted.items() if current.get(term) != weight
+            ])
+    return title_changed
+
+
+def remove_document(kind, object_id):
+    """Drop a deleted record's document; its terms cascade"""
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def reindex_documents(kind, object_ids, chunk_size=500):
+    """Rebuild the documents of many records of one kind (e.g. after bulk writes).
+
+    Each chunk costs a fixed number of queries; ids whose record no longer
+    exists lose their document.
+    """
+    queryset, build = DOCUMENT_SOURCES[kind]
+    object_ids = sorted(set(object_ids))
+    options = {'update_conflicts': True, 'update_fields': ['title', 'subtitle', 'is_active', 'updated_at']}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['kind', 'object_id']
+
+    for start in range(0, len(object_ids), chunk_size):
+        chunk = object_ids[start:start + chunk_size]
+        records = queryset().in_bulk(chunk)
+        built = {pk: build(record) for pk, record in records.items()}
+        with transaction.atomic():
+            missing = set(chunk) - set(records)
+            if missing:
+                SearchDocument.objects.filter(kind=kind, object_id__in=missing).delete()
+            if not built:
+                continue
+            SearchDocument.objects.bulk_create([
+                SearchDocument(kind=kind, object_id=pk, title=title, subtitle=subtitle, is_active=is_active)
+                for pk, (title, subtitle, is_active, _) in built.items()
+            ], **options)
+            # Not every backend sets primary keys on an upsert
+            document_ids = dict(SearchDocument.objects.filter(kind=kind, object_id__in=built).values_list(
+                'object_id', 'id'
+            ))
+            SearchDocumentTerm.objects.filter(document_id__in=document_ids.values()).delete()
+            SearchDocumentTerm.objects.bulk_create([
+                SearchDocumentTerm(document_id=document_ids[pk], term=term, weight=weight)
+                for pk, (_, _, _, terms) in built.items()
+                for term, weight in terms.items()
+            ], batch_size=1000)
+
+
+def ranked_documents(query, kinds=None, include_inactive=False):
+    """``values`` queryset of matching documents with their ``rank``, one grouped query"""
+    tokens = tokenize(query)[:MAX_QUERY_TERMS]
+    # A code typed with punctuation ('so-0001') also matches its whole-value term
+    whole = (query or '').strip().lower()[:TERM_MAX_LENGTH]
+    if not tokens:
+        return SearchDocumentTerm.objects.none().values('document')
+
+    matched = {
+        f'matched_{i}': Max(Case(When(prefix_q(token), then=Value(1)), default=Value(0),
+                                 output_field=IntegerField()))
+        for i, token in enumerate(tokens)
+    }
+    terms = SearchDocumentTerm.objects.filter(reduce(or_, [prefix_q(t) for t in tokens + [whole]]))
+    if not include_inactive:
+        terms = terms.filter(document__is_active=True)
+    if kinds:
+        terms = terms.filter(document__kind__in=kinds)
+    matches = terms.values(
+        'document', 'document__kind', 'document__object_id', 'document__title', 'document__subtitle'
+    ).annotate(
+        rank=Sum('weight') + Sum(Case(When(term__in=tokens + [whole], then=F('weight')), default=Value(0),
+                                      output_field=IntegerField())),
+        **matched
+    )
+    return matches.filter(**{name: 1 for name in matched})
+
+
+def global_search(query, kinds=None, limit=20, include_inactive=False):
+    """Ranked ``{'type', 'id', 'title', 'subtitle', 'url', 'rank'}`` results for ``query``"""
+    rows = ranked_documents(query, kinds, include_inactive).order_by('-rank', 'document__title', 'document')[:limit]
+    return [
+        {
+            'type': row['document__kind'],
+            'id': row['document__object_id'],
+            'title': row['document__title'],
+            'subtitle': row['document__subtitle'],
+            'url': reverse(DETAIL_URLS[row['document__kind']], args=[row['document__object_id']]),
+            'rank': row['rank'],
+        }
+        for row in rows
+    ]
+
+
+def matching_object_ids(kind, query):
+    """Subquery of ``kind`` record ids matching ``query``, for ``filter(id__in=...)``"""
+    return ranked_documents(query, kinds=[kind], include_inactive=True).values('document__object_id')
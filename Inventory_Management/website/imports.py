@@ -0,0 +1,182 @@
+"""Streaming product import from CSV price lists.
+
+Rows are read one at a time with ``csv.DictReader`` and validated with
+``ProductImportForm`` (the ``ProductForm`` rules, with category and supplier
+given by name). Names are resolved through dictionaries built once per
+import, so validation itself does not query the database. Valid rows are
+written in chunks with one ``bulk_create(update_conflicts=True)`` keyed on
+``sku``: new SKUs are inserted, existing ones have their catalogue fields
+updated. ``quantity_in_stock`` is only used for new products; stock of
+existing products changes through stock movements, never through a price list.
+Likewise new products start active, but a price list never reactivates a
+product that staff deactivated.
+
+``bulk_create`` sends no signals, so each chunk refreshes its products' stock
+cache entries itself, reindexes for search the products that are new or whose
+name or description changed, and appends price history rows for the
+products whose prices changed.
+"""
+import csv
+import io
+import time
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard_stats
+from .global_search import reindex_documents
+from .price_history import record_price_changes
+from .forms import ProductImportForm
+from .models import Product, Category, Supplier
+from .search import reindex_products
+from .stock_cache import refresh_stock_cache_on_commit
+
+
+IMPORT_COLUMNS = [
+    'sku', 'name', 'description', 'category', 'supplier', 'cost_price', 'selling_price',
+    'quantity_in_stock', 'minimum_stock_level', 'maximum_stock_level',
+]
+# Written on conflict; quantity_in_stock, is_active and created_at are left alone
+UPSERT_FIELDS = [
+    'name', 'description', 'category', 'supplier', 'cost_price', 'selling_price',
+    'minimum_stock_level', 'maximum_stock_level', 'updated_at',
+]
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 500
+
+
+class MalformedImportFile(ValueError):
+    """The file can't be read as CSV from ``line`` on (bad encoding, bad quoting, missing columns)"""
+
+    def __init__(self, line, message):
+        self.line = line
+        super().__init__(f"Line {line}: {message}")
+
+
+def name_lookups():
+    """``(categories, suppliers)`` dicts keyed by casefolded name; only active suppliers"""
+    categories = {c.name.casefold(): c for c in Category.objects.all()}
+    suppliers = {s.name.casefold(): s for s in Supplier.objects.filter(is_active=True)}
+    return categories, suppliers
+
+
+def read_rows(source):
+    """Yield ``(line_number, row)`` from a CSV text stream, a binary upload or a path.
+
+    Raises ``MalformedImportFile`` when the header or a later line can't be
+    read; rows before it have already been yielded.
+    """
+    if isinstance(source, str):
+        with open(source, newline='', encoding='utf-8-sig') as handle:
+            yield from read_rows(handle)
+        return
+    if not isinstance(source, io.TextIOBase):
+        source = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(source)
+    try:
+        fieldnames = reader.fieldnames or ()
+    except (csv.Error, UnicodeDecodeError) as exc:
+        raise MalformedImportFile(1, exc) from exc
+    missing = {'sku', 'name', 'category', 'supplier'} - set(fieldnames)
+    if missing:
+        raise MalformedImportFile(1, f"Missing columns: {', '.join(sorted(missing))}")
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except (csv.Error, UnicodeDecodeError) as exc:
+            # Decoding reads ahead, so the bad bytes are on this line or a later one
+            raise MalformedImportFile(reader.line_num + 1, exc) from exc
+        # Header is line 1
+        yield reader.line_num, {column: (row.get(column) or '').strip() for column in IMPORT_COLUMNS}
+
+
+def _upsert(products):
+    """Insert or update one chunk; returns ``(created, updated)``"""
+    skus = [product.sku for product in products]
+    # Search entries only need rebuilding where the SKU is new or its text changed,
+    # and the price series only gets rows where a price changed
+    existing = {
+        row[0]: row[1:] for row in Product.objects.filter(sku__in=skus).values_list(
+            'sku', 'name', 'description', 'cost_price', 'selling_price'
+        )
+    }
+    options = {'update_conflicts': True, 'update_fields': UPSERT_FIELDS}
+    # MySQL upserts on any unique key and rejects an explicit target
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['sku']
+    Product.objects.bulk_create(products, **options)
+
+    # Not every backend sets primary keys on an upsert
+    saved = list(Product.objects.filter(sku__in=skus).only(
+        'id', 'sku', 'name', 'description', 'cost_price', 'selling_price'
+    ))
+    changed = [p for p in saved if existing.get(p.sku, ())[:2] != (p.name, p.description)]
+    reindex_products(changed)
+    reindex_documents('product', [p.pk for p in changed])
+    record_price_changes(
+        (p.pk, existing[p.sku][2:] if p.sku in existing else None, (p.cost_price, p.selling_price)) for p in saved
+    )
+    refresh_stock_cache_on_commit(product.pk for product in saved)
+    return len(products) - len(existing), len(existing)
+
+
+def import_products(source, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Validate and upsert every row of a product CSV.
+
+    Each chunk is written in its own transaction, so a long import keeps what
+    it has written so far. ``progress`` is called after every chunk with the
+    running result. Returns ``{'rows', 'created', 'updated', 'invalid',
+    'errors', 'seconds', 'rows_per_second'}``; ``errors`` holds up to
+    MAX_REPORTED_ERRORS ``{'line', 'sku', 'errors'}`` entries.
+
+    A file that can't be read to the end (see ``MalformedImportFile``) stops
+    the import: the valid rows before the failure are still written, and the
+    result also has ``failed_line`` and ``error``.
+    """
+    started = time.perf_counter()
+    categories, suppliers = name_lookups()
+    result = {'rows': 0, 'created': 0, 'updated': 0, 'invalid': 0, 'errors': []}
+    chunk = {}
+
+    def flush():
+        if chunk:
+            with transaction.atomic():
+                created, updated = _upsert(list(chunk.values()))
+                transaction.on_commit(invalidate_dashboard_stats)
+            result['created'] += created
+            result['updated'] += updated
+            chunk.clear()
+        if progress:
+            progress(result)
+
+    try:
+        for line, row in read_rows(source):
+            result['rows'] += 1
+            form = ProductImportForm(row, categories=categories, suppliers=suppliers)
+            if not form.is_valid():
+                result['invalid'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append({
+                        'line': line,
+                        'sku': row['sku'],
+                        'errors': {field: list(messages) for field, messages in form.errors.items()},
+                    })
+                continue
+            product = form.save(commit=False)
+            # bulk_create does not run pre_save for the conflict update
+            product.updated_at = timezone.now()
+            # A SKU repeated in one chunk keeps its last row
+            chunk[product.sku] = product
+            if len(chunk) >= chunk_size:
+                flush()
+    except MalformedImportFile as exc:
+        result['failed_line'] = exc.line
+        result['error'] = str(exc)
+    flush()
+
+    seconds = time.perf_counter() - started
+    result['seconds'] = round(seconds, 3)
+    result['rows_per_second'] = round(result['rows'] / seconds, 1) if seconds else None
+    return result
@@ -0,0 +1,165 @@
+"""Bulk admin actions run as chunked, set-based jobs.
+
+An admin action turns its selection into a ``BulkActionJob`` holding the
+selected primary keys. Small selections are processed straight away inside
+the request; larger ones are left queued for the ``run_bulk_actions`` worker.
+Either way the ids are processed ``chunk_size`` at a time, each chunk in its
+own transaction, with ``processed`` updated after every chunk so progress
+can be followed from the admin. A failed job resumes after the last
+committed chunk when it is re-queued.
+
+A running job refreshes ``heartbeat_at`` with every chunk. If its worker
+dies, the heartbeat goes stale and ``run_queued_jobs`` queues the job again
+after ``bulk_stale_after()`` seconds, so another worker resumes it.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard_stats
+from .global_search import reindex_documents
+from .models import Product, BulkActionJob
+from .allocation import allocate_orders
+from .orders import transition_orders
+from .stock_cache import refresh_stock_cache_on_commit
+
+
+BULK_ACTIONS = {}
+
+
+def bulk_action(name):
+    """Register ``handler(ids, params, user)`` as the bulk action ``name``.
+
+    A handler may return the number of rows it skipped in its chunk.
+    """
+    def register(handler):
+        BULK_ACTIONS[name] = handler
+        return handler
+    return register
+
+
+def bulk_chunk_size():
+    """Rows handled per transaction (BULK_ACTION_CHUNK_SIZE)"""
+    return getattr(settings, 'BULK_ACTION_CHUNK_SIZE', 500)
+
+
+def bulk_inline_limit():
+    """Largest selection processed inside the request (BULK_ACTION_INLINE_LIMIT)"""
+    return getattr(settings, 'BULK_ACTION_INLINE_LIMIT', 1000)
+
+
+def bulk_stale_after():
+    """Seconds without a committed chunk before a running job is presumed dead (BULK_ACTION_STALE_AFTER)"""
+    return getattr(settings, 'BULK_ACTION_STALE_AFTER', 15 * 60)
+
+
+def enqueue_bulk_action(action, queryset, user, params=None):
+    """Queue ``action`` over every row of ``queryset``; small selections run at once"""
+    if action not in BULK_ACTIONS:
+        raise ValueError(f"Unknown bulk action '{action}'")
+    object_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    job = BulkActionJob.objects.create(
+        action=action,
+        object_ids=object_ids,
+        params=params or {},
+        total=len(object_ids),
+        created_by=user
+    )
+    if len(object_ids) <= bulk_inline_limit():
+        run_job(job)
+    return job
+
+
+def run_job(job, chunk_size=None):
+    """Process a queued job chunk by chunk; returns False if another worker claimed it"""
+    now = timezone.now()
+    claimed = BulkActionJob.objects.filter(pk=job.pk, status='queued').update(
+        status='running', started_at=now, heartbeat_at=now
+    )
+    if not claimed:
+        return False
+    job.refresh_from_db()
+
+    handler = BULK_ACTIONS.get(job.action)
+    chunk_size = chunk_size or bulk_chunk_size()
+    skipped = 0
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown bulk action '{job.action}'")
+        for start in range(job.processed, len(job.object_ids), chunk_size):
+            chunk = job.object_ids[start:start + chunk_size]
+            with transaction.atomic():
+                skipped += handler(chunk, job.params, job.created_by) or 0
+                BulkActionJob.objects.filter(pk=job.pk).update(
+                    processed=F('processed') + len(chunk), heartbeat_at=timezone.now()
+                )
+    except Exception as exc:
+        BulkActionJob.objects.filter(pk=job.pk).update(
+            status='failed', message=str(exc), finished_at=timezone.now()
+        )
+    else:
+        BulkActionJob.objects.filter(pk=job.pk).update(
+            status='done', message=f'{skipped} rows skipped: action not allowed for them.' if skipped else '',
+            finished_at=timezone.now()
+        )
+    job.refresh_from_db()
+    return True
+
+
+def requeue_stale_jobs():
+    """Queue running jobs whose worker stopped sending heartbeats; returns how many"""
+    cutoff = timezone.now() - timedelta(seconds=bulk_stale_after())
+    return BulkActionJob.objects.filter(status='running', heartbeat_at__lt=cutoff).update(
+        status='queued', message='Queued again: its worker stopped responding.'
+    )
+
+
+def run_queued_jobs(limit=None, chunk_size=None):
+    """Requeue stale jobs, then run queued jobs oldest first; returns how many this worker ran"""
+    requeue_stale_jobs()
+    queued = BulkActionJob.objects.filter(status='queued').order_by('created_at', 'id').only('id')
+    if limit:
+        queued = queued[:limit]
+    ran = 0
+    for job in queued:
+        if run_job(job, chunk_size=chunk_size):
+            ran += 1
+    return ran
+
+
+# ========================================================================
+# REGISTERED ACTIONS
+# ========================================================================
+
+@bulk_action('product.mark_low_stock')
+def mark_products_low_stock(ids, params, user):
+    """Set minimum stock level to current stock + 5 with one UPDATE"""
+    Product.objects.filter(pk__in=ids).update(
+        minimum_stock_level=F('quantity_in_stock') + 5, updated_at=timezone.now()
+    )
+    transaction.on_commit(invalidate_dashboard_stats)
+    refresh_stock_cache_on_commit(ids)
+
+
+@bulk_action('product.set_active')
+def set_products_active(ids, params, user):
+    """Activate or deactivate products (``params['is_active']``)"""
+    Product.objects.filter(pk__in=ids).update(is_active=params['is_active'], updated_at=timezone.now())
+    transaction.on_commit(invalidate_dashboard_stats)
+    refresh_stock_cache_on_commit(ids)
+    reindex_documents('product', ids)
+
+
+@bulk_action('order.set_status')
+def set_order_status(ids, params, user):
+    """Run the orders through the status transition engine"""
+    return len(transition_orders(ids, params['status'], user)['rejected'])
+
+
+@bulk_action('order.allocate')
+def allocate_order_stock(ids, params, user):
+    """Pick warehouses for the orders; orders short of stock are skipped"""
+    return len(allocate_orders(ids, user)['short'])
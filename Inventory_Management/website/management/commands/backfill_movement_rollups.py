@@ -0,0 +1,65 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from website.models import StockMovement, StockMovementDailyRollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild StockMovementDailyRollup from the StockMovement ledger, one day at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='date_to', help="Last day to rebuild (YYYY-MM-DD)")
+
+    def parse_date(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        first = StockMovement.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        if first is None:
+            self.stdout.write("No stock movements to roll up.")
+            return
+        date_from = self.parse_date(options['date_from']) if options['date_from'] else \
+            StockMovementDailyRollup.movement_date(first)
+        date_to = self.parse_date(options['date_to']) if options['date_to'] else timezone.localdate()
+
+        day, rows = date_from, 0
+        while day <= date_to:
+            rows += self.rebuild_day(day)
+            day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows} rollup rows for {date_from} to {date_to}."
+        ))
+
+    def rebuild_day(self, day):
+        """Replace one day's rollup rows with a single aggregate over that day's movements"""
+        start = datetime.combine(day, time.min)
+        end = datetime.combine(day + timedelta(days=1), time.min)
+        if settings.USE_TZ:
+            start, end = timezone.make_aware(start), timezone.make_aware(end)
+
+        totals = StockMovement.objects.filter(created_at__gte=start, created_at__lt=end).values(
+            'product', 'movement_type'
+        ).annotate(
+            movement_count=Count('id'),
+            total_quantity=Sum('quantity')
+        ).order_by()
+
+        with transaction.atomic():
+            StockMovementDailyRollup.objects.filter(date=day).delete()
+            created = StockMovementDailyRollup.objects.bulk_create([
+                StockMovementDailyRollup(
+                    date=day, product_id=row['product'], movement_type=row['movement_type'],
+                    movement_count=row['movement_count'], total_quantity=row['total_quantity']
+                )
+                for row in totals.iterator()
+            ], batch_size=1000)
+        return len(created)
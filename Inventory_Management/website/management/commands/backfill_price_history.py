@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from website.models import Product, ProductPriceChange
+
+
+class Command(BaseCommand):
+    help = "Start the price series of products that have none with their current prices"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        products = Product.objects.filter(
+            ~Exists(ProductPriceChange.objects.filter(product=OuterRef('pk')))
+        ).order_by('id').values_list('id', 'updated_at', 'cost_price', 'selling_price')
+
+        batch, total = [], 0
+        for product_id, updated_at, cost_price, selling_price in products.iterator(chunk_size=batch_size):
+            # The last save is the earliest moment the current prices are known to hold
+            batch.append(ProductPriceChange(product_id=product_id, changed_at=updated_at,
+                                            cost_price=cost_price, selling_price=selling_price))
+            if len(batch) == batch_size:
+                ProductPriceChange.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        ProductPriceChange.objects.bulk_create(batch)
+        total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Started the price series of {total} products."))
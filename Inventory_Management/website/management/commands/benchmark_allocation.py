@@ -0,0 +1,91 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from website.allocation import ALLOCATABLE_STATUSES, LocationIndex, allocate_orders, plan_allocations
+from website.models import Order, OrderItem, ProductLocation, Warehouse
+
+
+class Command(BaseCommand):
+    help = ("Measure allocation throughput: in-memory planning on synthetic lines, then allocate_orders "
+            "end to end on the database's open sales orders (rolled back)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=50000)
+        parser.add_argument('--lines-per-order', type=int, default=5)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--warehouses', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=2000,
+                            help="Open sales orders to allocate end to end (0 to only time planning)")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.benchmark_planning(rng, options)
+        if options['orders']:
+            self.benchmark_allocate_orders(rng, options)
+
+    def benchmark_planning(self, rng, options):
+        products, warehouses = options['products'], options['warehouses']
+        rows = [
+            (product * warehouses + warehouse, product, warehouse, rng.randint(0, 200))
+            for product in range(products)
+            for warehouse in range(warehouses)
+        ]
+        lines = [
+            (number, number // options['lines_per_order'], rng.randrange(products), rng.randint(1, 40))
+            for number in range(options['lines'])
+        ]
+
+        started = time.perf_counter()
+        index = LocationIndex(rows)
+        allocations, shortages = plan_allocations(lines, index)
+        elapsed = time.perf_counter() - started
+
+        picks = sum(len(picks) for picks in allocations.values())
+        self.stdout.write(
+            f"Planned {len(lines)} lines ({len(allocations)} orders allocated, {len(shortages)} short, "
+            f"{picks} picks) in {elapsed:.3f}s: {len(lines) / elapsed:,.0f} lines/s."
+        )
+
+    def benchmark_allocate_orders(self, rng, options):
+        """Time the locking reads, OrderAllocation insert and location updates too"""
+        order_ids = list(Order.objects.filter(
+            order_type='sale', status__in=ALLOCATABLE_STATUSES, items__allocations__isnull=True
+        ).order_by('id').values_list('id', flat=True).distinct()[:options['orders']])
+        if not order_ids:
+            self.stdout.write("No open sales orders to allocate; generate them with generate_synthetic_data.")
+            return
+        user, _ = User.objects.get_or_create(username='benchmark')
+
+        with transaction.atomic():
+            # Stock every ordered product in fresh warehouses; all of it is rolled back afterwards
+            product_ids = set(OrderItem.objects.filter(order_id__in=order_ids).values_list('product_id', flat=True))
+            warehouses = Warehouse.objects.bulk_create([
+                Warehouse(name=f"Benchmark {number}", address="1 Bench St", city="Bench", state="BE",
+                          zipcode="00000", manager=user)
+                for number in range(options['warehouses'])
+            ])
+            if any(warehouse.pk is None for warehouse in warehouses):
+                # Not every backend sets primary keys on bulk_create
+                warehouses = list(Warehouse.objects.filter(name__startswith="Benchmark ", manager=user))
+            ProductLocation.objects.bulk_create([
+                ProductLocation(product_id=product_id, warehouse=warehouse, quantity=rng.randint(0, 200))
+                for product_id in sorted(product_ids)
+                for warehouse in warehouses
+            ], batch_size=1000)
+            lines = OrderItem.objects.filter(order_id__in=order_ids, allocations__isnull=True).count()
+
+            started = time.perf_counter()
+            result = allocate_orders(order_ids, user)
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"Allocated {len(order_ids)} orders ({lines} lines, {len(result['allocated'])} allocated, "
+            f"{len(result['short'])} short, {result['allocations']} allocations) with allocate_orders "
+            f"in {elapsed:.3f}s: {lines / elapsed:,.0f} lines/s."
+        )
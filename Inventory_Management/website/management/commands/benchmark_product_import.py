@@ -0,0 +1,47 @@
+import csv
+import io
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from website.imports import IMPORT_CHUNK_SIZE, IMPORT_COLUMNS, import_products
+from website.models import Category, Supplier
+
+
+class Command(BaseCommand):
+    help = "Measure product import throughput (rows/s) on a synthetic price list; rolled back unless --keep"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000)
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument('--update', action='store_true', help="Import the file twice and time the update pass")
+        parser.add_argument('--keep', action='store_true', help="Commit the imported products")
+
+    def price_list(self, rows, category, supplier):
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow(IMPORT_COLUMNS)
+        for number in range(rows):
+            writer.writerow([
+                f"BENCH-{number:07d}", f"Benchmark item {number}", "Synthetic benchmark product",
+                category, supplier, f"{5 + number % 50}.25", f"{9 + number % 50}.99", number % 300, 10, 1000,
+            ])
+        text.seek(0)
+        return text
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            category, _ = Category.objects.get_or_create(name="Benchmark")
+            supplier, _ = Supplier.objects.get_or_create(
+                name="Benchmark Supplier", defaults={'contact_person': "Bench", 'email': "bench@example.test"}
+            )
+            passes = 2 if options['update'] else 1
+            for _ in range(passes):
+                result = import_products(self.price_list(options['rows'], category.name, supplier.name),
+                                         chunk_size=options['chunk_size'])
+            self.stdout.write(
+                f"Imported {result['rows']} rows ({result['created']} created, {result['updated']} updated, "
+                f"{result['invalid']} invalid) in {result['seconds']:.3f}s: {result['rows_per_second']:,.0f} rows/s."
+            )
+            if not options['keep']:
+                transaction.set_rollback(True)
@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website.exports import EXPORTS, EXPORT_FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream products, customers or orders (with their lines) to CSV or JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', help="File to write (defaults to stdout)")
+        parser.add_argument('--filter', action='append', default=[], metavar='FIELD=VALUE',
+                            help="Search form filter, e.g. --filter status=pending (repeatable)")
+
+    def handle(self, *args, **options):
+        params = {}
+        for item in options['filter']:
+            field, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f"Filters must look like FIELD=VALUE, got '{item}'")
+            params[field] = value
+
+        chunks = stream_export(options['kind'], options['format'], params)
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as handle:
+                handle.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from website.forecasting import run_forecasts
+
+
+class Command(BaseCommand):
+    help = "Forecast daily demand per product from 'out' movements (run from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Worker processes (defaults to the CPU count; 1 runs in-process)")
+        parser.add_argument('--batch-size', type=int, default=500, help="Products per batch")
+
+    def handle(self, *args, **options):
+        run_at, count = run_forecasts(workers=options['workers'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast {count} products (run {run_at:%Y-%m-%d %H:%M:%S})."
+        ))
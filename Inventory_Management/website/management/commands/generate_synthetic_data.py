@@ -0,0 +1,39 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from website.synthetic import PRESETS, SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = "Write seeded synthetic products, customers, orders and stock movements for benchmarking"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=sorted(PRESETS), default='small',
+                            help="Row counts to start from; large is 100k products, 1M customers, 10M movements")
+        for kind in ('products', 'customers', 'orders', 'movements'):
+            parser.add_argument(f'--{kind}', type=int, help=f"Number of {kind} (overrides the preset)")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=365, help="Spread orders and movements over this many days")
+        parser.add_argument('--user', default='synthetic', help="Username recorded as creator (created if missing)")
+        parser.add_argument('--index', action='store_true', help="Also build the search indexes for the new rows")
+
+    def handle(self, *args, **options):
+        counts = {kind: options[kind] if options[kind] is not None else count
+                  for kind, count in PRESETS[options['preset']].items()}
+        user, _ = User.objects.get_or_create(username=options['user'])
+        generator = SyntheticDataGenerator(
+            user, seed=options['seed'], batch_size=options['batch_size'], days=options['days'],
+            progress=self.stdout.write if options['verbosity'] > 1 else None
+        )
+
+        started = time.perf_counter()
+        written = generator.run(index=options['index'], **counts)
+        elapsed = time.perf_counter() - started
+        rows = sum(written.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written['products']} products, {written['customers']} customers, {written['orders']} orders "
+            f"and {written['movements']} movements in {elapsed:.1f}s: {rows / elapsed:,.0f} rows/s."
+        ))
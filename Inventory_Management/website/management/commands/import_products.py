@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from website.imports import IMPORT_CHUNK_SIZE, import_products
+
+
+class Command(BaseCommand):
+    help = "Validate and upsert products from a CSV price list, keyed on SKU"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with sku, name, category, supplier, prices and stock levels")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        def progress(result):
+            self.stdout.write(f"Read {result['rows']} rows: {result['created']} created, "
+                              f"{result['updated']} updated, {result['invalid']} invalid...")
+
+        try:
+            result = import_products(options['path'], chunk_size=options['chunk_size'], progress=progress)
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for error in result['errors']:
+            details = '; '.join(f"{field}: {' '.join(messages)}" for field, messages in error['errors'].items())
+            self.stderr.write(f"Line {error['line']} ({error['sku'] or 'no SKU'}): {details}")
+        if result['invalid'] > len(result['errors']):
+            self.stderr.write(f"... and {result['invalid'] - len(result['errors'])} more invalid rows.")
+        summary = (
+            f"Imported {result['rows']} rows in {result['seconds']:.3f}s ({result['rows_per_second'] or 0:,.0f} rows/s): "
+            f"{result['created']} created, {result['updated']} updated, {result['invalid']} invalid."
+        )
+        if 'error' in result:
+            self.stdout.write(summary)
+            raise CommandError(f"Stopped at {result['error']}")
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,45 @@
+import csv
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from website.stock import parse_movement_batch, transfer_stock
+
+
+class Command(BaseCommand):
+    help = "Apply a CSV or JSON rebalancing plan of inter-warehouse transfers in one transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON file with product/sku, from_warehouse, to_warehouse, quantity")
+        parser.add_argument('--user', required=True, help="Username recorded as created_by")
+        parser.add_argument('--format', choices=['csv', 'json'], help="Defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+
+        fmt = options['format'] or ('json' if options['path'].lower().endswith('.json') else 'csv')
+        if not os.path.exists(options['path']):
+            raise CommandError(f"File '{options['path']}' does not exist")
+        with open(options['path'], 'rb') as handle:
+            try:
+                rows = parse_movement_batch(handle.read(), fmt)
+            except (ValueError, csv.Error) as exc:
+                raise CommandError(f"Could not parse plan: {exc}")
+
+        result = transfer_stock(rows, user, batch_size=options['batch_size'])
+        for error in result['errors']:
+            details = '; '.join(f"{field}: {message}" for field, message in error['errors'].items())
+            self.stderr.write(f"Row {error['row']}: {details}")
+        for shortage in result['shortages']:
+            self.stderr.write(
+                f"Product {shortage['product_id']} at warehouse {shortage['warehouse_id']}: "
+                f"{shortage['available']} available, {shortage['requested']} requested"
+            )
+        if result['errors'] or result['shortages']:
+            raise CommandError("Plan rejected; nothing was transferred.")
+        self.stdout.write(self.style.SUCCESS(f"Transferred stock on {result['created']} lines."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from website.models import Product
+from website.search import reindex_products
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search index from every product's SKU, name and description"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        products = Product.objects.only('id', 'sku', 'name', 'description').order_by('id')
+        chunk, total = [], 0
+        for product in products.iterator(chunk_size=chunk_size):
+            chunk.append(product)
+            if len(chunk) == chunk_size:
+                reindex_products(chunk, chunk_size=chunk_size)
+                total += len(chunk)
+                chunk = []
+                self.stdout.write(f"Indexed {total} products...")
+        if chunk:
+            reindex_products(chunk, chunk_size=chunk_size)
+            total += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} products."))
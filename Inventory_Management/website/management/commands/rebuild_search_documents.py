@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from website.global_search import SEARCH_KINDS, DOCUMENT_SOURCES, reindex_documents
+
+
+class Command(BaseCommand):
+    help = "Rebuild the global search documents for customers, products, orders and suppliers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kinds', nargs='*', metavar='KIND',
+                            help=f"Kinds to rebuild ({', '.join(SEARCH_KINDS)}); all by default")
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        unknown = set(options['kinds']) - set(SEARCH_KINDS)
+        if unknown:
+            raise CommandError(f"Unknown kind(s): {', '.join(sorted(unknown))}")
+        for kind in options['kinds'] or SEARCH_KINDS:
+            ids = DOCUMENT_SOURCES[kind][0]().order_by('pk').values_list('pk', flat=True)
+            chunk, total = [], 0
+            for pk in ids.iterator(chunk_size=chunk_size):
+                chunk.append(pk)
+                if len(chunk) == chunk_size:
+                    reindex_documents(kind, chunk, chunk_size=chunk_size)
+                    total += len(chunk)
+                    chunk = []
+                    self.stdout.write(f"Indexed {total} {kind} documents...")
+            if chunk:
+                reindex_documents(kind, chunk, chunk_size=chunk_size)
+                total += len(chunk)
+            self.stdout.write(self.style.SUCCESS(f"Indexed {total} {kind} documents."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from website.stock_cache import reconcile_stock_cache
+
+
+class Command(BaseCommand):
+    help = "Compare the cached stock entries with the database and optionally repair them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Rewrite stale or mismatched entries")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        report = reconcile_stock_cache(fix=options['fix'], batch_size=options['batch_size'])
+        self.stdout.write(
+            f"Checked {report['checked']} products: {report['missing']} not cached, "
+            f"{report['stale']} stale, {report['mismatched']} mismatched, {report['fixed']} fixed."
+        )
@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from website.replenishment import replenish
+
+
+class Command(BaseCommand):
+    help = "Compute reorder points for the catalogue and create draft purchase orders per supplier"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help="Username recorded as created_by")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be ordered without writing")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+
+        try:
+            result = replenish(user, dry_run=options['dry_run'])
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(
+            f"Checked {result['products']} products: {result['products_to_order']} need "
+            f"{result['units_to_order']} units."
+        )
+        if result['orders']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Created {len(result['orders'])} draft purchase orders: {', '.join(result['orders'])}."
+            ))
@@ -0,0 +1,50 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from website.benchmarks import compare_results, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = "Time the main pages and model write paths and write the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='benchmark-results.json', help="JSON file to write ('-' for stdout)")
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument('--only', nargs='+', metavar='NAME', help="Run only these benchmarks")
+        parser.add_argument('--compare', metavar='PATH', help="Earlier results to compare medians with")
+        parser.add_argument('--user', default='benchmark', help="Username to request pages as (created if missing)")
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as handle:
+                    previous = json.load(handle)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read {options['compare']}: {exc}")
+
+        user, _ = User.objects.get_or_create(username=options['user'])
+        report = run_benchmarks(user, repeat=options['repeat'], warmup=options['warmup'], only=options['only'])
+
+        text = json.dumps(report, indent=2)
+        # Keep stdout parseable when the JSON goes there
+        summary = self.stderr if options['output'] == '-' else self.stdout
+        if options['output'] == '-':
+            self.stdout.write(text)
+        else:
+            with open(options['output'], 'w') as handle:
+                handle.write(text + '\n')
+
+        for name, result in report['results'].items():
+            note = '' if result.get('rendered', True) else '  (template missing)'
+            summary.write(
+                f"{name:28} median {result['median_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms  "
+                f"{result['queries']:3d} queries{note}"
+            )
+        if previous:
+            for name, before, after, ratio in compare_results(previous, report):
+                change = f"{(ratio - 1) * 100:+.1f}%" if ratio is not None else 'n/a'
+                summary.write(f"{name:28} {before:9.2f} -> {after:9.2f} ms  {change}")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from website.jobs import run_queued_jobs
+
+
+class Command(BaseCommand):
+    help = "Work through queued bulk admin actions in fixed-size chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Run the jobs queued now and exit instead of polling")
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help="Seconds to wait between polls when the queue is empty")
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        while True:
+            ran = run_queued_jobs(chunk_size=options['chunk_size'])
+            if ran:
+                self.stdout.write(f"Ran {ran} bulk action job(s).")
+            if options['once']:
+                break
+            if not ran:
+                time.sleep(options['interval'])
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from website.snapshots import take_snapshot, snapshot_interval
+
+
+class Command(BaseCommand):
+    help = "Record per-product and per-warehouse stock balances (run from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Take a snapshot even if the last one is younger than the interval")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        taken_at = take_snapshot(batch_size=options['batch_size'], force=options['force'])
+        if taken_at is None:
+            self.stdout.write(f"Skipped: last snapshot is younger than {snapshot_interval()}.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Stock snapshot taken at {taken_at:%Y-%m-%d %H:%M:%S}."))
@@ -0,0 +1,40 @@
+"""Request middleware for the website app.
+
+Add ``'website.middleware.QueryMetricsMiddleware'`` to ``MIDDLEWARE``, after
+the authentication middleware, to collect per-view query metrics.
+"""
+import logging
+import time
+
+from .query_metrics import METRICS, QueryRecorder
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryMetricsMiddleware:
+    """Record query count, database time, repeated queries and wall time per view.
+
+    Streamed responses (the exports) run their queries while the body is
+    sent, after this middleware has returned, so only their setup is counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        seconds = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        budget = getattr(match.func, 'query_budget', None) if match else None
+        repeated = METRICS.record(view, recorder, seconds, budget)
+        if repeated:
+            sql, count = repeated[0]
+            logger.warning("Possible N+1 in %s: %d runs of %s", view, count, sql)
+        if budget is not None and recorder.count > budget:
+            logger.warning("%s ran %d queries, over its budget of %d", view, recorder.count, budget)
+        return response
@@ -1,6 +1,13 @@
-from django.db import models
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Sum, Case, When, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
 
 class Customer(models.Model):
@@ -29,6 +36,12 @@ class Customer(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the customer panel seeks on (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='customer_created_id_idx'),
+            models.Index(fields=['last_name'], name='customer_last_name_idx'),
+            models.Index(fields=['email'], name='customer_email_idx'),
+        ]
 
 class Category(models.Model):
     """Product categories for organization"""
@@ -101,8 +114,60 @@ class Product(models.Model):
             return ((self.selling_price - self.cost_price) / self.selling_price) * 100
         return 0
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Prices as loaded, so a save can tell whether they changed (None if deferred)
+        instance._loaded_prices = (instance.__dict__.get('cost_price'), instance.__dict__.get('selling_price'))
+        return instance
+
+    # Products per UPDATE statement when posting many deltas at once
+    STOCK_UPDATE_CHUNK_SIZE = 500
+
+    @classmethod
+    def apply_stock_deltas(cls, deltas):
+        """Add signed quantities to stock in the database.
+
+        ``deltas`` maps product id to the net change. The increment is done with
+        an F() expression so concurrent writers never lose updates, and only the
+        stock column (plus ``updated_at``) is written. Many products are posted
+        with one ``UPDATE ... CASE`` per chunk, and rows are visited in id order
+        so competing transactions take row locks in the same order.
+        """
+        changes = sorted((pk, delta) for pk, delta in deltas.items() if delta)
+        now = timezone.now()
+        for start in range(0, len(changes), cls.STOCK_UPDATE_CHUNK_SIZE):
+            chunk = changes[start:start + cls.STOCK_UPDATE_CHUNK_SIZE]
+            cls.objects.filter(pk__in=[pk for pk, _ in chunk]).update(
+                quantity_in_stock=F('quantity_in_stock') + Case(
+                    *[When(pk=pk, then=Value(delta)) for pk, delta in chunk],
+                    output_field=models.IntegerField()
+                ),
+                updated_at=now
+            )
+
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+        ]
+
+
+class ProductSearchTerm(models.Model):
+    """Inverted index entry: one normalized word from a product's SKU, name or description"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.term} -> {self.product_id} ({self.weight})"
+
+    class Meta:
+        unique_together = ['product', 'term']
+        indexes = [
+            # Prefix lookups are range scans on term
+            models.Index(fields=['term', 'product'], name='search_term_product_idx'),
+        ]
 
 
 class StockMovement(models.Model):
@@ -115,32 +180,227 @@ class StockMovement(models.Model):
         ('damaged', 'Damaged'),
         ('expired', 'Expired')
     ]
+    INBOUND_TYPES = ['in']
+    OUTBOUND_TYPES = ['out', 'damaged', 'expired']
 
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
     movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPES)
     quantity = models.IntegerField(validators=[MinValueValidator(1)])
     reference = models.CharField(max_length=100, blank=True, help_text="Reference number (PO, SO, etc.)")
     notes = models.TextField(blank=True)
+    # Source and destination of 'transfer' movements
+    from_warehouse = models.ForeignKey('Warehouse', on_delete=models.PROTECT, related_name='transfers_out', null=True, blank=True)
+    to_warehouse = models.ForeignKey('Warehouse', on_delete=models.PROTECT, related_name='transfers_in', null=True, blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.product.name} - {self.movement_type} - {self.quantity}"
 
-    def save(self, *args, **kwargs):
-        """Automatically update product stock when saving movement"""
-        super().save(*args, **kwargs)
-        product = self.product
+    @classmethod
+    def stock_delta(cls, movement_type, quantity):
+        """Signed change in on-hand stock caused by a movement"""
+        if movement_type in cls.INBOUND_TYPES:
+            return quantity
+        if movement_type in cls.OUTBOUND_TYPES:
+            return -quantity
+        return 0
 
-        if self.movement_type == 'in':
-            product.quantity_in_stock += self.quantity
-        elif self.movement_type in ['out', 'damaged', 'expired']:
-            product.quantity_in_stock -= self.quantity
+    @property
+    def delta(self):
+        return self.stock_delta(self.movement_type, self.quantity)
 
-        product.save()
+    @property
+    def is_location_transfer(self):
+        return self.movement_type == 'transfer' and bool(self.from_warehouse_id and self.to_warehouse_id)
+
+    def save(self, *args, **kwargs):
+        """Record the movement and post its delta to product stock atomically"""
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Only a new movement changes stock; re-saving an existing row
+            # (e.g. editing notes in the admin) must not post it twice.
+            if is_new:
+                StockMovementDailyRollup.record([self])
+            if is_new and self.is_location_transfer:
+                ProductLocation.move_quantities([
+                    (self.product_id, self.from_warehouse_id, self.to_warehouse_id, self.quantity)
+                ])
+            if is_new and self.delta:
+                Product.apply_stock_deltas({self.product_id: self.delta})
+                if StockMovement.product.is_cached(self):
+                    self.product.refresh_from_db(fields=['quantity_in_stock', 'updated_at'])
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='movement_created_id_idx'),
+            models.Index(fields=['product', 'created_at'], name='movement_product_created_idx'),
+        ]
+
+
+class StockMovementDailyRollup(models.Model):
+    """Per-day movement count and quantity for each product and movement type.
+
+    Maintained in the same transaction as every movement, so reports can read
+    any date range from this table instead of aggregating StockMovement.
+    """
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='movement_rollups')
+    movement_type = models.CharField(max_length=20, choices=StockMovement.MOVEMENT_TYPES)
+    movement_count = models.PositiveIntegerField(default=0)
+    total_quantity = models.BigIntegerField(default=0)
+
+    # Rollup rows per UPDATE statement when recording many movements at once
+    UPDATE_CHUNK_SIZE = 500
+
+    def __str__(self):
+        return f"{self.date} {self.product_id} {self.movement_type}: {self.movement_count}"
+
+    @staticmethod
+    def movement_date(created_at):
+        if timezone.is_aware(created_at):
+            return timezone.localdate(created_at)
+        return created_at.date()
+
+    @classmethod
+    def record(cls, movements):
+        """Add saved movements to their daily rollup rows.
+
+        Existing rows are incremented with F() expressions in one ``UPDATE ...
+        CASE`` per chunk and missing rows are bulk inserted, so the cost does
+        not depend on how many movements were already recorded that day.
+        """
+        totals = {}
+        for movement in movements:
+            key = (cls.movement_date(movement.created_at), movement.product_id, movement.movement_type)
+            count, quantity = totals.get(key, (0, 0))
+            totals[key] = (count + 1, quantity + movement.quantity)
+        if not totals:
+            return
+
+        with transaction.atomic(savepoint=False):
+            existing = {
+                (row.date, row.product_id, row.movement_type): row.pk
+                for row in cls.objects.filter(
+                    date__in={key[0] for key in totals},
+                    product_id__in={key[1] for key in totals}
+                ).only('id', 'date', 'product_id', 'movement_type')
+            }
+            cls._increment([(existing[key], totals[key]) for key in totals if key in existing])
+            missing = [key for key in totals if key not in existing]
+            if missing:
+                try:
+                    with transaction.atomic():
+                        cls.objects.bulk_create([
+                            cls(date=key[0], product_id=key[1], movement_type=key[2],
+                                movement_count=totals[key][0], total_quantity=totals[key][1])
+                            for key in missing
+                        ])
+                except IntegrityError:
+                    # A concurrent writer created some of these rows first
+                    for key in missing:
+                        row, _ = cls.objects.get_or_create(
+                            date=key[0], product_id=key[1], movement_type=key[2]
+                        )
+                        cls._increment([(row.pk, totals[key])])
+
+    @classmethod
+    def _increment(cls, changes):
+        for start in range(0, len(changes), cls.UPDATE_CHUNK_SIZE):
+            chunk = changes[start:start + cls.UPDATE_CHUNK_SIZE]
+            cls.objects.filter(pk__in=[pk for pk, _ in chunk]).update(
+                movement_count=F('movement_count') + Case(
+                    *[When(pk=pk, then=Value(count)) for pk, (count, _) in chunk],
+                    output_field=models.IntegerField()
+                ),
+                total_quantity=F('total_quantity') + Case(
+                    *[When(pk=pk, then=Value(quantity)) for pk, (_, quantity) in chunk],
+                    output_field=models.BigIntegerField()
+                )
+            )
+
+    class Meta:
+        unique_together = ['date', 'product', 'movement_type']
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date', 'movement_type'], name='rollup_date_type_idx'),
+        ]
+
+
+class OrderNumberSequence(models.Model):
+    """Per-prefix counter used to allocate order numbers without scanning Order"""
+    prefix = models.CharField(max_length=10, unique=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.prefix}: {self.last_value}"
+
+    @classmethod
+    def reserve(cls, prefix, count=1):
+        """Atomically reserve ``count`` consecutive numbers, returning ``(first, last)``"""
+        with transaction.atomic():
+            if not cls.objects.filter(prefix=prefix).update(last_value=F('last_value') + count):
+                cls._create_for_prefix(prefix)
+                cls.objects.filter(prefix=prefix).update(last_value=F('last_value') + count)
+            last = cls.objects.filter(prefix=prefix).values_list('last_value', flat=True).get()
+        return last - count + 1, last
+
+    @classmethod
+    def _create_for_prefix(cls, prefix):
+        """Start a new counter after the highest order number already issued.
+
+        Runs once per prefix. Numbers are compared by their parsed numeric
+        suffix, not as text ('SO-1000000' sorts before 'SO-999999'), and legacy
+        numbers without one are ignored.
+        """
+        highest = 0
+        numbers = Order.objects.filter(order_number__startswith=f"{prefix}-").values_list('order_number', flat=True)
+        for number in numbers.iterator():
+            try:
+                highest = max(highest, int(number.rsplit('-', 1)[1]))
+            except ValueError:
+                continue
+        try:
+            with transaction.atomic():
+                cls.objects.create(prefix=prefix, last_value=highest)
+        except IntegrityError:
+            # Another worker created the counter first
+            pass
+
+
+class OrderNumberAllocator:
+    """Hands out order numbers from blocks reserved in OrderNumberSequence.
+
+    Each process reserves ``ORDER_NUMBER_BLOCK_SIZE`` numbers at a time (1 by
+    default) and serves them from memory, so busy order entry only touches the
+    counter row once per block. Numbers left in a block when a process exits
+    are skipped, which leaves gaps but never duplicates.
+
+    A block is only cached when it was reserved in autocommit mode. Inside an
+    outer transaction the reservation could still be rolled back and handed to
+    another worker, so only a single number is taken.
+    """
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def next_number(self, prefix):
+        with self._lock:
+            start, end = self._blocks.get(prefix, (1, 0))
+            if start > end:
+                size = self.block_size or getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 1)
+                if transaction.get_connection().in_atomic_block:
+                    size = 1
+                start, end = OrderNumberSequence.reserve(prefix, size)
+            self._blocks[prefix] = (start + 1, end)
+        return start
+
+
+order_numbers = OrderNumberAllocator()
 
 
 class Order(models.Model):
@@ -159,6 +419,8 @@ class Order(models.Model):
         ('sale', 'Sales Order'),
         ('purchase', 'Purchase Order')
     ]
+    # Sales orders in these states have had their stock deducted
+    STOCK_COMMITTED_STATUSES = ['confirmed', 'processing', 'shipped', 'delivered']
 
     order_number = models.CharField(max_length=50, unique=True)
     order_type = models.CharField(max_length=20, choices=ORDER_TYPES)
@@ -176,20 +438,39 @@ class Order(models.Model):
     def __str__(self):
         return f"{self.order_number} - {self.order_type} - {self.status}"
 
+    def assign_order_number(self):
+        """Auto-generate order number from the per-prefix sequence"""
+        prefix = 'SO' if self.order_type == 'sale' else 'PO'
+        self.order_number = f"{prefix}-{order_numbers.next_number(prefix):06d}"
+
     def save(self, *args, **kwargs):
         if not self.order_number:
-            # Auto-generate order number
-            prefix = 'SO' if self.order_type == 'sale' else 'PO'
-            last_order = Order.objects.filter(order_type=self.order_type).order_by('-id').first()
-            if last_order:
-                last_num = int(last_order.order_number.split('-')[1])
-                self.order_number = f"{prefix}-{last_num + 1:06d}"
-            else:
-                self.order_number = f"{prefix}-000001"
+            self.assign_order_number()
         super().save(*args, **kwargs)
 
+    @property
+    def commits_stock(self):
+        return self.order_type == 'sale' and self.status in self.STOCK_COMMITTED_STATUSES
+
+    @classmethod
+    def refresh_totals(cls, order_ids):
+        """Recompute total_amount for the given orders with one UPDATE ... SELECT SUM"""
+        item_totals = OrderItem.objects.filter(order=OuterRef('pk')).values('order').annotate(
+            total=Sum('total_price')
+        ).values('total')
+        cls.objects.filter(pk__in=order_ids).update(
+            total_amount=Coalesce(
+                Subquery(item_totals), Value(Decimal('0.00')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            ),
+            updated_at=timezone.now()
+        )
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -206,23 +487,32 @@ class OrderItem(models.Model):
     def save(self, *args, **kwargs):
         # Calculate total price
         self.total_price = self.quantity * self.unit_price
-        super().save(*args, **kwargs)
-
-        # Update order total
-        order_total = sum(item.total_price for item in self.order.items.all())
-        self.order.total_amount = order_total
-        self.order.save()
-
-        # Create stock movement for sales orders
-        if self.order.order_type == 'sale' and self.order.status in ['confirmed', 'processing', 'shipped']:
-            StockMovement.objects.create(
-                product=self.product,
-                movement_type='out',
-                quantity=self.quantity,
-                reference=self.order.order_number,
-                notes=f"Sales order {self.order.order_number}",
-                created_by=self.order.created_by
-            )
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            # Update order total with a single aggregate UPDATE instead of
+            # re-reading every line and re-saving the whole order
+            order = self.order
+            Order.refresh_totals([self.order_id])
+            order.refresh_from_db(fields=['total_amount', 'updated_at'])
+
+            # Create stock movement for new lines on committed sales orders
+            if is_new and order.commits_stock:
+                StockMovement.objects.create(
+                    product_id=self.product_id,
+                    movement_type='out',
+                    quantity=self.quantity,
+                    reference=order.order_number,
+                    notes=f"Sales order {order.order_number}",
+                    created_by_id=order.created_by_id
+                )
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Order.refresh_totals([self.order_id])
+        return result
 
     class Meta:
         unique_together = ['order', 'product']
@@ -246,6 +536,15 @@ class Warehouse(models.Model):
         ordering = ['name']
 
 
+class InsufficientLocationStock(ValueError):
+    """Raised when a transfer would take a location below zero"""
+
+    def __init__(self, shortages):
+        # [(product_id, warehouse_id, available, requested)]
+        self.shortages = shortages
+        super().__init__(f"Not enough stock at {len(shortages)} source location(s)")
+
+
 class ProductLocation(models.Model):
     """Track products in specific warehouse locations"""
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='locations')
@@ -256,5 +555,231 @@ class ProductLocation(models.Model):
     def __str__(self):
         return f"{self.product.name} at {self.warehouse.name}"
 
+    @classmethod
+    def apply_quantity_deltas(cls, deltas):
+        """Add signed quantities to many locations (``{location_id: delta}``).
+
+        Same approach as ``Product.apply_stock_deltas``: F() increments, one
+        ``UPDATE ... CASE`` per chunk and rows visited in id order.
+        """
+        changes = sorted((pk, delta) for pk, delta in deltas.items() if delta)
+        for start in range(0, len(changes), Product.STOCK_UPDATE_CHUNK_SIZE):
+            chunk = changes[start:start + Product.STOCK_UPDATE_CHUNK_SIZE]
+            cls.objects.filter(pk__in=[pk for pk, _ in chunk]).update(
+                quantity=F('quantity') + Case(
+                    *[When(pk=pk, then=Value(delta)) for pk, delta in chunk],
+                    output_field=models.IntegerField()
+                )
+            )
+
+    @classmethod
+    def move_quantities(cls, moves):
+        """Move stock between locations for many products at once.
+
+        ``moves`` is a list of ``(product_id, from_warehouse_id,
+        to_warehouse_id, quantity)``. Missing destination rows are created,
+        then every affected row is locked in id order (so concurrent transfers
+        cannot deadlock) and checked before the net changes are applied with
+        ``apply_quantity_deltas``. Raises ``InsufficientLocationStock`` if a
+        source would go below zero. Call inside a transaction.
+        """
+        net = defaultdict(int)
+        for product_id, source, destination, quantity in moves:
+            net[(product_id, source)] -= quantity
+            net[(product_id, destination)] += quantity
+        if not net:
+            return
+
+        cls.objects.bulk_create(
+            [cls(product_id=product_id, warehouse_id=warehouse_id) for (product_id, warehouse_id), delta in net.items() if delta > 0],
+            ignore_conflicts=True
+        )
+        rows = cls.objects.select_for_update().filter(
+            product_id__in={key[0] for key in net}, warehouse_id__in={key[1] for key in net}
+        ).order_by('id').values_list('id', 'product_id', 'warehouse_id', 'quantity')
+
+        deltas, found, shortages = {}, set(), []
+        for pk, product_id, warehouse_id, quantity in rows:
+            delta = net.get((product_id, warehouse_id))
+            if delta is None:
+                continue
+            found.add((product_id, warehouse_id))
+            if quantity + delta < 0:
+                shortages.append((product_id, warehouse_id, quantity, -delta))
+            deltas[pk] = delta
+        shortages += [(key[0], key[1], 0, -delta) for key, delta in net.items() if key not in found and delta < 0]
+        if shortages:
+            raise InsufficientLocationStock(shortages)
+        cls.apply_quantity_deltas(deltas)
+
     class Meta:
         unique_together = ['product', 'warehouse']
+
+
+class OrderAllocation(models.Model):
+    """Quantity of a sales order line picked from one warehouse"""
+    order_item = models.ForeignKey(OrderItem, on_delete=models.CASCADE, related_name='allocations')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='allocations')
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.order_item_id} from {self.warehouse_id}: {self.quantity}"
+
+    class Meta:
+        unique_together = ['order_item', 'warehouse']
+
+
+class StockSnapshot(models.Model):
+    """Stock on hand for a product at a point in time.
+
+    Rows written by one snapshot run share ``taken_at``. ``warehouse`` is
+    empty for the product's total (``quantity_in_stock``) and set for the
+    per-warehouse ``ProductLocation`` quantities.
+    """
+    taken_at = models.DateTimeField(db_index=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='stock_snapshots', null=True, blank=True)
+    quantity = models.IntegerField()
+
+    def __str__(self):
+        where = self.warehouse.name if self.warehouse else 'all warehouses'
+        return f"{self.product_id} at {self.taken_at:%Y-%m-%d %H:%M} ({where}): {self.quantity}"
+
+    class Meta:
+        ordering = ['-taken_at']
+        indexes = [
+            models.Index(fields=['product', 'taken_at'], name='snapshot_product_taken_idx'),
+        ]
+
+
+class BulkActionJob(models.Model):
+    """A bulk admin action queued to run over its selection in fixed-size chunks"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ]
+
+    action = models.CharField(max_length=100)
+    object_ids = models.JSONField(default=list)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    message = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bulk_action_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Set when claimed and after every committed chunk; see jobs.requeue_stale_jobs
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.action} #{self.pk} ({self.status})"
+
+    @property
+    def progress(self):
+        """Percentage of the selection processed so far"""
+        if not self.total:
+            return 100 if self.status == 'done' else 0
+        return round(self.processed * 100 / self.total, 1)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='bulkjob_status_created_idx'),
+        ]
+
+
+class DemandForecast(models.Model):
+    """Forecast daily demand for a product, written by one forecasting run"""
+    run_at = models.DateTimeField(db_index=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='demand_forecasts')
+    method = models.CharField(max_length=30)
+    start_date = models.DateField(help_text="First forecast day")
+    daily = models.JSONField(default=list, help_text="Forecast units per day from start_date")
+    next_7_days = models.FloatField()
+    horizon_total = models.FloatField()
+    history_days = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.product_id} from {self.start_date}: {self.next_7_days:.1f} units/week"
+
+    class Meta:
+        ordering = ['-run_at', '-next_7_days']
+        unique_together = ['run_at', 'product']
+        indexes = [
+            models.Index(fields=['run_at', 'next_7_days'], name='forecast_run_demand_idx'),
+        ]
+
+
+class DemandForecastRun(models.Model):
+    """Marks a forecasting run as complete once all of its rows are written"""
+    run_at = models.DateTimeField(unique=True)
+    completed_at = models.DateTimeField(auto_now_add=True)
+    product_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Forecast run {self.run_at:%Y-%m-%d %H:%M:%S} ({self.product_count} products)"
+
+    class Meta:
+        ordering = ['-run_at']
+
+
+class SearchDocument(models.Model):
+    """Denormalized global search entry for one customer, product, order or supplier"""
+    KIND_CHOICES = [
+        ('customer', 'Customer'),
+        ('product', 'Product'),
+        ('order', 'Order'),
+        ('supplier', 'Supplier')
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=200)
+    subtitle = models.CharField(max_length=200, blank=True)
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
+
+    class Meta:
+        unique_together = ['kind', 'object_id']
+
+
+class SearchDocumentTerm(models.Model):
+    """Inverted index entry: one normalized word of a search document"""
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.term} -> {self.document_id} ({self.weight})"
+
+    class Meta:
+        unique_together = ['document', 'term']
+        indexes = [
+            models.Index(fields=['term', 'document'], name='doc_term_document_idx'),
+        ]
+
+
+class ProductPriceChange(models.Model):
+    """Append-only price series: one row each time a product's cost or selling price changes"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_changes')
+    changed_at = models.DateTimeField()
+    cost_price = models.DecimalField(max_digits=10, decimal_places=2)
+    selling_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.product_id} at {self.changed_at:%Y-%m-%d %H:%M}: {self.cost_price} / {self.selling_price}"
+
+    class Meta:
+        ordering = ['product', 'changed_at']
+        indexes = [
+            # Range reads of one product's series
+            models.Index(fields=['product', 'changed_at'], name='price_product_changed_idx'),
+        ]
@@ -0,0 +1,212 @@
+"""Order creation and status helpers that work in a constant number of queries"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard_stats
+from .forms import OrderForm
+from .models import Order, OrderItem, Product, StockMovement
+from .stock import post_movements
+from .stock_cache import RESERVING_STATUSES, refresh_stock_cache_on_commit
+
+
+def _clean_order_lines(lines):
+    """Validate raw line dicts, resolving every product in one query"""
+    if not isinstance(lines, list) or not lines:
+        return [], [{'line': 0, 'errors': {'items': 'An order needs at least one line'}}]
+
+    rows = [line for line in lines if isinstance(line, dict)]
+    ids = [int(str(line['product'])) for line in rows if str(line.get('product', '')).isdigit()]
+    skus = [str(line['sku']) for line in rows if line.get('product') in (None, '') and line.get('sku')]
+    products = Product.objects.filter(is_active=True).only('id', 'sku', 'selling_price')
+    by_id, by_sku = {}, {}
+    for product in products.filter(id__in=ids) | products.filter(sku__in=skus):
+        by_id[str(product.id)] = product
+        by_sku[product.sku] = product
+
+    cleaned, errors, seen = [], [], set()
+    for number, line in enumerate(lines, start=1):
+        line_errors = {}
+        if not isinstance(line, dict):
+            errors.append({'line': number, 'errors': {'__all__': 'Line must be an object'}})
+            continue
+
+        if line.get('product') not in (None, ''):
+            product = by_id.get(str(line['product']))
+        else:
+            product = by_sku.get(str(line.get('sku') or ''))
+        if product is None:
+            line_errors['product'] = 'Product not found or inactive'
+        elif product.id in seen:
+            line_errors['product'] = 'Product appears on more than one line'
+        else:
+            seen.add(product.id)
+
+        try:
+            quantity = int(str(line.get('quantity', '')))
+        except ValueError:
+            quantity = 0
+        if quantity < 1:
+            line_errors['quantity'] = 'Quantity must be a whole number of at least 1'
+
+        unit_price = line.get('unit_price')
+        if unit_price in (None, '') and product is not None:
+            unit_price = product.selling_price
+        try:
+            unit_price = Decimal(str(unit_price))
+        except InvalidOperation:
+            unit_price = None
+        if unit_price is None or not unit_price.is_finite() or unit_price < 0:
+            line_errors['unit_price'] = 'Unit price must be a non-negative amount'
+
+        if line_errors:
+            errors.append({'line': number, 'errors': line_errors})
+        else:
+            cleaned.append((product, quantity, unit_price))
+    return cleaned, errors
+
+
+def create_order_with_items(data, lines, user):
+    """Create an order and all of its lines in one transaction.
+
+    ``data`` holds the ``OrderForm`` fields and ``lines`` is a list of
+    ``{'product' or 'sku', 'quantity', 'unit_price'}`` dicts; a missing
+    unit price defaults to the product's selling price. Lines are inserted
+    with ``bulk_create``, the order total is computed up front, and for
+    committed sales orders the stock is posted once for the whole order.
+    The number of queries does not depend on the number of lines.
+
+    Returns ``(order, errors)``; nothing is written when there are errors.
+    """
+    form = OrderForm(data)
+    cleaned, line_errors = _clean_order_lines(lines)
+    if not form.is_valid() or line_errors:
+        return None, {'order': form.errors.get_json_data() if form.errors else {}, 'items': line_errors}
+
+    order = form.save(commit=False)
+    order.created_by = user
+    # Take the number before opening the transaction so a cached block of
+    # numbers can be used; a failed insert just leaves a gap.
+    order.assign_order_number()
+    with transaction.atomic():
+        items = [
+            OrderItem(product=product, quantity=quantity, unit_price=unit_price,
+                      total_price=quantity * unit_price)
+            for product, quantity, unit_price in cleaned
+        ]
+        order.total_amount = sum((item.total_price for item in items), Decimal('0.00'))
+        order.save()
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+
+        if order.commits_stock:
+            post_movements([
+                StockMovement(
+                    product_id=item.product_id,
+                    movement_type='out',
+                    quantity=item.quantity,
+                    reference=order.order_number,
+                    notes=f"Sales order {order.order_number}",
+                    created_by=user
+                )
+                for item in items
+            ])
+        elif order.order_type == 'sale':
+            # bulk_create sends no post_save signals; reserved stock changed
+            refresh_stock_cache_on_commit(item.product_id for item in items)
+    return order, {}
+
+
+# ========================================================================
+# STATUS TRANSITIONS
+# ========================================================================
+
+ORDER_TRANSITIONS = {
+    'pending': {'confirmed', 'processing', 'shipped', 'cancelled'},
+    'confirmed': {'processing', 'shipped', 'cancelled'},
+    'processing': {'shipped', 'cancelled'},
+    'shipped': {'delivered', 'returned'},
+    'delivered': {'returned'},
+    'cancelled': set(),
+    'returned': set(),
+}
+
+
+def can_transition(current, new_status):
+    return new_status in ORDER_TRANSITIONS.get(current, ())
+
+
+def transition_orders(order_ids, new_status, user):
+    """Move many orders to ``new_status`` in one transaction.
+
+    Every order is checked against ``ORDER_TRANSITIONS``; orders already in
+    ``new_status`` are left alone and disallowed moves are reported back
+    without blocking the rest. Sales orders that enter a stock-committed
+    status get an 'out' movement per line and those that leave one (cancel
+    or return) get the stock back with an 'in' movement. All lines are read
+    in one query and posted with ``post_movements``, so the work is one
+    movement insert and one aggregated stock UPDATE however many orders
+    move. Cached stock of every product whose on-hand or reserved quantity
+    changed is refreshed after commit.
+    Returns ``{'updated': [ids], 'unchanged': [ids], 'rejected': [...]}``.
+    """
+    if new_status not in dict(Order.ORDER_STATUS):
+        raise ValueError(f"'{new_status}' is not an order status")
+    committed = set(Order.STOCK_COMMITTED_STATUSES)
+    reserving = set(RESERVING_STATUSES)
+    result = {'updated': [], 'unchanged': [], 'rejected': []}
+    deducting, restoring, releasing = set(), set(), set()
+
+    with transaction.atomic():
+        # Lock first so concurrent requests cannot post the same order twice
+        rows = Order.objects.select_for_update().filter(pk__in=order_ids).values_list('id', 'order_type', 'status')
+        for pk, order_type, current in rows:
+            if current == new_status:
+                result['unchanged'].append(pk)
+                continue
+            if not can_transition(current, new_status):
+                result['rejected'].append({
+                    'order': pk, 'status': current,
+                    'error': f"Cannot move an order from {current} to {new_status}"
+                })
+                continue
+            result['updated'].append(pk)
+            if order_type != 'sale':
+                continue
+            if (current in committed) != (new_status in committed):
+                (deducting if new_status in committed else restoring).add(pk)
+            if (current in reserving) != (new_status in reserving):
+                releasing.add(pk)
+
+        if not result['updated']:
+            return result
+        Order.objects.filter(pk__in=result['updated']).update(status=new_status, updated_at=timezone.now())
+        # queryset.update() sends no post_save signals
+        transaction.on_commit(invalidate_dashboard_stats)
+        if not (deducting or restoring or releasing):
+            return result
+
+        lines = OrderItem.objects.filter(order_id__in=deducting | restoring | releasing).values_list(
+            'order_id', 'order__order_number', 'product_id', 'quantity'
+        )
+        movements, reserved_changed = [], set()
+        for order_id, order_number, product_id, quantity in lines:
+            if order_id in deducting or order_id in restoring:
+                restore = order_id in restoring
+                movements.append(StockMovement(
+                    product_id=product_id,
+                    movement_type='in' if restore else 'out',
+                    quantity=quantity,
+                    reference=order_number,
+                    notes=f"Sales order {order_number}" + (f" {new_status}" if restore else ''),
+                    created_by=user
+                ))
+            else:
+                reserved_changed.add(product_id)
+        if movements:
+            post_movements(movements)
+        # post_movements refreshes the cached stock of the products it moved
+        refresh_stock_cache_on_commit(reserved_changed - {m.product_id for m in movements})
+    return result
@@ -0,0 +1,126 @@
+"""Keyset (cursor) pagination over indexed columns"""
+import base64
+import json
+from collections import namedtuple
+
+from django.db.models import Q
+
+
+ResultCount = namedtuple('ResultCount', ['value', 'is_exact'])
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """Paginate a queryset by seeking past a boundary row instead of using OFFSET.
+
+    ``ordering`` must end in a unique column (normally ``id``) and should match
+    an index, e.g. ``('-created_at', '-id')``. Each page is one indexed range
+    scan of ``per_page + 1`` rows, so page N costs the same as page 1.
+    Cursors are opaque URL-safe strings holding a boundary row's sort key and
+    the direction to read in. Counting is optional; by default it stops at
+    ``count_limit`` rows so it stays cheap on very large tables.
+    """
+
+    def __init__(self, queryset, ordering, per_page=25, count_limit=1000):
+        self.queryset = queryset.order_by(*ordering)
+        self.ordering = list(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.per_page = per_page
+        self.count_limit = count_limit
+
+    def _get_field(self, name):
+        return self.queryset.model._meta.get_field(name)
+
+    def encode_cursor(self, obj, direction='next'):
+        values = [self._get_field(name).value_to_string(obj) for name in self.fields]
+        raw = json.dumps({'d': direction, 'v': values}).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Return ``(direction, values)`` for an encoded cursor"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            direction, values = raw['d'], raw['v']
+            if direction not in ('next', 'prev') or len(values) != len(self.fields):
+                raise ValueError
+            return direction, [
+                self._get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise InvalidCursor("Malformed pagination cursor")
+
+    def _seek_filter(self, values, backwards=False):
+        """Rows strictly after ``values`` in the ordering (or before, going backwards)"""
+        condition = Q()
+        for position, name in enumerate(self.ordering):
+            descending = name.startswith('-')
+            lookup = 'lt' if descending != backwards else 'gt'
+            step = Q(**{f'{self.fields[position]}__{lookup}': values[position]})
+            for previous, value in zip(self.fields[:position], values):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def page(self, cursor=None):
+        direction, values = 'next', None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+
+        if direction == 'prev':
+            queryset = self.queryset.reverse().filter(self._seek_filter(values, backwards=True))
+            rows = list(queryset[:self.per_page + 1])
+            has_previous, has_next = len(rows) > self.per_page, True
+            rows = rows[:self.per_page][::-1]
+        else:
+            queryset = self.queryset
+            if values is not None:
+                queryset = queryset.filter(self._seek_filter(values))
+            rows = list(queryset[:self.per_page + 1])
+            has_next, has_previous = len(rows) > self.per_page, values is not None
+            rows = rows[:self.per_page]
+
+        if not rows:
+            return KeysetPage(rows)
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], 'prev') if has_previous else None,
+        )
+
+    def count(self, exact=False):
+        """Number of matching rows; capped at ``count_limit`` unless ``exact``"""
+        if exact or not self.count_limit:
+            return ResultCount(self.queryset.count(), True)
+        value = self.queryset.order_by()[:self.count_limit + 1].count()
+        if value > self.count_limit:
+            return ResultCount(self.count_limit, False)
+        return ResultCount(value, True)
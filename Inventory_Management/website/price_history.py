@@ -0,0 +1,125 @@
+"""Append-only product price history and downsampled price series.
+
+A ``ProductPriceChange`` row is written only when a product's cost or
+selling price actually changes: on a single save the prices are compared
+with the ones the instance was loaded with (``Product.from_db``), and bulk
+writers pass the old and new prices to ``record_price_changes``. The series
+is a step function, so the price at any moment is the last change at or
+before it.
+
+``price_series`` reads a date range for many products in one query on the
+``(product, changed_at)`` index: the changes inside the range plus, per
+product, the last change before it (the price in effect at the start).
+Ranges with more changes than ``points`` are downsampled into equal time
+buckets holding the closing prices and the selling price's low and high.
+"""
+from decimal import Decimal
+
+from django.db.models import Q, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Product, ProductPriceChange
+
+
+DEFAULT_POINTS = 200
+MAX_POINTS = 1000
+
+
+def _prices(cost_price, selling_price):
+    return (Decimal(str(cost_price)), Decimal(str(selling_price)))
+
+
+def record_price_change(product, created=False):
+    """Append a change row if ``product``'s saved prices differ from the last known ones"""
+    current = _prices(product.cost_price, product.selling_price)
+    loaded = getattr(product, '_loaded_prices', None)
+    if created:
+        changed = True
+    elif loaded is None or None in loaded:
+        # Not loaded from the database (or prices deferred): compare with the series
+        last = ProductPriceChange.objects.filter(product=product).order_by('-changed_at', '-id').values_list(
+            'cost_price', 'selling_price'
+        ).first()
+        changed = last is None or _prices(*last) != current
+    else:
+        changed = _prices(*loaded) != current
+    if changed:
+        ProductPriceChange.objects.create(
+            product=product, changed_at=timezone.now(), cost_price=current[0], selling_price=current[1]
+        )
+    product._loaded_prices = current
+
+
+def record_price_changes(rows, changed_at=None, batch_size=1000):
+    """Append changes for ``(product_id, old_prices, new_prices)`` rows where the prices differ.
+
+    ``old_prices`` is None for new products. Returns the number of rows written.
+    """
+    changed_at = changed_at or timezone.now()
+    changes = [
+        ProductPriceChange(product_id=product_id, changed_at=changed_at, cost_price=new[0], selling_price=new[1])
+        for product_id, old, new in rows
+        if old is None or _prices(*old) != _prices(*new)
+    ]
+    ProductPriceChange.objects.bulk_create(changes, batch_size=batch_size)
+    return len(changes)
+
+
+def load_changes(product_ids, start, end):
+    """``{product_id: [(changed_at, cost, selling), ...]}`` for ``[start, end]``, in one query.
+
+    Each list starts with the last change before ``start`` when there is one.
+    """
+    last_before = ProductPriceChange.objects.filter(
+        product=OuterRef('pk'), changed_at__lt=start
+    ).order_by('-changed_at', '-id').values('pk')[:1]
+    opening = Product.objects.filter(pk__in=product_ids).annotate(last=Subquery(last_before)).values('last')
+    rows = ProductPriceChange.objects.filter(product_id__in=product_ids).filter(
+        Q(changed_at__gte=start, changed_at__lte=end) | Q(pk__in=opening)
+    ).order_by('product_id', 'changed_at', 'id').values_list('product_id', 'changed_at', 'cost_price', 'selling_price')
+
+    series = {pk: [] for pk in product_ids}
+    for product_id, changed_at, cost_price, selling_price in rows:
+        series[product_id].append((changed_at, cost_price, selling_price))
+    return series
+
+
+def downsample(changes, start, end, points):
+    """Reduce a step series to at most ``points`` entries.
+
+    Returns ``(entries, downsampled)``. Entries are ``{'at', 'cost_price',
+    'selling_price'}``; bucketed entries also carry ``selling_low`` and
+    ``selling_high``. A change before ``start`` is reported at ``start``.
+    """
+    if len(changes) <= points:
+        return [
+            {'at': max(changed_at, start), 'cost_price': cost, 'selling_price': selling}
+            for changed_at, cost, selling in changes
+        ], False
+
+    width = (end - start) / points
+    entries, current, position = [], None, 0
+    for bucket in range(points):
+        bucket_start = start + width * bucket
+        low = high = current[2] if current else None
+        while position < len(changes) and (changes[position][0] < bucket_start + width or bucket == points - 1):
+            current = changes[position]
+            low = current[2] if low is None else min(low, current[2])
+            high = current[2] if high is None else max(high, current[2])
+            position += 1
+        if current is None:
+            continue
+        entries.append({
+            'at': bucket_start, 'cost_price': current[1], 'selling_price': current[2],
+            'selling_low': low, 'selling_high': high,
+        })
+    return entries, True
+
+
+def price_series(product_ids, start, end, points=DEFAULT_POINTS):
+    """``{product_id: (entries, downsampled)}`` for ``[start, end]``, at most ``points`` entries each"""
+    points = max(1, min(points, MAX_POINTS))
+    return {
+        product_id: downsample(changes, start, end, points)
+        for product_id, changes in load_changes(product_ids, start, end).items()
+    }
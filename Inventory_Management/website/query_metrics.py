@@ -0,0 +1,198 @@
+"""Per-view query count, database time and wall time, with N+1 detection.
+
+``QueryRecorder`` hooks every database connection through
+``connection.execute_wrapper`` and records each statement's duration and
+fingerprint: the SQL with literals and ``IN (...)`` lists collapsed, so the
+same statement run once per row shows up as one fingerprint repeated. A
+fingerprint seen ``n_plus_one_threshold()`` times or more in one request is
+reported as a likely N+1.
+
+``QueryMetricsMiddleware`` (``website.middleware``) records every request and
+folds it into the per-view totals kept by ``METRICS``. Totals live in the
+process, like a Prometheus client registry: each worker reports its own.
+
+Views can declare how many queries they should need with
+``@query_budget(n)``; requests over budget are counted, and
+``QueryBudgetMixin.assertWithinQueryBudget`` fails a test when a view
+exceeds its budget.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import resolve
+
+
+def n_plus_one_threshold():
+    """Repeats of one fingerprint in a request that flag an N+1 (QUERY_METRICS_N_PLUS_ONE_THRESHOLD)"""
+    return getattr(settings, 'QUERY_METRICS_N_PLUS_ONE_THRESHOLD', 5)
+
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Normalize SQL so statements that differ only in values compare equal"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """Count statements and database time on every connection while active"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def repeated(self, threshold=None):
+        """``[(fingerprint, count)]`` run at least ``threshold`` times, most repeated first"""
+        threshold = n_plus_one_threshold() if threshold is None else threshold
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+
+class ViewMetrics:
+    """Running totals for one view"""
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_seconds = 0.0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.n_plus_one = 0
+        self.over_budget = 0
+        self.budget = None
+        # Most recent repeated fingerprint and its count
+        self.last_repeated = None
+
+    def as_dict(self):
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'queries': self.queries,
+            'avg_queries': round(self.queries / requests, 1),
+            'max_queries': self.max_queries,
+            'db_seconds': round(self.db_seconds, 6),
+            'avg_db_ms': round(self.db_seconds * 1000 / requests, 2),
+            'seconds': round(self.seconds, 6),
+            'avg_ms': round(self.seconds * 1000 / requests, 2),
+            'max_ms': round(self.max_seconds * 1000, 2),
+            'n_plus_one': self.n_plus_one,
+            'over_budget': self.over_budget,
+            'budget': self.budget,
+            'last_repeated': self.last_repeated,
+        }
+
+
+class MetricsRegistry:
+    """Per-view totals for this process, safe to update from several threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, recorder, seconds, budget=None):
+        repeated = recorder.repeated()
+        with self._lock:
+            metrics = self._views.setdefault(view, ViewMetrics())
+            metrics.requests += 1
+            metrics.queries += recorder.count
+            metrics.max_queries = max(metrics.max_queries, recorder.count)
+            metrics.db_seconds += recorder.duration
+            metrics.seconds += seconds
+            metrics.max_seconds = max(metrics.max_seconds, seconds)
+            metrics.budget = budget
+            if budget is not None and recorder.count > budget:
+                metrics.over_budget += 1
+            if repeated:
+                metrics.n_plus_one += 1
+                metrics.last_repeated = repeated[0]
+        return repeated
+
+    def snapshot(self):
+        """``{view: totals}`` sorted by view name"""
+        with self._lock:
+            return {view: metrics.as_dict() for view, metrics in sorted(self._views.items())}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+METRICS = MetricsRegistry()
+
+PROMETHEUS_METRICS = [
+    ('requests', 'inventory_view_requests_total', 'counter', "Requests served"),
+    ('queries', 'inventory_view_queries_total', 'counter', "Database queries run"),
+    ('max_queries', 'inventory_view_queries_max', 'gauge', "Most queries in one request"),
+    ('db_seconds', 'inventory_view_db_seconds_total', 'counter', "Time spent in the database"),
+    ('seconds', 'inventory_view_seconds_total', 'counter', "Wall time spent serving requests"),
+    ('n_plus_one', 'inventory_view_n_plus_one_total', 'counter', "Requests that repeated one query fingerprint"),
+    ('over_budget', 'inventory_view_over_budget_total', 'counter', "Requests over the view's query budget"),
+]
+
+
+def prometheus_text(snapshot=None):
+    """The per-view totals in the Prometheus text exposition format"""
+    snapshot = METRICS.snapshot() if snapshot is None else snapshot
+    lines = []
+    for key, name, kind, help_text in PROMETHEUS_METRICS:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for view, totals in snapshot.items():
+            label = view.replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'{name}{{view="{label}"}} {totals[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+def query_budget(limit):
+    """Declare the most queries a view should need for one request"""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+class QueryBudgetMixin:
+    """TestCase mixin: fail when a request runs more queries than its view's budget"""
+
+    def assertWithinQueryBudget(self, url, data=None, method='get', budget=None, **extra):
+        if budget is None:
+            budget = getattr(resolve(url.split('?')[0]).func, 'query_budget', None)
+        if budget is None:
+            self.fail(f"No query budget declared for {url}")
+        with QueryRecorder() as recorder:
+            response = getattr(self.client, method)(url, data, **extra)
+        if recorder.count > budget:
+            repeated = ''.join(f"\n  {count}x {sql}" for sql, count in recorder.repeated(threshold=2))
+            self.fail(f"{url} ran {recorder.count} queries, over its budget of {budget}{repeated}")
+        return response
@@ -0,0 +1,205 @@
+"""Catalogue-wide replenishment: reorder points and draft purchase orders.
+
+Demand comes from the daily movement rollup ('out' quantities), streamed in
+chunks into a products x days NumPy matrix. Daily demand rate and variability
+give each product a reorder point::
+
+    reorder_point = max(minimum_stock_level, rate * lead_time + z * std * sqrt(lead_time))
+
+Products whose stock position (on hand plus open purchase orders) is at or
+below the reorder point are ordered up to ``max(maximum_stock_level,
+reorder_point)``. The lines are grouped into one pending purchase order per
+supplier, created with bulk inserts.
+
+NumPy is an optional dependency, only needed here.
+"""
+import math
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from .dashboard import invalidate_dashboard_stats
+from .global_search import reindex_documents
+from .models import Product, Order, OrderItem, OrderNumberSequence, StockMovementDailyRollup
+
+
+# Purchase orders in these states are still expected to arrive
+OPEN_PURCHASE_STATUSES = ['pending', 'confirmed', 'processing', 'shipped']
+
+
+def replenishment_settings():
+    """Demand window, lead time (days) and service factor from settings"""
+    return {
+        'demand_days': getattr(settings, 'REPLENISHMENT_DEMAND_DAYS', 28),
+        'lead_time_days': getattr(settings, 'REPLENISHMENT_LEAD_TIME_DAYS', 7),
+        'service_factor': getattr(settings, 'REPLENISHMENT_SERVICE_FACTOR', 1.65),
+    }
+
+
+def _require_numpy():
+    if np is None:
+        raise ImproperlyConfigured("Replenishment needs NumPy; install it with 'pip install numpy'.")
+
+
+def load_catalogue(chunk_size=5000):
+    """Active products of active suppliers as NumPy arrays sorted by id"""
+    rows = Product.objects.filter(is_active=True, supplier__is_active=True).order_by('id').values_list(
+        'id', 'supplier_id', 'quantity_in_stock', 'minimum_stock_level', 'maximum_stock_level', 'cost_price'
+    )
+    columns = list(zip(*rows.iterator(chunk_size=chunk_size))) or [()] * 6
+    ids, suppliers, on_hand, minimum, maximum, cost = columns
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'supplier': np.array(suppliers, dtype=np.int64),
+        'on_hand': np.array(on_hand, dtype=np.int64),
+        'minimum': np.array(minimum, dtype=np.int64),
+        'maximum': np.array(maximum, dtype=np.int64),
+        'cost': list(cost),
+    }
+
+
+def _positions(ids, product_ids):
+    """Row of each product id in the sorted ``ids`` array, -1 where absent"""
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    if not len(ids):
+        return np.full(len(product_ids), -1)
+    positions = np.minimum(np.searchsorted(ids, product_ids), len(ids) - 1)
+    return np.where(ids[positions] == product_ids, positions, -1)
+
+
+def load_demand(ids, start, days, chunk_size=5000):
+    """Daily 'out' quantities as a ``len(ids) x days`` matrix, read in chunks"""
+    demand = np.zeros((len(ids), days))
+    rows = StockMovementDailyRollup.objects.filter(
+        movement_type='out', date__gte=start, date__lt=start + timedelta(days=days)
+    ).values_list('product_id', 'date', 'total_quantity').iterator(chunk_size=chunk_size)
+    first_day = start.toordinal()
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            _add_chunk(demand, ids, chunk, first_day)
+            chunk = []
+    if chunk:
+        _add_chunk(demand, ids, chunk, first_day)
+    return demand
+
+
+def _add_chunk(demand, ids, chunk, first_day):
+    product_ids, dates, quantities = zip(*chunk)
+    positions = _positions(ids, product_ids)
+    offsets = np.array([day.toordinal() - first_day for day in dates])
+    known = positions >= 0
+    np.add.at(demand, (positions[known], offsets[known]), np.array(quantities, dtype=float)[known])
+
+
+def load_on_order(ids):
+    """Quantities on open purchase orders per product"""
+    on_order = np.zeros(len(ids), dtype=np.int64)
+    rows = OrderItem.objects.filter(
+        order__order_type='purchase', order__status__in=OPEN_PURCHASE_STATUSES
+    ).values('product_id').annotate(quantity=Sum('quantity')).values_list('product_id', 'quantity')
+    rows = list(rows)
+    if rows:
+        product_ids, quantities = zip(*rows)
+        positions = _positions(ids, product_ids)
+        known = positions >= 0
+        on_order[positions[known]] = np.array(quantities, dtype=np.int64)[known]
+    return on_order
+
+
+def plan_replenishment(today=None, chunk_size=5000):
+    """Compute reorder points for the whole catalogue.
+
+    Returns the catalogue arrays plus ``rate``, ``reorder_point``,
+    ``position`` and ``order_quantity`` (0 where nothing is needed).
+    """
+    _require_numpy()
+    options = replenishment_settings()
+    today = today or timezone.localdate()
+    days, lead_time = options['demand_days'], options['lead_time_days']
+
+    catalogue = load_catalogue(chunk_size)
+    demand = load_demand(catalogue['id'], today - timedelta(days=days), days, chunk_size)
+    rate = demand.mean(axis=1) if days else np.zeros(len(catalogue['id']))
+    deviation = demand.std(axis=1) if days else np.zeros(len(catalogue['id']))
+
+    reorder_point = np.ceil(rate * lead_time + options['service_factor'] * deviation * math.sqrt(lead_time))
+    reorder_point = np.maximum(reorder_point.astype(np.int64), catalogue['minimum'])
+    position = catalogue['on_hand'] + load_on_order(catalogue['id'])
+    target = np.maximum(catalogue['maximum'], reorder_point)
+    order_quantity = np.where(position <= reorder_point, np.maximum(target - position, 0), 0)
+
+    catalogue.update(rate=rate, reorder_point=reorder_point, position=position, order_quantity=order_quantity)
+    return catalogue
+
+
+def create_purchase_orders(plan, user):
+    """Turn a plan into one pending purchase order per supplier.
+
+    Order numbers come from one block reserved in ``OrderNumberSequence``;
+    orders and lines are written with one bulk insert each. Returns the
+    created order numbers.
+    """
+    needed = np.flatnonzero(plan['order_quantity'] > 0)
+    if not len(needed):
+        return []
+
+    lines_by_supplier = {}
+    for row in needed.tolist():
+        lines_by_supplier.setdefault(int(plan['supplier'][row]), []).append(
+            (int(plan['id'][row]), int(plan['order_quantity'][row]), plan['cost'][row])
+        )
+
+    with transaction.atomic():
+        first, _ = OrderNumberSequence.reserve('PO', len(lines_by_supplier))
+        orders = []
+        for number, (supplier_id, lines) in enumerate(sorted(lines_by_supplier.items()), start=first):
+            orders.append(Order(
+                order_number=f"PO-{number:06d}",
+                order_type='purchase',
+                supplier_id=supplier_id,
+                status='pending',
+                total_amount=sum((quantity * cost for _, quantity, cost in lines), Decimal('0.00')),
+                notes="Draft replenishment order",
+                created_by=user
+            ))
+        Order.objects.bulk_create(orders)
+        # Not every backend sets primary keys on bulk_create
+        ids = dict(Order.objects.filter(
+            order_number__in=[order.order_number for order in orders]
+        ).values_list('supplier_id', 'id'))
+
+        OrderItem.objects.bulk_create([
+            OrderItem(order_id=ids[supplier_id], product_id=product_id, quantity=quantity,
+                      unit_price=cost, total_price=quantity * cost)
+            for supplier_id, lines in lines_by_supplier.items()
+            for product_id, quantity, cost in lines
+        ], batch_size=1000)
+        # bulk_create sends no post_save signals
+        reindex_documents('order', ids.values())
+        transaction.on_commit(invalidate_dashboard_stats)
+    return [order.order_number for order in orders]
+
+
+def replenish(user, today=None, dry_run=False):
+    """Plan the whole catalogue and, unless ``dry_run``, create the purchase orders"""
+    plan = plan_replenishment(today)
+    order_numbers = [] if dry_run else create_purchase_orders(plan, user)
+    return {
+        'products': len(plan['id']),
+        'products_to_order': int((plan['order_quantity'] > 0).sum()),
+        'units_to_order': int(plan['order_quantity'].sum()),
+        'orders': order_numbers,
+    }
@@ -0,0 +1,45 @@
+"""Report queries that read pre-aggregated tables instead of the movement ledger"""
+from django.db.models import Sum
+
+from .models import Product, StockMovementDailyRollup, DemandForecast, DemandForecastRun
+
+
+def movement_summary(date_from, date_to):
+    """Movement count and quantity per movement type between two dates (inclusive)"""
+    return StockMovementDailyRollup.objects.filter(date__range=(date_from, date_to)).values(
+        'movement_type'
+    ).annotate(
+        count=Sum('movement_count'),
+        total_quantity=Sum('total_quantity')
+    ).order_by('movement_type')
+
+
+def top_products_by_movements(date_from=None, date_to=None, limit=10):
+    """Products with the most movements in the range, annotated with ``movement_count``"""
+    rollups = StockMovementDailyRollup.objects.all()
+    if date_from:
+        rollups = rollups.filter(date__gte=date_from)
+    if date_to:
+        rollups = rollups.filter(date__lte=date_to)
+    ranked = list(rollups.values('product').annotate(
+        movement_count=Sum('movement_count')
+    ).order_by('-movement_count', 'product')[:limit])
+
+    products = Product.objects.in_bulk([row['product'] for row in ranked])
+    top = []
+    for row in ranked:
+        product = products[row['product']]
+        product.movement_count = row['movement_count']
+        top.append(product)
+    return top
+
+
+def top_forecast_demand(limit=10):
+    """Highest forecast 7-day demand from the last complete run; ``(run_at, forecasts)``"""
+    run_at = DemandForecastRun.objects.order_by('-run_at').values_list('run_at', flat=True).first()
+    if run_at is None:
+        return None, []
+    forecasts = DemandForecast.objects.filter(run_at=run_at).select_related('product').order_by(
+        '-next_7_days', 'product'
+    )[:limit]
+    return run_at, list(forecasts)
@@ -0,0 +1,134 @@
+"""Product search backed by a maintained inverted index (ProductSearchTerm).
+
+Every product's SKU, name and description are split into lowercase terms and
+stored with a weight per field. A search turns each query word into a prefix
+range scan on the indexed ``term`` column, requires every word to match, and
+ranks products by the summed weights, counting exact word matches double. It
+works the same on MySQL and on SQLite, unlike ``icontains``, which runs
+leading-wildcard LIKEs that cannot use an index.
+"""
+import re
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q, F, Sum, Max, Case, When, Value, IntegerField
+
+from .models import Product, ProductSearchTerm
+
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+TERM_MAX_LENGTH = ProductSearchTerm._meta.get_field('term').max_length
+FIELD_WEIGHTS = [('sku', 8), ('name', 4), ('description', 1)]
+MAX_TERMS_PER_FIELD = 200
+MAX_QUERY_TERMS = 8
+
+
+def tokenize(text):
+    """Lowercase alphanumeric words of ``text`` in order, without duplicates"""
+    seen = {}
+    for token in TOKEN_RE.findall((text or '').lower()):
+        seen.setdefault(token[:TERM_MAX_LENGTH], None)
+    return list(seen)
+
+
+def product_terms(product):
+    """``{term: weight}`` for one product"""
+    terms = defaultdict(int)
+    for field, weight in FIELD_WEIGHTS:
+        for token in tokenize(getattr(product, field))[:MAX_TERMS_PER_FIELD]:
+            terms[token] += weight
+    # The whole SKU is also a term so 'wid-0001' matches as typed
+    sku = (product.sku or '').lower()[:TERM_MAX_LENGTH]
+    if sku:
+        terms[sku] += FIELD_WEIGHTS[0][1]
+    return dict(terms)
+
+
+def reindex_product(product):
+    """Bring one product's index entries up to date, writing only what changed"""
+    wanted = product_terms(product)
+    current = dict(ProductSearchTerm.objects.filter(product=product).values_list('term', 'weight'))
+    if current == wanted:
+        return
+    with transaction.atomic():
+        stale = [term for term, weight in current.items() if wanted.get(term) != weight]
+        if stale:
+            ProductSearchTerm.objects.filter(product=product, term__in=stale).delete()
+        ProductSearchTerm.objects.bulk_create([
+            ProductSearchTerm(product=product, term=term, weight=weight)
+            for term, weight in wanted.items() if current.get(term) != weight
+        ])
+
+
+def reindex_products(products, chunk_size=500):
+    """Rebuild index entries for many products (e.g. after bulk_create), chunk by chunk"""
+    products = list(products)
+    for start in range(0, len(products), chunk_size):
+        chunk = products[start:start + chunk_size]
+        with transaction.atomic():
+            ProductSearchTerm.objects.filter(product__in=[p.pk for p in chunk]).delete()
+            ProductSearchTerm.objects.bulk_create([
+                ProductSearchTerm(product=product, term=term, weight=weight)
+                for product in chunk
+                for term, weight in product_terms(product).items()
+            ], batch_size=1000)
+
+
+def prefix_q(token):
+    # term >= 'wid' AND term < 'wie' is an index range scan on every backend
+    upper = token[:-1] + chr(ord(token[-1]) + 1)
+    return Q(term__gte=token, term__lt=upper)
+
+
+def ranked_matches(query):
+    """``values`` queryset of ``{'product', 'rank'}`` for products matching every query word"""
+    tokens = tokenize(query)[:MAX_QUERY_TERMS]
+    if not tokens:
+        return ProductSearchTerm.objects.none().values('product')
+
+    matched = {
+        f'matched_{i}': Max(Case(When(prefix_q(token), then=Value(1)), default=Value(0),
+                                 output_field=IntegerField()))
+        for i, token in enumerate(tokens)
+    }
+    matches = ProductSearchTerm.objects.filter(reduce(or_, [prefix_q(t) for t in tokens])).values(
+        'product'
+    ).annotate(
+        rank=Sum('weight') + Sum(Case(When(term__in=tokens, then=F('weight')), default=Value(0),
+                                      output_field=IntegerField())),
+        **matched
+    )
+    return matches.filter(**{name: 1 for name in matched})
+
+
+def matching_product_ids(query):
+    """Subquery of ids matching ``query``, for use in ``filter(id__in=...)``"""
+    return ranked_matches(query).values('product')
+
+
+def search_products(query, queryset=None, limit=20):
+    """Ranked products for ``query``; an exact SKU match always comes first"""
+    if queryset is None:
+        queryset = Product.objects.filter(is_active=True)
+    query = (query or '').strip()
+    if not query:
+        return []
+
+    exact = list(queryset.filter(sku__in={query, query.upper()})[:1])
+    ranked = list(ranked_matches(query).filter(
+        product__in=queryset.values('id')
+    ).order_by('-rank', 'product')[:limit])
+    ranks = {row['product']: row['rank'] for row in ranked}
+    products = queryset.in_bulk(list(ranks))
+
+    results = exact[:]
+    for product_id in ranks:
+        if product_id in products and (not exact or product_id != exact[0].pk):
+            product = products[product_id]
+            product.search_rank = ranks[product_id]
+            results.append(product)
+    for product in exact:
+        product.search_rank = None
+    return results[:limit]
@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .dashboard import invalidate_dashboard_stats
+from .global_search import index_document, remove_document, reindex_documents
+from .price_history import record_price_change
+from .search import reindex_product
+from .stock_cache import refresh_stock_cache_on_commit
+from .models import Customer, Product, StockMovement, Order, OrderItem, Supplier
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Order)
+@receiver([post_save, post_delete], sender=Customer)
+@receiver([post_save, post_delete], sender=StockMovement)
+def refresh_dashboard_on_change(sender, **kwargs):
+    """Invalidate the dashboard snapshot once the writing transaction commits"""
+    transaction.on_commit(invalidate_dashboard_stats)
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, raw=False, **kwargs):
+    """Keep the product's search terms in step with its SKU, name and description"""
+    if not raw:
+        reindex_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def update_price_history(sender, instance, created=False, raw=False, **kwargs):
+    """Append to the price series when the cost or selling price changed"""
+    if not raw:
+        record_price_change(instance, created)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def refresh_stock_cache_for_product(sender, instance, raw=False, **kwargs):
+    """Write the product's stock entry through once the transaction commits"""
+    if not raw:
+        refresh_stock_cache_on_commit([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=StockMovement)
+@receiver([post_save, post_delete], sender=OrderItem)
+def refresh_stock_cache_for_line(sender, instance, raw=False, **kwargs):
+    """Movements change on-hand stock and order lines change reserved stock"""
+    if not raw:
+        refresh_stock_cache_on_commit([instance.product_id])
+
+
+@receiver(post_save, sender=Order)
+def refresh_stock_cache_for_order(sender, instance, created=False, raw=False, **kwargs):
+    """A status change moves the order's lines in or out of reserved stock"""
+    if not raw and not created:
+        refresh_stock_cache_on_commit(instance.items.values_list('product_id', flat=True))
+
+
+SEARCH_KINDS_BY_MODEL = {Customer: 'customer', Product: 'product', Order: 'order', Supplier: 'supplier'}
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Supplier)
+def update_search_document(sender, instance, raw=False, **kwargs):
+    """Keep the record's global search document in step; renames also refresh its orders"""
+    if raw:
+        return
+    renamed = index_document(SEARCH_KINDS_BY_MODEL[sender], instance)
+    if renamed and sender in (Customer, Supplier):
+        reindex_documents('order', instance.orders.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Supplier)
+def delete_search_document(sender, instance, **kwargs):
+    remove_document(SEARCH_KINDS_BY_MODEL[sender], instance.pk)
@@ -0,0 +1,45 @@
+"""Demand forecasting models as plain functions.
+
+Nothing here touches Django, so the functions can run in worker processes
+started with either fork or spawn.
+"""
+
+SEASON_LENGTH = 7
+
+
+def seasonal_smoothing(series, horizon, alpha=0.3, gamma=0.2, season_length=SEASON_LENGTH):
+    """Additive exponential smoothing with a weekly season.
+
+    ``series`` is daily demand, oldest first. Needs two full seasons of
+    history; shorter series fall back to ``simple_smoothing``. Returns
+    ``(method, forecast)`` with ``horizon`` non-negative daily values.
+    """
+    if len(series) < 2 * season_length:
+        return simple_smoothing(series, horizon, alpha)
+
+    level = sum(series[:season_length]) / season_length
+    seasonal = [value - level for value in series[:season_length]]
+    for day, value in enumerate(series[season_length:], start=season_length):
+        index = day % season_length
+        previous_level = level
+        level = alpha * (value - seasonal[index]) + (1 - alpha) * level
+        seasonal[index] = gamma * (value - previous_level) + (1 - gamma) * seasonal[index]
+
+    start = len(series)
+    forecast = [max(level + seasonal[(start + step) % season_length], 0.0) for step in range(horizon)]
+    return 'seasonal', forecast
+
+
+def simple_smoothing(series, horizon, alpha=0.3):
+    """Flat forecast from simple exponential smoothing"""
+    if not series:
+        return 'simple', [0.0] * horizon
+    level = series[0]
+    for value in series[1:]:
+        level = alpha * value + (1 - alpha) * level
+    return 'simple', [max(level, 0.0)] * horizon
+
+
+def fit_batch(batch, horizon):
+    """Forecast a list of ``(product_id, series)``; returns ``(product_id, method, forecast)``"""
+    return [(product_id, *seasonal_smoothing(series, horizon)) for product_id, series in batch]
@@ -0,0 +1,134 @@
+"""Periodic stock balance snapshots and point-in-time balance queries.
+
+A balance at time ``at`` is the nearest snapshot run before it plus the net
+movements between the two, so a query only replays the movements of one
+snapshot interval. Products without an earlier snapshot are answered
+backwards from the next run (or from the live stock if there is none) by
+subtracting the movements after ``at``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum, Max, Min, Case, When, Value, IntegerField
+from django.utils import timezone
+
+from .models import Product, ProductLocation, StockMovement, StockSnapshot
+
+
+def snapshot_interval():
+    """Minimum time between snapshot runs (STOCK_SNAPSHOT_INTERVAL_HOURS, default 24)"""
+    return timedelta(hours=getattr(settings, 'STOCK_SNAPSHOT_INTERVAL_HOURS', 24))
+
+
+def take_snapshot(taken_at=None, batch_size=1000, force=False):
+    """Record every product's total and per-warehouse stock as one run.
+
+    Skips the run (returning ``None``) if the previous one is younger than
+    ``snapshot_interval()``, unless ``force`` is set. Returns the run time.
+    """
+    taken_at = taken_at or timezone.now()
+    if not force:
+        last = StockSnapshot.objects.aggregate(last=Max('taken_at'))['last']
+        if last and taken_at - last < snapshot_interval():
+            return None
+
+    with transaction.atomic():
+        totals = (
+            StockSnapshot(taken_at=taken_at, product_id=pk, quantity=quantity)
+            for pk, quantity in Product.objects.values_list('id', 'quantity_in_stock').iterator(chunk_size=batch_size)
+        )
+        _bulk_insert(totals, batch_size)
+        locations = (
+            StockSnapshot(taken_at=taken_at, product_id=product_id, warehouse_id=warehouse_id, quantity=quantity)
+            for product_id, warehouse_id, quantity in ProductLocation.objects.values_list(
+                'product_id', 'warehouse_id', 'quantity'
+            ).iterator(chunk_size=batch_size)
+        )
+        _bulk_insert(locations, batch_size)
+    return taken_at
+
+
+def _bulk_insert(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            StockSnapshot.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        StockSnapshot.objects.bulk_create(batch)
+
+
+def movement_deltas(start, end, product_ids=None):
+    """Net stock change per product for movements in ``(start, end]``, in one aggregate query"""
+    movements = StockMovement.objects.filter(created_at__lte=end)
+    if start is not None:
+        movements = movements.filter(created_at__gt=start)
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    signed = Case(
+        When(movement_type__in=StockMovement.INBOUND_TYPES, then=F('quantity')),
+        When(movement_type__in=StockMovement.OUTBOUND_TYPES, then=-F('quantity')),
+        default=Value(0),
+        output_field=IntegerField()
+    )
+    return dict(movements.values('product').annotate(delta=Sum(signed)).values_list('product', 'delta'))
+
+
+def _run_quantities(taken_at, product_ids, warehouse=False):
+    rows = StockSnapshot.objects.filter(taken_at=taken_at, warehouse__isnull=not warehouse)
+    if product_ids is not None:
+        rows = rows.filter(product_id__in=product_ids)
+    if warehouse:
+        return {(p, w): q for p, w, q in rows.values_list('product_id', 'warehouse_id', 'quantity')}
+    return dict(rows.values_list('product_id', 'quantity'))
+
+
+def balances_at(at, product_ids=None):
+    """``{product_id: quantity}`` on hand at ``at`` for the given (or all) products"""
+    if product_ids is not None:
+        product_ids = list(product_ids)
+    totals = StockSnapshot.objects.filter(warehouse__isnull=True)
+    before = totals.filter(taken_at__lte=at).aggregate(run=Max('taken_at'))['run']
+
+    balances = {}
+    if before is not None:
+        balances = _run_quantities(before, product_ids)
+        for product_id, delta in movement_deltas(before, at, list(balances)).items():
+            balances[product_id] += delta
+
+    wanted = Product.objects.all() if product_ids is None else Product.objects.filter(id__in=product_ids)
+    missing = [pk for pk in wanted.values_list('id', flat=True) if pk not in balances]
+    if missing:
+        # Work backwards from the next run, or from the live stock
+        now = timezone.now()
+        after = totals.filter(taken_at__gt=at).aggregate(run=Min('taken_at'))['run']
+        later = _run_quantities(after, missing) if after is not None else {}
+        unresolved = [pk for pk in missing if pk not in later]
+        if unresolved:
+            live = dict(Product.objects.filter(id__in=unresolved).values_list('id', 'quantity_in_stock'))
+            if after is not None:
+                # Bring live stock back to the time of the next run
+                for product_id, delta in movement_deltas(after, now, unresolved).items():
+                    live[product_id] -= delta
+            later.update(live)
+        deltas = movement_deltas(at, after or now, missing)
+        for product_id, quantity in later.items():
+            balances[product_id] = quantity - deltas.get(product_id, 0)
+    return balances
+
+
+def warehouse_balances_at(at, product_ids=None):
+    """Per-location stock from the last snapshot run at or before ``at``.
+
+    Returns ``(run_time, {(product_id, warehouse_id): quantity})``. Movements
+    do not record a warehouse, so per-location balances are exact only at
+    snapshot times.
+    """
+    run = StockSnapshot.objects.filter(warehouse__isnull=False, taken_at__lte=at).aggregate(
+        run=Max('taken_at')
+    )['run']
+    if run is None:
+        return run, {}
+    return run, _run_quantities(run, product_ids, warehouse=True)
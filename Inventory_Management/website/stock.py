@@ -0,0 +1,212 @@
+"""Bulk stock posting helpers shared by the API views and management commands"""
+import csv
+import io
+import json
+from collections import defaultdict
+
+from django.db import transaction
+
+from .dashboard import invalidate_dashboard_stats
+from .models import Product, StockMovement, StockMovementDailyRollup, Warehouse, ProductLocation, InsufficientLocationStock
+from .stock_cache import refresh_stock_cache_on_commit
+
+
+MOVEMENT_TYPE_CODES = dict(StockMovement.MOVEMENT_TYPES)
+REFERENCE_MAX_LENGTH = StockMovement._meta.get_field('reference').max_length
+
+
+def parse_movement_batch(data, fmt):
+    """Turn a CSV or JSON payload (str or bytes) into a list of row dicts.
+
+    Raises ``ValueError`` for undecodable or malformed JSON and ``csv.Error``
+    for malformed CSV.
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    if fmt == 'json':
+        rows = json.loads(data)
+        if isinstance(rows, dict):
+            rows = rows.get('movements', [])
+        if not isinstance(rows, list):
+            raise ValueError("JSON batch must be a list of movements")
+        return rows
+    if fmt == 'csv':
+        return list(csv.DictReader(io.StringIO(data)))
+    raise ValueError(f"Unsupported batch format '{fmt}'")
+
+
+def _resolve_products(rows):
+    """Load every product referenced by id or SKU in two queries at most"""
+    ids, skus = set(), set()
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        if row.get('product') not in (None, ''):
+            ids.add(str(row['product']).strip())
+        elif row.get('sku'):
+            skus.add(str(row['sku']).strip())
+
+    by_id, by_sku = {}, {}
+    numeric_ids = [int(pk) for pk in ids if pk.isdigit()]
+    if numeric_ids:
+        for pk, is_active in Product.objects.filter(id__in=numeric_ids).values_list('id', 'is_active'):
+            by_id[str(pk)] = (pk, is_active)
+    if skus:
+        for pk, sku, is_active in Product.objects.filter(sku__in=skus).values_list('id', 'sku', 'is_active'):
+            by_sku[sku] = (pk, is_active)
+    return by_id, by_sku
+
+
+def validate_movement_row(row, by_id, by_sku):
+    """Return ``(cleaned, errors)`` for one raw batch row"""
+    if not isinstance(row, dict):
+        return None, {'__all__': 'Row must be an object'}
+
+    errors = {}
+    product_ref = row.get('product')
+    if product_ref not in (None, ''):
+        match = by_id.get(str(product_ref).strip())
+    elif row.get('sku'):
+        match = by_sku.get(str(row['sku']).strip())
+    else:
+        match = None
+        errors['product'] = 'A product id or sku is required'
+    if match is None and 'product' not in errors:
+        errors['product'] = 'Product not found'
+    elif match is not None and not match[1]:
+        errors['product'] = 'Product is inactive'
+
+    movement_type = str(row.get('movement_type') or '').strip()
+    if movement_type not in MOVEMENT_TYPE_CODES:
+        errors['movement_type'] = f"'{movement_type}' is not a valid movement type"
+
+    try:
+        quantity = int(str(row.get('quantity', '')).strip())
+    except ValueError:
+        quantity = None
+    if quantity is None or quantity < 1:
+        errors['quantity'] = 'Quantity must be a whole number of at least 1'
+
+    reference = str(row.get('reference') or '').strip()
+    if len(reference) > REFERENCE_MAX_LENGTH:
+        errors['reference'] = f'Reference may have at most {REFERENCE_MAX_LENGTH} characters'
+
+    if errors:
+        return None, errors
+    return {
+        'product_id': match[0],
+        'movement_type': movement_type,
+        'quantity': quantity,
+        'reference': reference,
+        'notes': str(row.get('notes') or ''),
+    }, {}
+
+
+def post_movements(movements, batch_size=1000):
+    """Insert unsaved movements in bulk and post their net deltas.
+
+    The insert, the daily rollup and the stock UPDATEs share one transaction,
+    which joins the caller's if there is one. Returns the ``{product_id: delta}``
+    map that was applied.
+    """
+    deltas = defaultdict(int)
+    for movement in movements:
+        deltas[movement.product_id] += movement.delta
+    with transaction.atomic():
+        StockMovement.objects.bulk_create(movements, batch_size=batch_size)
+        StockMovementDailyRollup.record(movements)
+        Product.apply_stock_deltas(deltas)
+        # bulk_create sends no post_save signals
+        transaction.on_commit(invalidate_dashboard_stats)
+        refresh_stock_cache_on_commit(pk for pk, delta in deltas.items() if delta)
+    return deltas
+
+
+def ingest_stock_movements(rows, user, batch_size=1000):
+    """Validate and post a batch of movements in a single transaction.
+
+    Valid rows are inserted with ``bulk_create`` and their deltas collapsed
+    to one net change per product, posted in a single aggregated UPDATE.
+    Invalid rows are reported back with their 1-based row number and do not
+    prevent the rest from being posted.
+    """
+    by_id, by_sku = _resolve_products(rows)
+    movements, errors = [], []
+
+    for number, row in enumerate(rows, start=1):
+        cleaned, row_errors = validate_movement_row(row, by_id, by_sku)
+        if row_errors:
+            errors.append({'row': number, 'errors': row_errors})
+            continue
+        movements.append(StockMovement(created_by=user, **cleaned))
+
+    deltas = post_movements(movements, batch_size=batch_size)
+
+    return {
+        'created': len(movements),
+        'products_updated': sum(1 for delta in deltas.values() if delta),
+        'errors': errors,
+    }
+
+
+def _warehouse_id(value, active_ids):
+    value = str(value or '').strip()
+    return int(value) if value.isdigit() and int(value) in active_ids else None
+
+
+def transfer_stock(rows, user, batch_size=1000):
+    """Move stock between warehouses for a whole rebalancing plan at once.
+
+    Each row names a product (``product`` id or ``sku``), ``from_warehouse``
+    and ``to_warehouse`` ids and a ``quantity``. The plan is all or nothing:
+    if any row is invalid or a source location lacks the stock, nothing is
+    written and the problems are returned. Otherwise every location change
+    and one 'transfer' movement per row are written in one transaction (see
+    ``ProductLocation.move_quantities``). Product totals do not change.
+    """
+    by_id, by_sku = _resolve_products(rows)
+    warehouse_refs = {
+        str(row.get(field) or '').strip()
+        for row in rows if isinstance(row, dict)
+        for field in ('from_warehouse', 'to_warehouse')
+    }
+    active_ids = set(Warehouse.objects.filter(
+        id__in=[int(ref) for ref in warehouse_refs if ref.isdigit()], is_active=True
+    ).values_list('id', flat=True))
+
+    movements, errors = [], []
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': number, 'errors': {'__all__': 'Row must be an object'}})
+            continue
+        cleaned, row_errors = validate_movement_row(dict(row, movement_type='transfer'), by_id, by_sku)
+        source = _warehouse_id(row.get('from_warehouse'), active_ids)
+        destination = _warehouse_id(row.get('to_warehouse'), active_ids)
+        if source is None:
+            row_errors['from_warehouse'] = 'Source warehouse not found or inactive'
+        if destination is None:
+            row_errors['to_warehouse'] = 'Destination warehouse not found or inactive'
+        elif destination == source:
+            row_errors['to_warehouse'] = 'Source and destination must differ'
+        if row_errors:
+            errors.append({'row': number, 'errors': row_errors})
+            continue
+        movements.append(StockMovement(
+            created_by=user, from_warehouse_id=source, to_warehouse_id=destination, **cleaned
+        ))
+    if errors:
+        return {'created': 0, 'errors': errors, 'shortages': []}
+
+    try:
+        with transaction.atomic():
+            ProductLocation.move_quantities([
+                (m.product_id, m.from_warehouse_id, m.to_warehouse_id, m.quantity) for m in movements
+            ])
+            post_movements(movements, batch_size=batch_size)
+    except InsufficientLocationStock as exc:
+        shortages = [
+            {'product_id': product_id, 'warehouse_id': warehouse_id, 'available': available, 'requested': requested}
+            for product_id, warehouse_id, available, requested in exc.shortages
+        ]
+        return {'created': 0, 'errors': [], 'shortages': shortages}
+    return {'created': len(movements), 'errors': [], 'shortages': []}
@@ -0,0 +1,174 @@
+"""Write-through cache of per-product stock availability.
+
+Each product has one entry holding its on-hand quantity (``quantity_in_stock``)
+and reserved quantity (lines on pending sales orders), plus the name, price
+and minimum level needed by the AJAX lookups. Entries are stored under the
+product id, with a small alias key per SKU. Stock writers call
+``refresh_stock_cache`` once their transaction commits, which reloads the
+affected products in one query and writes them through.
+
+An entry's ``version`` is the product's ``updated_at``, which every stock
+write bumps. A refresh never replaces an entry with an older version, so a
+slow writer cannot overwrite a newer value. ``reconcile_stock_cache``
+compares the whole cache with the database and can repair it.
+
+The cache alias is STOCK_CACHE_ALIAS (default ``'default'``); point it at a
+Redis-backed cache in production.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum, Value, IntegerField
+from django.db.models.functions import Coalesce
+
+from .models import Product, OrderItem
+
+
+# Sales order lines in these states hold stock that is not yet deducted
+RESERVING_STATUSES = ['pending']
+
+
+def stock_cache():
+    return caches[getattr(settings, 'STOCK_CACHE_ALIAS', 'default')]
+
+
+def stock_cache_timeout():
+    """Seconds an entry lives without being refreshed (STOCK_CACHE_TIMEOUT)"""
+    return getattr(settings, 'STOCK_CACHE_TIMEOUT', 3600)
+
+
+def _entry_key(product_id):
+    return f'website:stock:id:{product_id}'
+
+
+def _sku_key(sku):
+    return f'website:stock:sku:{sku}'
+
+
+def _stock_rows(products):
+    reserved = OrderItem.objects.filter(
+        product=OuterRef('pk'), order__order_type='sale', order__status__in=RESERVING_STATUSES
+    ).values('product').annotate(total=Sum('quantity')).values('total')
+    return products.annotate(
+        reserved=Coalesce(Subquery(reserved), Value(0), output_field=IntegerField())
+    ).values_list(
+        'id', 'sku', 'name', 'selling_price', 'quantity_in_stock', 'reserved', 'minimum_stock_level',
+        'is_active', 'updated_at'
+    )
+
+
+def load_stock_entries(products):
+    """Build cache entries for a Product queryset in one query; ``{product_id: entry}``"""
+    entries = {}
+    for pk, sku, name, price, on_hand, reserved, minimum, is_active, updated_at in _stock_rows(products):
+        entries[pk] = {
+            'product_id': pk,
+            'sku': sku,
+            'name': name,
+            'selling_price': str(price),
+            'on_hand': on_hand,
+            'reserved': reserved,
+            'available': on_hand - reserved,
+            'minimum_stock_level': minimum,
+            'is_low_stock': on_hand <= minimum,
+            'is_active': is_active,
+            'version': updated_at.timestamp(),
+        }
+    return entries
+
+
+def _write(entries, cached=None):
+    """Store entries unless the cache already holds a newer version"""
+    if cached is None:
+        cached = stock_cache().get_many([_entry_key(pk) for pk in entries])
+    values = {}
+    for pk, entry in entries.items():
+        current = cached.get(_entry_key(pk))
+        if current is not None and current['version'] > entry['version']:
+            continue
+        values[_entry_key(pk)] = entry
+        values[_sku_key(entry['sku'])] = pk
+    stock_cache().set_many(values, timeout=stock_cache_timeout())
+
+
+def refresh_stock_cache(product_ids):
+    """Reload the given products and write them through to the cache"""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    entries = load_stock_entries(Product.objects.filter(pk__in=product_ids))
+    _write(entries)
+    missing = product_ids - set(entries)
+    if missing:
+        stock_cache().delete_many([_entry_key(pk) for pk in missing])
+
+
+def refresh_stock_cache_on_commit(product_ids):
+    """Schedule ``refresh_stock_cache`` for when the current transaction commits"""
+    product_ids = set(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: refresh_stock_cache(product_ids))
+
+
+def get_stock(product_ids=(), skus=()):
+    """Cached entries for product ids and/or SKUs as ``{product_id: entry}``.
+
+    Hits cost no queries; misses are loaded together in one query and cached.
+    """
+    cache = stock_cache()
+    wanted_ids = {int(pk) for pk in product_ids}
+    skus = set(skus)
+    lookup_ids = set(wanted_ids)
+    if skus:
+        lookup_ids.update(cache.get_many([_sku_key(sku) for sku in skus]).values())
+    cached = cache.get_many([_entry_key(pk) for pk in lookup_ids])
+    entries = {entry['product_id']: entry for entry in cached.values()}
+
+    missing_ids = wanted_ids - set(entries)
+    missing_skus = skus - {entry['sku'] for entry in entries.values()}
+    if missing_ids or missing_skus:
+        loaded = load_stock_entries(
+            Product.objects.filter(pk__in=missing_ids) | Product.objects.filter(sku__in=missing_skus)
+        )
+        _write(loaded, cached)
+        entries.update(loaded)
+
+    # An alias left behind by a changed SKU can reach a product that no longer has it
+    return {pk: entry for pk, entry in entries.items() if pk in wanted_ids or entry['sku'] in skus}
+
+
+def reconcile_stock_cache(fix=False, batch_size=1000):
+    """Compare every cached entry with the database.
+
+    Returns counts of ``checked`` products and of entries that are
+    ``missing``, ``stale`` (older version) or ``mismatched`` (same version,
+    different quantities). With ``fix`` the differing entries are rewritten.
+    """
+    cache = stock_cache()
+    report = {'checked': 0, 'missing': 0, 'stale': 0, 'mismatched': 0, 'fixed': 0}
+    last_id = 0
+    while True:
+        entries = load_stock_entries(Product.objects.filter(pk__gt=last_id).order_by('pk')[:batch_size])
+        if not entries:
+            break
+        last_id = max(entries)
+        cached = cache.get_many([_entry_key(pk) for pk in entries])
+        repair = {}
+        for pk, entry in entries.items():
+            current = cached.get(_entry_key(pk))
+            if current is None:
+                report['missing'] += 1
+                continue
+            if current['version'] < entry['version']:
+                report['stale'] += 1
+            elif current != entry:
+                report['mismatched'] += 1
+            else:
+                continue
+            repair[pk] = entry
+        report['checked'] += len(entries)
+        if fix and repair:
+            # Overwrite unconditionally: these entries are known to be wrong
+            _write(repair, cached={})
+            report['fixed'] += len(repair)
+    return report
@@ -0,0 +1,290 @@
+"""Synthetic data for benchmarks: catalogue, customers, orders and stock movements.
+
+Everything is written with ``bulk_create`` in batches, so memory stays flat
+and the large preset (100k products, 1M customers, 10M movements) runs in
+about half an hour on SQLite. The data is seeded, so the same options give
+the same rows. It is kept consistent the way the app keeps it:
+
+* movements are spread over ``days`` and added to the daily rollup batch by
+  batch, and product stock is the net of each product's movements;
+* orders get numbers from ``OrderNumberSequence`` and correct totals;
+* every new product starts its price series.
+
+``bulk_create`` sends no signals, so the search indexes are only built when
+asked for (``index=True``); they can also be rebuilt later with
+``rebuild_product_search_index`` and ``rebuild_search_documents``.
+"""
+import random
+from array import array
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard_stats
+from .global_search import reindex_documents
+from .models import (
+    Category, Supplier, Product, Customer, Order, OrderItem, OrderNumberSequence,
+    StockMovement, StockMovementDailyRollup
+)
+from .price_history import record_price_changes
+from .search import reindex_products
+
+
+PRESETS = {
+    'small': {'products': 1000, 'customers': 5000, 'orders': 2000, 'movements': 50000},
+    'medium': {'products': 20000, 'customers': 100000, 'orders': 50000, 'movements': 1000000},
+    'large': {'products': 100000, 'customers': 1000000, 'orders': 200000, 'movements': 10000000},
+}
+
+CATEGORY_NAMES = [
+    'Fasteners', 'Hand Tools', 'Power Tools', 'Electrical', 'Plumbing', 'Paint', 'Adhesives', 'Safety',
+    'Lighting', 'Garden', 'Storage', 'Cleaning', 'Abrasives', 'Hardware', 'Lumber', 'Flooring',
+]
+ADJECTIVES = ['Heavy-duty', 'Compact', 'Stainless', 'Galvanized', 'Cordless', 'Industrial', 'Precision',
+              'Weatherproof', 'Coated', 'Reinforced', 'Universal', 'Premium']
+MATERIALS = ['steel', 'brass', 'aluminium', 'nylon', 'oak', 'rubber', 'copper', 'PVC', 'carbon', 'ceramic']
+NOUNS = ['bolt', 'hinge', 'bracket', 'drill bit', 'clamp', 'hose', 'wrench', 'fitting', 'cable', 'switch',
+         'panel', 'sealant', 'washer', 'anchor', 'valve', 'blade', 'hook', 'rail', 'socket', 'latch']
+FIRST_NAMES = ['Ada', 'Alan', 'Grace', 'Linus', 'Margaret', 'Dennis', 'Barbara', 'Ken', 'Frances', 'Edsger',
+               'Radia', 'Donald', 'Hedy', 'John', 'Katherine', 'Tim', 'Sophie', 'Guido', 'Anita', 'Niklaus']
+LAST_NAMES = ['Lovelace', 'Turing', 'Hopper', 'Torvalds', 'Hamilton', 'Ritchie', 'Liskov', 'Thompson', 'Allen',
+              'Dijkstra', 'Perlman', 'Knuth', 'Lamarr', 'Backus', 'Johnson', 'Berners-Lee', 'Wilson', 'Rossum']
+CITIES = [('Springfield', 'IL'), ('Portland', 'OR'), ('Austin', 'TX'), ('Denver', 'CO'), ('Madison', 'WI'),
+          ('Raleigh', 'NC'), ('Tucson', 'AZ'), ('Boise', 'ID'), ('Albany', 'NY'), ('Dayton', 'OH')]
+STREETS = ['Main St', 'Oak Ave', 'Elm St', 'Maple Dr', 'Cedar Ln', 'Pine Rd', 'Lake Blvd', 'Hill St']
+# (movement_type, weight, smallest quantity, largest quantity)
+MOVEMENT_MIX = [('in', 35, 20, 120), ('out', 55, 1, 30), ('damaged', 4, 1, 3), ('expired', 2, 1, 5),
+                ('adjustment', 4, 1, 10)]
+ORDER_STATUS_MIX = [('pending', 15), ('confirmed', 15), ('processing', 10), ('shipped', 15), ('delivered', 40),
+                    ('cancelled', 5)]
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _weighted(rng, mix):
+    values = [item[0] for item in mix]
+    return rng.choices(values, weights=[item[1] for item in mix])[0]
+
+
+class SyntheticDataGenerator:
+    """Write seeded synthetic data; ``progress(message)`` is called after every batch"""
+
+    def __init__(self, user, seed=1, batch_size=5000, days=365, progress=None):
+        self.user = user
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.days = days
+        self.progress = progress or (lambda message: None)
+        self.now = timezone.now()
+
+    def _insert(self, model, batch, moment, fields=('created_at',)):
+        """Bulk insert ``batch`` and backdate it to ``moment``.
+
+        The timestamps are ``auto_now_add``, so they are set with one UPDATE of
+        the rows inserted after the previous highest id.
+        """
+        last_id = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        model.objects.bulk_create(batch)
+        model.objects.filter(pk__gt=last_id).update(**{field: moment for field in fields})
+        for row in batch:
+            for field in fields:
+                setattr(row, field, moment)
+
+    def _moment(self, position, total):
+        """Spread ``position`` of ``total`` batches evenly over the history window, oldest first"""
+        return self.now - timedelta(days=self.days) * (1 - position / max(total, 1))
+
+    def catalogue(self, count):
+        """Categories, suppliers and ``count`` products; returns the new product ids"""
+        categories = [Category.objects.get_or_create(name=name)[0].pk for name in CATEGORY_NAMES]
+        suppliers = []
+        for number in range(max(10, count // 500)):
+            city, state = self.rng.choice(CITIES)
+            suppliers.append(Supplier(
+                name=f"Synthetic Supply {number:04d}", contact_person=self.rng.choice(FIRST_NAMES),
+                email=f"orders{number}@supply.example.test", phone=f"555-{number % 10000:04d}",
+                address=f"{self.rng.randint(1, 999)} {self.rng.choice(STREETS)}", city=city, state=state,
+                zipcode=f"{self.rng.randint(10000, 99999)}"
+            ))
+        Supplier.objects.bulk_create(suppliers)
+        supplier_ids = list(Supplier.objects.filter(name__startswith="Synthetic Supply").values_list('pk', flat=True))
+
+        offset = Product.objects.filter(sku__startswith='SYN-').count()
+        first_id = Product.objects.aggregate(last=Max('pk'))['last'] or 0
+
+        def products():
+            for number in range(offset, offset + count):
+                cost = Decimal(self.rng.randint(100, 20000)) / 100
+                yield Product(
+                    name=f"{self.rng.choice(ADJECTIVES)} {self.rng.choice(MATERIALS)} {self.rng.choice(NOUNS)}",
+                    description=f"Synthetic product {number}",
+                    sku=f"SYN-{number:07d}",
+                    category_id=self.rng.choice(categories),
+                    supplier_id=self.rng.choice(supplier_ids),
+                    cost_price=cost,
+                    selling_price=(cost * Decimal(self.rng.uniform(1.2, 1.8))).quantize(Decimal('0.01')),
+                    quantity_in_stock=0,
+                    minimum_stock_level=self.rng.randint(5, 25),
+                    maximum_stock_level=self.rng.randint(200, 2000),
+                )
+
+        written = 0
+        for batch in _batches(products(), self.batch_size):
+            Product.objects.bulk_create(batch)
+            written += len(batch)
+            self.progress(f"Products: {written}/{count}")
+        ids = list(Product.objects.filter(pk__gt=first_id).order_by('pk').values_list('pk', flat=True))
+        record_price_changes(
+            (pk, None, prices) for pk, *prices in
+            Product.objects.filter(pk__gt=first_id).values_list('pk', 'cost_price', 'selling_price')
+        )
+        return ids
+
+    def customers(self, count):
+        def rows():
+            for number in range(count):
+                first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+                city, state = self.rng.choice(CITIES)
+                yield Customer(
+                    first_name=first, last_name=last,
+                    email=f"{first}.{last}{number}@example.test".lower(),
+                    phone=f"555-{self.rng.randint(0, 9999):04d}",
+                    address=f"{self.rng.randint(1, 9999)} {self.rng.choice(STREETS)}", city=city, state=state,
+                    zipcode=f"{self.rng.randint(10000, 99999)}",
+                    customer_type=_weighted(self.rng, [('individual', 80), ('business', 15), ('wholesale', 5)]),
+                    credit_limit=Decimal(self.rng.choice([0, 500, 1000, 5000])),
+                )
+
+        total_batches = -(-count // self.batch_size)
+        for position, batch in enumerate(_batches(rows(), self.batch_size)):
+            with transaction.atomic():
+                self._insert(Customer, batch, self._moment(position, total_batches))
+            self.progress(f"Customers: {min((position + 1) * self.batch_size, count)}/{count}")
+
+    def orders(self, count, product_ids):
+        """Sales and purchase orders of 1-5 lines, spread over the history window"""
+        customer_ids = array('q', Customer.objects.order_by('pk').values_list('pk', flat=True).iterator())
+        supplier_ids = list(Supplier.objects.filter(is_active=True).values_list('pk', flat=True))
+        prices = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'selling_price'))
+        if not (customer_ids and supplier_ids and prices):
+            return
+        total_batches = -(-count // self.batch_size)
+
+        for position, start in enumerate(range(0, count, self.batch_size)):
+            sales = [self.rng.random() < 0.8 for _ in range(min(self.batch_size, count - start))]
+            with transaction.atomic():
+                # One block of numbers per prefix and batch, like OrderNumberAllocator
+                numbers = {
+                    'SO': iter(range(*self._reserve('SO', sales.count(True)))),
+                    'PO': iter(range(*self._reserve('PO', sales.count(False)))),
+                }
+                orders, lines = [], {}
+                for sale in sales:
+                    prefix = 'SO' if sale else 'PO'
+                    number = f"{prefix}-{next(numbers[prefix]):06d}"
+                    chosen = self.rng.sample(product_ids, min(len(product_ids), self.rng.randint(1, 5)))
+                    lines[number] = [(pk, self.rng.randint(1, 10), prices[pk]) for pk in chosen]
+                    orders.append(Order(
+                        order_number=number, order_type='sale' if sale else 'purchase',
+                        customer_id=self.rng.choice(customer_ids) if sale else None,
+                        supplier_id=None if sale else self.rng.choice(supplier_ids),
+                        status=_weighted(self.rng, ORDER_STATUS_MIX),
+                        total_amount=sum((quantity * price for _, quantity, price in lines[number]),
+                                         Decimal('0.00')),
+                        created_by=self.user,
+                    ))
+                self._insert(Order, orders, self._moment(position, total_batches), ('created_at', 'order_date'))
+                # Not every backend sets primary keys on bulk_create
+                ids = dict(Order.objects.filter(order_number__in=lines).values_list('order_number', 'pk'))
+                OrderItem.objects.bulk_create([
+                    OrderItem(order_id=ids[number], product_id=pk, quantity=quantity, unit_price=price,
+                              total_price=quantity * price)
+                    for number, items in lines.items()
+                    for pk, quantity, price in items
+                ], batch_size=1000)
+            self.progress(f"Orders: {start + len(sales)}/{count}")
+
+    @staticmethod
+    def _reserve(prefix, count):
+        """``(first, stop)`` of ``count`` reserved numbers, empty when ``count`` is 0"""
+        if not count:
+            return (0, 0)
+        first, last = OrderNumberSequence.reserve(prefix, count)
+        return (first, last + 1)
+
+    def movements(self, count, product_ids):
+        """Stock movements with a skewed product popularity; returns net stock per product"""
+        if not product_ids:
+            return {}
+        # A few products move far more often than the long tail
+        cum_weights = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(product_ids))))
+        popular = product_ids[:]
+        self.rng.shuffle(popular)
+        types = [(kind, low, high) for kind, _, low, high in MOVEMENT_MIX]
+        type_weights = list(accumulate(weight for _, weight, _, _ in MOVEMENT_MIX))
+        deltas = dict.fromkeys(product_ids, 0)
+        total_batches = -(-count // self.batch_size)
+
+        for position, start in enumerate(range(0, count, self.batch_size)):
+            size = min(self.batch_size, count - start)
+            picked = self.rng.choices(popular, cum_weights=cum_weights, k=size)
+            kinds = self.rng.choices(types, cum_weights=type_weights, k=size)
+            moment = self._moment(position, total_batches)
+            batch = []
+            for product_id, (kind, low, high) in zip(picked, kinds):
+                quantity = self.rng.randint(low, high)
+                deltas[product_id] += StockMovement.stock_delta(kind, quantity)
+                batch.append(StockMovement(product_id=product_id, movement_type=kind, quantity=quantity,
+                                           reference=f"SYN-{position:06d}", created_by=self.user))
+            self._write_movements(batch, moment)
+            self.progress(f"Movements: {start + size}/{count}")
+
+        # Top up products the random walk left below zero so stock matches the ledger
+        corrections = [
+            StockMovement(product_id=pk, movement_type='in', quantity=-delta, reference='SYN-TOPUP',
+                          notes="Synthetic opening balance", created_by=self.user)
+            for pk, delta in deltas.items() if delta < 0
+        ]
+        for batch in _batches(corrections, self.batch_size):
+            self._write_movements(batch, self.now)
+            for movement in batch:
+                deltas[movement.product_id] += movement.quantity
+        return deltas
+
+    def _write_movements(self, batch, moment):
+        with transaction.atomic():
+            self._insert(StockMovement, batch, moment)
+            StockMovementDailyRollup.record(batch)
+
+    def run(self, products, customers, orders, movements, index=False):
+        """Generate everything; returns the number of rows written per kind"""
+        product_ids = self.catalogue(products)
+        self.customers(customers)
+        self.orders(orders, product_ids)
+        deltas = self.movements(movements, product_ids)
+        Product.apply_stock_deltas(deltas)
+
+        if index:
+            self.progress("Indexing products for search...")
+            for batch in _batches(Product.objects.filter(pk__in=product_ids).iterator(), self.batch_size):
+                reindex_products(batch)
+                reindex_documents('product', [product.pk for product in batch])
+            for kind, model in (('supplier', Supplier), ('customer', Customer), ('order', Order)):
+                self.progress(f"Indexing {kind}s for search...")
+                for batch in _batches(model.objects.values_list('pk', flat=True).iterator(), self.batch_size):
+                    reindex_documents(kind, batch)
+        invalidate_dashboard_stats()
+        return {'products': len(product_ids), 'customers': customers, 'orders': orders, 'movements': movements}
@@ -1,3 +1,1517 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime, time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Customer, Category, Supplier, Product, StockMovement, Order, OrderItem,
+    OrderNumberSequence, OrderNumberAllocator, ProductSearchTerm, StockMovementDailyRollup,
+    Warehouse, ProductLocation, StockSnapshot, BulkActionJob, OrderAllocation, InsufficientLocationStock,
+    DemandForecast, DemandForecastRun, SearchDocument, ProductPriceChange
+)
+from .allocation import allocate_orders
+from .benchmarks import compare_results, run_benchmarks
+from .dashboard import get_dashboard_stats, dashboard_cache_counters
+from .filters import filter_products, filter_orders
+from .forecasting import run_forecasts
+from .global_search import global_search, index_document, reindex_documents
+from .imports import import_products
+from .jobs import enqueue_bulk_action, run_queued_jobs
+from .orders import create_order_with_items, transition_orders
+from .pagination import KeysetPaginator
+from .price_history import price_series
+from .query_metrics import METRICS, QueryBudgetMixin, QueryRecorder, fingerprint
+from .reports import movement_summary, top_products_by_movements, top_forecast_demand
+from .replenishment import np, plan_replenishment, replenish
+from .search import search_products, reindex_product
+from .smoothing import seasonal_smoothing
+from .synthetic import SyntheticDataGenerator
+from .snapshots import take_snapshot, balances_at, warehouse_balances_at
+from .stock import parse_movement_batch, ingest_stock_movements, transfer_stock
+from .stock_cache import get_stock, reconcile_stock_cache
+
+
+def make_catalogue(product_count=1, quantity_in_stock=0):
+    """Create a category, supplier and ``product_count`` products for tests"""
+    category = Category.objects.create(name='Hardware')
+    supplier = Supplier.objects.create(
+        name='Acme', email='sales@acme.test', phone='555-0100',
+        address='1 Main St', city='Springfield', state='IL', zipcode='62701'
+    )
+    products = [
+        Product.objects.create(
+            name=f'Widget {i}', sku=f'WID-{i:04d}', category=category, supplier=supplier,
+            cost_price=Decimal('5.00'), selling_price=Decimal('8.00'),
+            quantity_in_stock=quantity_in_stock
+        )
+        for i in range(product_count)
+    ]
+    return category, supplier, products
+
+
+def make_customer(**kwargs):
+    fields = dict(
+        first_name='Ada', last_name='Lovelace', email='ada@example.test', phone='555-0199',
+        address='12 Engine Rd', city='London', state='LDN', zipcode='N1'
+    )
+    fields.update(kwargs)
+    return Customer.objects.create(**fields)
+
+
+def skip_if_in_memory_sqlite(test):
+    # Worker threads would block on the shared in-memory database's table locks
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        test.skipTest("Concurrency tests need a file-backed SQLite test database (TEST NAME) or another backend")
+
+
+class StockMovementTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('picker', password='secret')
+        _, _, (self.product,) = make_catalogue(quantity_in_stock=100)
+
+    def test_movement_types_post_signed_deltas(self):
+        for movement_type, quantity in [('in', 10), ('out', 3), ('damaged', 2), ('adjustment', 50)]:
+            StockMovement.objects.create(
+                product=self.product, movement_type=movement_type,
+                quantity=quantity, created_by=self.user
+            )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity_in_stock, 105)
+
+    def test_resaving_movement_does_not_post_twice(self):
+        movement = StockMovement.objects.create(
+            product=self.product, movement_type='in', quantity=10, created_by=self.user
+        )
+        movement.notes = 'Checked by supervisor'
+        movement.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity_in_stock, 110)
+
+    def test_save_updates_only_stock_columns(self):
+        movement = StockMovement(
+            product=self.product, movement_type='out', quantity=1, created_by=self.user
+        )
+        Product.objects.filter(pk=self.product.pk).update(name='Renamed elsewhere')
+        movement.save()
+        self.product.refresh_from_db()
+        # A stale in-memory product must not overwrite concurrent edits.
+        self.assertEqual(self.product.name, 'Renamed elsewhere')
+        self.assertEqual(movement.product.quantity_in_stock, 99)
+
+
+class StockMovementConcurrencyTests(TransactionTestCase):
+    WORKERS = 24
+    MOVEMENTS_PER_WORKER = 10
+
+    def setUp(self):
+        skip_if_in_memory_sqlite(self)
+
+    def test_concurrent_movements_never_lose_updates(self):
+        user = User.objects.create_user('picker', password='secret')
+        _, _, (product,) = make_catalogue(quantity_in_stock=1000)
+        barrier = threading.Barrier(self.WORKERS)
+        errors = []
+
+        def worker(index):
+            try:
+                barrier.wait()
+                for i in range(self.MOVEMENTS_PER_WORKER):
+                    StockMovement.objects.create(
+                        product=Product.objects.get(pk=product.pk),
+                        movement_type='in' if (index + i) % 2 else 'out',
+                        quantity=index + 1, created_by=user
+                    )
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        expected = 1000 + sum(m.delta for m in StockMovement.objects.filter(product=product))
+        product.refresh_from_db()
+        self.assertEqual(StockMovement.objects.count(), self.WORKERS * self.MOVEMENTS_PER_WORKER)
+        self.assertEqual(product.quantity_in_stock, expected)
+
+
+class BulkStockMovementTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('receiver', password='secret')
+        _, _, self.products = make_catalogue(product_count=3, quantity_in_stock=10)
+
+    def test_ingest_collapses_deltas_and_reports_bad_rows(self):
+        first, second, third = self.products
+        rows = parse_movement_batch(
+            "sku,movement_type,quantity,reference\n"
+            f"{first.sku},in,5,PO-1\n"
+            f"{first.sku},in,7,PO-1\n"
+            f"{second.sku},out,4,SO-9\n"
+            "NOPE,in,1,\n"
+            f"{third.sku},teleport,1,\n"
+            f"{third.sku},in,0,\n",
+            'csv'
+        )
+        # One SKU lookup, one bulk insert, the daily rollup lookup and insert
+        # (in its own savepoint) and one UPDATE for every product, plus the
+        # savepoint around the write.
+        with self.assertNumQueries(9):
+            result = ingest_stock_movements(rows, self.user)
+
+        self.assertEqual(result['created'], 3)
+        self.assertEqual(result['products_updated'], 2)
+        self.assertEqual([error['row'] for error in result['errors']], [4, 5, 6])
+        quantities = dict(Product.objects.values_list('sku', 'quantity_in_stock'))
+        self.assertEqual(quantities, {first.sku: 22, second.sku: 6, third.sku: 10})
+
+    def test_json_endpoint(self):
+        self.client.login(username='receiver', password='secret')
+        payload = [
+            {'product': self.products[0].pk, 'movement_type': 'in', 'quantity': 3},
+            {'product': 999999, 'movement_type': 'in', 'quantity': 3},
+        ]
+        response = self.client.post(
+            reverse('bulk_stock_movements'), json.dumps(payload), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['errors'][0]['errors']['product'], 'Product not found')
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].quantity_in_stock, 13)
+
+    def test_malformed_csv_is_rejected(self):
+        self.client.login(username='receiver', password='secret')
+        body = "sku,movement_type,quantity,notes\n" + f"{self.products[0].sku},in,1," + 'x' * 200000 + "\n"
+        response = self.client.post(reverse('bulk_stock_movements'), body, content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Could not parse batch', response.json()['error'])
+
+
+class OrderCreationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.customer = make_customer()
+        _, _, self.products = make_catalogue(product_count=60, quantity_in_stock=100)
+
+    def order_data(self, **kwargs):
+        data = {'order_type': 'sale', 'customer': self.customer.pk, 'status': 'confirmed'}
+        data.update(kwargs)
+        return data
+
+    def count_queries(self, line_count):
+        lines = [{'product': p.pk, 'quantity': 2} for p in self.products[:line_count]]
+        with CaptureQueriesContext(connection) as queries:
+            order, errors = create_order_with_items(self.order_data(), lines, self.user)
+        self.assertEqual(errors, {})
+        return len(queries), order
+
+    def test_query_count_is_flat_in_line_count(self):
+        # The first order also creates the number sequence and today's rollup rows
+        warm_up = [{'product': p.pk, 'quantity': 1} for p in self.products[:50]]
+        create_order_with_items(self.order_data(), warm_up, self.user)
+        small, _ = self.count_queries(5)
+        large, order = self.count_queries(50)
+        self.assertEqual(small, large)
+        self.assertEqual(order.items.count(), 50)
+        self.assertEqual(order.total_amount, Decimal('800.00'))
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).quantity_in_stock, 95)
+        self.assertEqual(StockMovement.objects.filter(reference=order.order_number).count(), 50)
+
+    def test_invalid_line_writes_nothing(self):
+        lines = [{'product': self.products[0].pk, 'quantity': 1}, {'sku': 'MISSING', 'quantity': 1}]
+        order, errors = create_order_with_items(self.order_data(), lines, self.user)
+        self.assertIsNone(order)
+        self.assertEqual(errors['items'][0]['line'], 2)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_order_item_save_cost_does_not_grow_with_lines(self):
+        order = Order.objects.create(order_type='sale', customer=self.customer, created_by=self.user)
+        costs = []
+        for product in self.products[:20]:
+            with CaptureQueriesContext(connection) as queries:
+                OrderItem(order=order, product=product, quantity=1, unit_price=Decimal('8.00')).save()
+            costs.append(len(queries))
+        self.assertEqual(len(set(costs)), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal('160.00'))
+
+    def test_api_creates_order(self):
+        self.client.login(username='clerk', password='secret')
+        payload = self.order_data(items=[{'sku': self.products[1].sku, 'quantity': 3, 'unit_price': '7.50'}])
+        response = self.client.post(reverse('create_order_api'), json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['total_amount'], '22.50')
+
+
+class OrderNumberTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+
+    def test_sequence_continues_after_existing_numbers(self):
+        Order.objects.create(order_number='SO-000041', order_type='sale', created_by=self.user)
+        order = Order.objects.create(order_type='sale', created_by=self.user)
+        purchase = Order.objects.create(order_type='purchase', created_by=self.user)
+        self.assertEqual(order.order_number, 'SO-000042')
+        self.assertEqual(purchase.order_number, 'PO-000001')
+
+    def test_sequence_starts_after_the_numerically_highest_number(self):
+        for number in ('SO-999999', 'SO-1000000', 'SO-LEGACY', 'SO-2019-XL'):
+            Order.objects.create(order_number=number, order_type='sale', created_by=self.user)
+        order = Order.objects.create(order_type='sale', created_by=self.user)
+        self.assertEqual(order.order_number, 'SO-1000001')
+
+    def test_allocator_reserves_blocks(self):
+        allocator = OrderNumberAllocator(block_size=10)
+        with CaptureQueriesContext(connection) as queries:
+            numbers = [allocator.next_number('TST') for _ in range(25)]
+        self.assertEqual(numbers, list(range(1, 26)))
+        self.assertEqual(OrderNumberSequence.objects.get(prefix='TST').last_value, 30)
+        # Three block reservations rather than one round trip per number
+        self.assertLess(len(queries), 20)
+
+    def test_concurrent_orders_get_unique_numbers(self):
+        skip_if_in_memory_sqlite(self)
+        workers, per_worker = 16, 5
+        barrier = threading.Barrier(workers)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(per_worker):
+                    Order.objects.create(order_type='sale', created_by=self.user)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        numbers = set(Order.objects.values_list('order_number', flat=True))
+        self.assertEqual(len(numbers), workers * per_worker)
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('manager', password='secret')
+        _, _, self.products = make_catalogue(product_count=2, quantity_in_stock=5)
+
+    def test_snapshot_is_served_from_cache(self):
+        first = get_dashboard_stats()
+        with self.assertNumQueries(0):
+            second = get_dashboard_stats()
+        self.assertEqual(second['total_products'], first['total_products'])
+        self.assertEqual(second['low_stock_products'], 2)
+        self.assertEqual(dashboard_cache_counters(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_signals_invalidate_snapshot(self):
+        get_dashboard_stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_customer()
+        self.assertEqual(get_dashboard_stats()['total_customers'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_stock_movements(
+                [{'product': self.products[0].pk, 'movement_type': 'in', 'quantity': 50}], self.user
+            )
+        self.assertEqual(get_dashboard_stats()['low_stock_products'], 1)
+
+    def test_dashboard_view_uses_snapshot(self):
+        self.client.login(username='manager', password='secret')
+        self.client.get(reverse('home'))
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_products'], 2)
+        self.assertEqual(dashboard_cache_counters()['hits'], 1)
+
+
+class CustomerListApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('manager', password='secret')
+        self.client.login(username='manager', password='secret')
+        for i in range(7):
+            make_customer(first_name=f'Cust{i}', email=f'c{i}@example.test',
+                          customer_type='business' if i % 2 else 'individual')
+
+    def test_keyset_pages_cover_every_customer_once(self):
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 3}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(reverse('customer_list_api'), params).json()
+            seen.extend(row['id'] for row in data['results'])
+            cursor = data['next_cursor']
+            if not data['has_next']:
+                break
+        expected = list(Customer.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_search_uses_customer_search_form(self):
+        data = self.client.get(reverse('customer_list_api'), {'search': 'cust3'}).json()
+        self.assertEqual([row['first_name'] for row in data['results']], ['Cust3'])
+        data = self.client.get(reverse('customer_list_api'), {'customer_type': 'business'}).json()
+        self.assertEqual(len(data['results']), 3)
+
+    def test_bad_cursor_is_rejected(self):
+        response = self.client.get(reverse('customer_list_api'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_dashboard_does_not_load_customers(self):
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('home'))
+        for i in range(50):
+            make_customer(email=f'bulk{i}@example.test')
+        cache.clear()
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse('home'))
+        self.assertNotIn('customers', response.context)
+        self.assertEqual(len(few), len(many))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('auditor', password='secret')
+        self.client.login(username='auditor', password='secret')
+        _, _, (self.product,) = make_catalogue()
+        StockMovement.objects.bulk_create([
+            StockMovement(product=self.product, movement_type='in', quantity=i + 1, created_by=self.user)
+            for i in range(23)
+        ])
+
+    def test_forward_and_backward_pages(self):
+        paginator = KeysetPaginator(StockMovement.objects.all(), ordering=('-created_at', '-id'), per_page=5)
+        expected = list(StockMovement.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        pages, page = [], paginator.page()
+        self.assertFalse(page.has_previous)
+        while True:
+            pages.append(page)
+            if not page.has_next:
+                break
+            page = paginator.page(page.next_cursor)
+        self.assertEqual([m.id for page in pages for m in page], expected)
+        self.assertEqual(len(pages), 5)
+
+        back = paginator.page(pages[-1].previous_cursor)
+        self.assertEqual([m.id for m in back], [m.id for m in pages[-2]])
+        self.assertEqual(paginator.count(), (23, True))
+        self.assertEqual(KeysetPaginator(StockMovement.objects.all(), ('-id',), count_limit=10).count(), (10, False))
+
+    def test_deep_pages_cost_the_same_as_the_first(self):
+        url = reverse('stock_movement_list_api')
+        with CaptureQueriesContext(connection) as first:
+            data = self.client.get(url, {'limit': 5}).json()
+        for _ in range(3):
+            data = self.client.get(url, {'limit': 5, 'cursor': data['next_cursor']}).json()
+        with CaptureQueriesContext(connection) as deep:
+            data = self.client.get(url, {'limit': 5, 'cursor': data['next_cursor']}).json()
+        self.assertEqual(len(first), len(deep))
+        self.assertEqual(len(data['results']), 3)
+        self.assertFalse(any('COUNT(' in q['sql'].upper() for q in deep.captured_queries))
+        self.assertFalse(any('OFFSET' in q['sql'].upper() for q in deep.captured_queries))
+
+    def test_json_lists_apply_search_forms(self):
+        data = self.client.get(reverse('product_list_api'), {'search': 'widget', 'count': '1'}).json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['sku'], self.product.sku)
+        Order.objects.create(order_type='purchase', created_by=self.user)
+        data = self.client.get(reverse('order_list_api'), {'order_type': 'sale'}).json()
+        self.assertEqual(data['results'], [])
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        category, supplier, (self.bolt, self.nut) = make_catalogue(product_count=2)
+        self.bolt.name, self.bolt.description = 'Steel hex bolt', 'Zinc plated'
+        self.bolt.save()
+        self.nut.name, self.nut.description = 'Hex nut', 'Fits steel bolts'
+        self.nut.save()
+
+    def test_ranked_prefix_search(self):
+        results = search_products('steel bol')
+        # Both match every word; the bolt matches in its name, the nut only in its description
+        self.assertEqual(results, [self.bolt, self.nut])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+        self.assertEqual(search_products('hex zinc'), [self.bolt])
+        self.assertEqual(search_products('washer'), [])
+
+    def test_exact_sku_fast_path(self):
+        results = search_products(self.nut.sku)
+        self.assertEqual(results[0], self.nut)
+        self.assertIsNone(results[0].search_rank)
+
+    def test_index_follows_product_saves(self):
+        self.nut.name = 'Wing nut'
+        self.nut.save()
+        self.assertEqual(search_products('wing'), [self.nut])
+        self.assertFalse(ProductSearchTerm.objects.filter(product=self.nut, term='hex').exists())
+        with self.assertNumQueries(1):
+            # Unchanged text is only compared against the stored terms
+            reindex_product(self.nut)
+
+    def test_product_list_filter_avoids_leading_wildcards(self):
+        _, products = filter_products({'search': 'hex'})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(set(products), {self.bolt, self.nut})
+        self.assertNotIn("'%", queries.captured_queries[0]['sql'])
+        self.assertNotIn('LIKE', queries.captured_queries[0]['sql'].upper())
+
+
+class MovementRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('analyst', password='secret')
+        _, _, self.products = make_catalogue(product_count=2, quantity_in_stock=100)
+
+    def test_rollup_tracks_single_and_bulk_movements(self):
+        first, second = self.products
+        StockMovement.objects.create(product=first, movement_type='in', quantity=5, created_by=self.user)
+        StockMovement.objects.create(product=first, movement_type='in', quantity=7, created_by=self.user)
+        ingest_stock_movements([
+            {'product': first.pk, 'movement_type': 'out', 'quantity': 2},
+            {'product': second.pk, 'movement_type': 'out', 'quantity': 1},
+            {'product': second.pk, 'movement_type': 'out', 'quantity': 1},
+        ], self.user)
+
+        today = StockMovementDailyRollup.movement_date(timezone.now())
+        rollup = StockMovementDailyRollup.objects.get(date=today, product=first, movement_type='in')
+        self.assertEqual((rollup.movement_count, rollup.total_quantity), (2, 12))
+        summary = {row['movement_type']: row for row in movement_summary(today, today)}
+        self.assertEqual(summary['out']['count'], 3)
+        self.assertEqual(summary['out']['total_quantity'], 4)
+        top = top_products_by_movements(today, today)
+        self.assertEqual([(p, p.movement_count) for p in top], [(first, 3), (second, 2)])
+        self.assertEqual(movement_summary(today - timedelta(days=9), today - timedelta(days=8)).count(), 0)
+
+    def test_backfill_matches_live_rollup(self):
+        for product in self.products:
+            StockMovement.objects.create(product=product, movement_type='in', quantity=3, created_by=self.user)
+            StockMovement.objects.create(product=product, movement_type='damaged', quantity=1, created_by=self.user)
+        live = sorted(StockMovementDailyRollup.objects.values_list(
+            'date', 'product', 'movement_type', 'movement_count', 'total_quantity'))
+        StockMovementDailyRollup.objects.all().delete()
+        call_command('backfill_movement_rollups', stdout=io.StringIO())
+        rebuilt = sorted(StockMovementDailyRollup.objects.values_list(
+            'date', 'product', 'movement_type', 'movement_count', 'total_quantity'))
+        self.assertEqual(rebuilt, live)
+
+
+class StockSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('controller', password='secret')
+        _, _, (self.product,) = make_catalogue(quantity_in_stock=100)
+        self.now = timezone.now()
+
+    def days_ago(self, days):
+        return self.now - timedelta(days=days)
+
+    def move(self, movement_type, quantity, days):
+        movement = StockMovement.objects.create(
+            product=self.product, movement_type=movement_type, quantity=quantity, created_by=self.user
+        )
+        StockMovement.objects.filter(pk=movement.pk).update(created_at=self.days_ago(days))
+
+    def test_point_in_time_balances(self):
+        warehouse = Warehouse.objects.create(
+            name='North', address='1 Dock Rd', city='Springfield', state='IL', zipcode='62701', manager=self.user
+        )
+        ProductLocation.objects.create(product=self.product, warehouse=warehouse, quantity=60)
+        self.move('in', 10, days=10)
+        self.assertEqual(take_snapshot(taken_at=self.days_ago(8)), self.days_ago(8))
+        self.move('out', 30, days=6)
+        self.move('in', 5, days=2)
+        late = Product.objects.create(
+            name='Late arrival', sku='LATE-1', category=self.product.category, supplier=self.product.supplier,
+            cost_price=Decimal('1.00'), selling_price=Decimal('2.00'), quantity_in_stock=7
+        )
+
+        self.assertEqual(balances_at(self.days_ago(11))[self.product.pk], 100)
+        self.assertEqual(balances_at(self.days_ago(9))[self.product.pk], 110)
+        self.assertEqual(balances_at(self.days_ago(7))[self.product.pk], 110)
+        self.assertEqual(balances_at(self.days_ago(4))[self.product.pk], 80)
+        # A bounded number of queries regardless of ledger size
+        with self.assertNumQueries(7):
+            balances = balances_at(self.days_ago(1))
+        self.assertEqual(balances, {self.product.pk: 85, late.pk: 7})
+
+        run, locations = warehouse_balances_at(self.days_ago(1))
+        self.assertEqual(run, self.days_ago(8))
+        self.assertEqual(locations, {(self.product.pk, warehouse.pk): 60})
+
+    def test_interval_is_respected(self):
+        self.assertIsNotNone(take_snapshot())
+        self.assertIsNone(take_snapshot())
+        self.assertIsNotNone(take_snapshot(force=True))
+        self.assertEqual(StockSnapshot.objects.count(), 2)
+
+    def test_balance_endpoint_rejects_impossible_dates(self):
+        self.client.login(username='controller', password='secret')
+        for value in ('2024-02-30', '2024-13-01T10:00', 'yesterday'):
+            response = self.client.get(reverse('get_stock_balance'), {'at': value})
+            self.assertEqual(response.status_code, 400, value)
+        self.assertEqual(self.client.get(reverse('get_stock_balance'), {'at': '2024-02-29'}).status_code, 200)
+
+    def test_balance_on_a_date_includes_that_whole_day(self):
+        self.client.login(username='controller', password='secret')
+        day = timezone.localdate() - timedelta(days=5)
+        movement = StockMovement.objects.create(
+            product=self.product, movement_type='in', quantity=10, created_by=self.user
+        )
+        midday = timezone.make_aware(datetime.combine(day, time(12)))
+        StockMovement.objects.filter(pk=movement.pk).update(created_at=midday)
+        for at, quantity in ((day - timedelta(days=1), 100), (day, 110)):
+            response = self.client.get(reverse('get_stock_balance'), {'at': at.isoformat()})
+            self.assertEqual(response.json()['balances'], [{'product_id': self.product.pk, 'quantity': quantity}])
+
+
+class AdminChangelistQueryTests(TestCase):
+    """Changelist pages must cost the same number of queries for 1 row or a full page"""
+
+    def setUp(self):
+        User.objects.create_superuser('admin', 'admin@example.test', 'secret')
+        self.client.login(username='admin', password='secret')
+        self.category, self.supplier, _ = make_catalogue(product_count=1, quantity_in_stock=0)
+
+    def add_rows(self, count):
+        for i in range(count):
+            category = Category.objects.create(name=f'Category {i}')
+            supplier = Supplier.objects.create(
+                name=f'Supplier {i}', email=f's{i}@example.test', phone='555', address='x',
+                city='y', state='z', zipcode='1'
+            )
+            Product.objects.create(
+                name=f'Extra {i}', sku=f'EXT-{i}', category=category, supplier=supplier,
+                cost_price=Decimal('2.00'), selling_price=Decimal('3.00'), quantity_in_stock=i
+            )
+
+    def changelist_queries(self, model_name, params=None):
+        url = reverse(f'admin:website_{model_name}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_query_count_is_pinned_per_page(self):
+        baseline = {name: self.changelist_queries(name)[0] for name in ('category', 'supplier', 'product')}
+        self.add_rows(24)
+        for name, count in baseline.items():
+            self.assertEqual(self.changelist_queries(name)[0], count, name)
+
+    def test_computed_columns_are_sortable(self):
+        self.add_rows(3)
+        list_display = ('name', 'sku', 'category', 'supplier', 'get_stock_status', 'quantity_in_stock',
+                        'minimum_stock_level', 'selling_price', 'get_profit_margin', 'is_active', 'created_at')
+        _, response = self.changelist_queries('product', {'o': list_display.index('get_profit_margin') + 1})
+        margins = [p.margin for p in response.context['cl'].result_list]
+        self.assertEqual(margins, sorted(margins))
+        _, response = self.changelist_queries('product', {'o': list_display.index('get_stock_status') + 1})
+        out_of_stock = [p for p in response.context['cl'].result_list if p.stock_rank == 0]
+        self.assertEqual(list(response.context['cl'].result_list[:2]), out_of_stock)
+        self.assertEqual(sorted(round(p.margin, 1) for p in out_of_stock), [33.3, 37.5])
+        _, response = self.changelist_queries('category', {'o': 2})
+        self.assertEqual(response.context['cl'].result_list[0].active_product_count, 1)
+
+
+class BulkActionJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.test', 'secret')
+        self.client.login(username='admin', password='secret')
+        _, _, self.products = make_catalogue(product_count=3, quantity_in_stock=20)
+        self.customer = make_customer()
+
+    def make_order(self, product, quantity):
+        order = Order.objects.create(order_type='sale', customer=self.customer, created_by=self.user)
+        OrderItem.objects.create(order=order, product=product, quantity=quantity, unit_price=Decimal('8.00'))
+        return order
+
+    def test_mark_as_low_stock_is_one_update_per_chunk(self):
+        with override_settings(BULK_ACTION_CHUNK_SIZE=2):
+            job = enqueue_bulk_action('product.mark_low_stock', Product.objects.all(), self.user)
+        self.assertEqual((job.status, job.processed, job.progress), ('done', 3, 100.0))
+        self.assertEqual(set(Product.objects.values_list('minimum_stock_level', flat=True)), {25})
+
+    def test_confirming_orders_posts_stock_once(self):
+        orders = [self.make_order(product, 4) for product in self.products]
+        url = reverse('admin:website_order_changelist')
+        data = {'action': 'mark_as_confirmed', '_selected_action': [o.pk for o in orders]}
+        self.client.post(url, data)
+        # Confirmed -> shipped keeps the stock already deducted
+        self.client.post(url, dict(data, action='mark_as_shipped'))
+
+        self.assertEqual(set(Order.objects.values_list('status', flat=True)), {'shipped'})
+        self.assertEqual(set(Product.objects.values_list('quantity_in_stock', flat=True)), {16})
+        self.assertEqual(StockMovement.objects.filter(movement_type='out').count(), 3)
+
+    @override_settings(BULK_ACTION_INLINE_LIMIT=1, BULK_ACTION_CHUNK_SIZE=1)
+    def test_large_selections_are_queued_for_the_worker(self):
+        job = enqueue_bulk_action('product.set_active', Product.objects.all(), self.user, {'is_active': False})
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(Product.objects.filter(is_active=True).count(), 3)
+
+        self.assertEqual(run_queued_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), ('done', 3))
+        self.assertFalse(Product.objects.filter(is_active=True).exists())
+
+    @override_settings(BULK_ACTION_INLINE_LIMIT=1, BULK_ACTION_CHUNK_SIZE=1, BULK_ACTION_STALE_AFTER=60)
+    def test_jobs_abandoned_by_a_dead_worker_are_resumed(self):
+        job = enqueue_bulk_action('product.set_active', Product.objects.all(), self.user, {'is_active': False})
+        # A worker claimed the job, committed one chunk and died
+        Product.objects.filter(pk=self.products[0].pk).update(is_active=False)
+        BulkActionJob.objects.filter(pk=job.pk).update(
+            status='running', processed=1, heartbeat_at=timezone.now() - timedelta(seconds=30)
+        )
+        self.assertEqual(run_queued_jobs(), 0)
+
+        BulkActionJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(run_queued_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), ('done', 3))
+        self.assertFalse(Product.objects.filter(is_active=True).exists())
+
+
+class OrderTransitionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.client.login(username='clerk', password='secret')
+        _, _, self.products = make_catalogue(product_count=2, quantity_in_stock=100)
+        self.customer = make_customer()
+
+    def make_orders(self, count, status='pending'):
+        orders = []
+        for _ in range(count):
+            order = Order.objects.create(order_type='sale', customer=self.customer, status=status, created_by=self.user)
+            for product in self.products:
+                OrderItem.objects.create(order=order, product=product, quantity=2, unit_price=Decimal('8.00'))
+            orders.append(order)
+        return [order.pk for order in orders]
+
+    def test_query_count_does_not_grow_with_orders(self):
+        transition_orders(self.make_orders(1), 'confirmed', self.user)
+        ids = self.make_orders(1)
+        with CaptureQueriesContext(connection) as few:
+            transition_orders(ids, 'confirmed', self.user)
+        ids = self.make_orders(20)
+        with CaptureQueriesContext(connection) as many:
+            result = transition_orders(ids, 'confirmed', self.user)
+        self.assertEqual(len(result['updated']), 20)
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(set(Product.objects.values_list('quantity_in_stock', flat=True)), {100 - 2 * 22})
+
+    def test_cancelling_a_committed_order_restores_stock(self):
+        ids = self.make_orders(2)
+        transition_orders(ids, 'confirmed', self.user)
+        transition_orders(ids, 'processing', self.user)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).quantity_in_stock, 96)
+        transition_orders(ids, 'cancelled', self.user)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).quantity_in_stock, 100)
+        self.assertEqual(StockMovement.objects.filter(movement_type='in').count(), 4)
+
+    def test_disallowed_transitions_are_rejected_individually(self):
+        shipped, pending = self.make_orders(1, status='shipped') + self.make_orders(1)
+        result = transition_orders([shipped, pending], 'confirmed', self.user)
+        self.assertEqual(result['updated'], [pending])
+        self.assertEqual([r['order'] for r in result['rejected']], [shipped])
+        self.assertEqual(Order.objects.get(pk=shipped).status, 'shipped')
+
+    def test_update_order_status_view(self):
+        pk = self.make_orders(1)[0]
+        url = reverse('update_order_status', args=[pk])
+        self.assertEqual(self.client.post(url, {'status': 'shipped'}).status_code, 200)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).quantity_in_stock, 98)
+        response = self.client.post(url, {'status': 'pending'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.get(pk=pk).status, 'shipped')
+
+
+class StockCheckApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.client.login(username='clerk', password='secret')
+        _, _, self.products = make_catalogue(product_count=60, quantity_in_stock=10)
+        self.url = reverse('check_stock')
+
+    def test_many_products_in_two_queries(self):
+        ids = ','.join(str(p.pk) for p in self.products[:50])
+        with self.assertNumQueries(4):  # session + user + aggregate + rows
+            response = self.client.get(self.url, {'ids': ids, 'skus': 'WID-0055,NOPE'})
+        data = response.json()
+        self.assertEqual(len(data['products']), 51)
+        self.assertEqual(data['missing'], {'ids': [], 'skus': ['NOPE']})
+        self.assertEqual(data['products'][0]['stock_quantity'], 10)
+        self.assertIn('ETag', response)
+
+    def test_revalidation_returns_304_until_stock_changes(self):
+        params = {'ids': f'{self.products[0].pk},{self.products[1].pk}'}
+        etag = self.client.get(self.url, params)['ETag']
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        StockMovement.objects.create(product=self.products[1], movement_type='in', quantity=3, created_by=self.user)
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['products'][1]['stock_quantity'], 13)
+
+    def test_writes_within_one_second_are_not_hidden(self):
+        params = {'ids': str(self.products[0].pk)}
+        first = self.client.get(self.url, params)
+        # A second write in the same second as the first
+        self.products[0].refresh_from_db()
+        Product.objects.filter(pk=self.products[0].pk).update(
+            quantity_in_stock=11, updated_at=self.products[0].updated_at + timedelta(microseconds=1)
+        )
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=first['ETag'],
+                                   HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['products'][0]['stock_quantity'], 11)
+        response = self.client.get(self.url, params, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_json_and_validation(self):
+        response = self.client.post(self.url, json.dumps({'skus': ['WID-0001']}), content_type='application/json')
+        self.assertEqual(response.json()['products'][0]['sku'], 'WID-0001')
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+
+class StockCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('clerk', password='secret')
+        _, _, self.products = make_catalogue(product_count=2, quantity_in_stock=50)
+        self.product = self.products[0]
+
+    def test_reads_hit_the_cache_after_the_first_miss(self):
+        with self.assertNumQueries(1):
+            get_stock(product_ids=[self.product.pk])
+        with self.assertNumQueries(0):
+            entry = get_stock(skus=[self.product.sku])[self.product.pk]
+        self.assertEqual((entry['on_hand'], entry['reserved']), (50, 0))
+
+    def test_stock_postings_write_through(self):
+        get_stock(product_ids=[self.product.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            StockMovement.objects.create(product=self.product, movement_type='out', quantity=8, created_by=self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_stock(product_ids=[self.product.pk])[self.product.pk]['on_hand'], 42)
+
+    def test_pending_sales_lines_are_reserved(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(order_type='sale', customer=make_customer(), created_by=self.user)
+            OrderItem.objects.create(order=order, product=self.product, quantity=3, unit_price=Decimal('8.00'))
+        entry = get_stock(product_ids=[self.product.pk])[self.product.pk]
+        self.assertEqual((entry['on_hand'], entry['reserved'], entry['available']), (50, 3, 47))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_orders([order.pk], 'confirmed', self.user)
+        entry = get_stock(product_ids=[self.product.pk])[self.product.pk]
+        self.assertEqual((entry['on_hand'], entry['reserved']), (47, 0))
+
+    def test_plain_order_saves_refresh_reserved_stock(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(order_type='sale', customer=make_customer(), created_by=self.user)
+            OrderItem.objects.create(order=order, product=self.product, quantity=3, unit_price=Decimal('8.00'))
+        self.assertEqual(get_stock(product_ids=[self.product.pk])[self.product.pk]['reserved'], 3)
+
+        order.status = 'cancelled'
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        with self.assertNumQueries(0):
+            entry = get_stock(product_ids=[self.product.pk])[self.product.pk]
+        self.assertEqual((entry['on_hand'], entry['reserved'], entry['available']), (50, 0, 50))
+
+    def test_reconciliation_finds_and_fixes_stale_entries(self):
+        get_stock(product_ids=[p.pk for p in self.products])
+        # queryset.update() bypasses the write-through path
+        Product.objects.filter(pk=self.product.pk).update(quantity_in_stock=7, updated_at=timezone.now())
+        report = reconcile_stock_cache(fix=True)
+        self.assertEqual((report['checked'], report['stale'], report['fixed']), (2, 1, 1))
+        self.assertEqual(get_stock(product_ids=[self.product.pk])[self.product.pk]['on_hand'], 7)
+        self.assertEqual(reconcile_stock_cache()['stale'], 0)
+
+    def test_product_info_view_uses_the_cache(self):
+        self.client.login(username='clerk', password='secret')
+        url = reverse('get_product_info')
+        self.client.get(url, {'product_id': self.product.pk})
+        with self.assertNumQueries(2):  # session + user only
+            data = self.client.get(url, {'product_id': self.product.pk}).json()
+        self.assertEqual((data['sku'], data['stock_quantity']), (self.product.sku, 50))
+        self.assertEqual(self.client.get(url, {'product_id': 'x'}).status_code, 404)
+
+
+class AllocationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('picker', password='secret')
+        _, _, self.products = make_catalogue(product_count=2, quantity_in_stock=30)
+        self.customer = make_customer()
+        self.warehouses = [
+            Warehouse.objects.create(name=name, address='x', city='y', state='z', zipcode='1', manager=self.user)
+            for name in ('North', 'South')
+        ]
+        for product in self.products:
+            ProductLocation.objects.create(product=product, warehouse=self.warehouses[0], quantity=20)
+            ProductLocation.objects.create(product=product, warehouse=self.warehouses[1], quantity=10)
+
+    def make_order(self, *quantities, status='pending'):
+        order = Order.objects.create(order_type='sale', customer=self.customer, status=status, created_by=self.user)
+        for product, quantity in zip(self.products, quantities):
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, unit_price=Decimal('8.00'))
+        return order.pk
+
+    def location(self, product, warehouse):
+        return ProductLocation.objects.get(product=product, warehouse=warehouse).quantity
+
+    def test_lines_are_split_across_warehouses(self):
+        order = self.make_order(25, 5)
+        result = allocate_orders([order], self.user)
+        self.assertEqual((result['allocated'], result['allocations']), ([order], 3))
+        self.assertEqual(self.location(self.products[0], self.warehouses[0]), 0)
+        self.assertEqual(self.location(self.products[0], self.warehouses[1]), 5)
+        self.assertEqual(self.location(self.products[1], self.warehouses[0]), 15)
+        # The pending order was confirmed, deducting the product totals once
+        self.assertEqual(Order.objects.get(pk=order).status, 'confirmed')
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).quantity_in_stock, 5)
+
+    def test_orders_short_of_stock_take_nothing(self):
+        first = self.make_order(20, 1, status='confirmed')
+        second = self.make_order(5, 40)
+        result = allocate_orders([first, second], self.user)
+        self.assertEqual(result['allocated'], [first])
+        self.assertEqual(result['short'], [{'order': second, 'product': self.products[1].pk, 'quantity': 40}])
+        self.assertEqual(self.location(self.products[0], self.warehouses[1]), 10)
+        self.assertFalse(OrderAllocation.objects.filter(order_item__order_id=second).exists())
+        self.assertEqual(Order.objects.get(pk=second).status, 'pending')
+        # Already allocated lines are not picked twice
+        self.assertEqual(allocate_orders([first], self.user)['allocations'], 0)
+
+    def test_query_count_does_not_grow_with_orders(self):
+        def run(count):
+            orders = [self.make_order(1, 1, status='confirmed') for _ in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(len(allocate_orders(orders, self.user)['allocated']), count)
+            return len(queries)
+        self.assertEqual(run(1), run(12))
+
+
+class StockTransferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('mover', password='secret')
+        _, _, self.products = make_catalogue(product_count=30, quantity_in_stock=50)
+        self.north, self.south = [
+            Warehouse.objects.create(name=name, address='x', city='y', state='z', zipcode='1', manager=self.user)
+            for name in ('North', 'South')
+        ]
+        ProductLocation.objects.bulk_create([
+            ProductLocation(product=product, warehouse=self.north, quantity=50) for product in self.products
+        ])
+
+    def plan(self, quantity=10, products=None):
+        return [
+            {'sku': p.sku, 'from_warehouse': str(self.north.pk), 'to_warehouse': str(self.south.pk), 'quantity': str(quantity)}
+            for p in products or self.products
+        ]
+
+    def quantities(self, warehouse):
+        return set(ProductLocation.objects.filter(warehouse=warehouse).values_list('quantity', flat=True))
+
+    def test_plan_moves_stock_without_changing_totals(self):
+        result = transfer_stock(self.plan(), self.user)
+        self.assertEqual(result['created'], 30)
+        self.assertEqual(self.quantities(self.north), {40})
+        self.assertEqual(self.quantities(self.south), {10})
+        self.assertEqual(set(Product.objects.values_list('quantity_in_stock', flat=True)), {50})
+        movement = StockMovement.objects.filter(movement_type='transfer').first()
+        self.assertEqual((movement.from_warehouse_id, movement.to_warehouse_id), (self.north.pk, self.south.pk))
+
+    def test_query_count_does_not_grow_with_lines(self):
+        transfer_stock(self.plan(products=self.products[:1]), self.user)
+        with CaptureQueriesContext(connection) as few:
+            transfer_stock(self.plan(products=self.products[:2]), self.user)
+        with CaptureQueriesContext(connection) as many:
+            transfer_stock(self.plan(), self.user)
+        self.assertEqual(len(many), len(few))
+
+    def test_plan_is_all_or_nothing(self):
+        plan = self.plan(products=self.products[:2])
+        plan.append(dict(plan[0], quantity='45'))  # 10 + 45 > 50 at the source
+        result = transfer_stock(plan, self.user)
+        self.assertEqual(result['created'], 0)
+        self.assertEqual(result['shortages'][0]['requested'], 55)
+        self.assertEqual(self.quantities(self.north), {50})
+        self.assertFalse(ProductLocation.objects.filter(warehouse=self.south).exists())
+
+        result = transfer_stock([dict(plan[0], to_warehouse=str(self.north.pk))], self.user)
+        self.assertIn('to_warehouse', result['errors'][0]['errors'])
+
+    def test_single_transfer_movement_moves_location_stock(self):
+        StockMovement.objects.create(
+            product=self.products[0], movement_type='transfer', quantity=5,
+            from_warehouse=self.north, to_warehouse=self.south, created_by=self.user
+        )
+        self.assertEqual(ProductLocation.objects.get(product=self.products[0], warehouse=self.south).quantity, 5)
+        with self.assertRaises(InsufficientLocationStock):
+            StockMovement.objects.create(
+                product=self.products[0], movement_type='transfer', quantity=6,
+                from_warehouse=self.south, to_warehouse=self.north, created_by=self.user
+            )
+
+    def test_admin_rejects_a_transfer_larger_than_source_stock(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=True, is_superuser=True)
+        self.client.login(username='mover', password='secret')
+        data = {
+            'product': self.products[0].pk, 'movement_type': 'transfer', 'quantity': 51,
+            'from_warehouse': self.north.pk, 'to_warehouse': self.south.pk, 'reference': '', 'notes': '',
+            'created_by': self.user.pk,
+        }
+        response = self.client.post(reverse('admin:website_stockmovement_add'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Only 50 in stock at North.')
+        self.assertFalse(StockMovement.objects.exists())
+
+        response = self.client.post(reverse('admin:website_stockmovement_add'), dict(data, quantity=50))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ProductLocation.objects.get(product=self.products[0], warehouse=self.south).quantity, 50)
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class ReplenishmentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='secret')
+        _, self.supplier, self.products = make_catalogue(product_count=3, quantity_in_stock=100)
+        self.other = Supplier.objects.create(
+            name='Globex', email='sales@globex.test', phone='555-0101',
+            address='2 Main St', city='Springfield', state='IL', zipcode='62701'
+        )
+        Product.objects.filter(pk=self.products[2].pk).update(supplier=self.other)
+        Product.objects.update(minimum_stock_level=10, maximum_stock_level=200)
+        today = timezone.localdate()
+        # 20 units a day for the first product, nothing for the others
+        StockMovementDailyRollup.objects.bulk_create([
+            StockMovementDailyRollup(date=today - timedelta(days=day), product=self.products[0],
+                                     movement_type='out', movement_count=1, total_quantity=20)
+            for day in range(1, 29)
+        ])
+        Product.objects.filter(pk=self.products[2].pk).update(quantity_in_stock=5)
+
+    def test_reorder_points_follow_demand(self):
+        plan = plan_replenishment()
+        rows = {pk: row for row, pk in enumerate(plan['id'].tolist())}
+        first, second, third = (rows[p.pk] for p in self.products)
+        self.assertAlmostEqual(plan['rate'][first], 20.0)
+        self.assertEqual(plan['reorder_point'][first], 140)  # 7 days lead time, no variance
+        self.assertEqual(plan['order_quantity'][first], 100)  # 100 on hand, ordered up to 200
+        self.assertEqual(plan['order_quantity'][second], 0)
+        self.assertEqual(plan['order_quantity'][third], 195)
+
+    def test_draft_purchase_orders_per_supplier(self):
+        result = replenish(self.user)
+        self.assertEqual(result['products_to_order'], 2)
+        orders = Order.objects.filter(order_type='purchase').order_by('supplier__name')
+        self.assertEqual([o.supplier_id for o in orders], [self.supplier.pk, self.other.pk])
+        self.assertEqual(orders[0].items.get().quantity, 100)
+        self.assertEqual(orders[0].total_amount, Decimal('500.00'))
+        self.assertTrue(all(o.order_number.startswith('PO-') and o.status == 'pending' for o in orders))
+
+        # Stock already on order is not ordered again
+        self.assertEqual(replenish(self.user)['orders'], [])
+
+    def test_dry_run_writes_nothing(self):
+        self.assertEqual(replenish(self.user, dry_run=True)['units_to_order'], 295)
+        self.assertFalse(Order.objects.exists())
+
+
+class DemandForecastTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('planner', password='secret')
+        _, _, self.products = make_catalogue(product_count=3, quantity_in_stock=0)
+
+    def test_weekly_season_is_recovered(self):
+        week = [10, 10, 10, 10, 10, 30, 30]
+        method, forecast = seasonal_smoothing(week * 8, horizon=7)
+        self.assertEqual(method, 'seasonal')
+        for expected, value in zip(week, forecast):
+            self.assertAlmostEqual(value, expected, places=3)
+        self.assertEqual(seasonal_smoothing([4, 4, 4], horizon=2), ('simple', [4, 4]))
+
+    def record_demand(self, product, days, quantity):
+        now = timezone.now()
+        movements = StockMovement.objects.bulk_create([
+            StockMovement(product=product, movement_type='out', quantity=quantity, created_by=self.user)
+            for _ in range(days)
+        ])
+        for day, movement in enumerate(movements, start=1):
+            StockMovement.objects.filter(pk=movement.pk).update(created_at=now - timedelta(days=day))
+
+    def test_pipeline_writes_one_run_and_replaces_the_last(self):
+        self.record_demand(self.products[1], 28, 5)
+        first_run, count = run_forecasts(workers=1, batch_size=2)
+        self.assertEqual(count, 3)
+        second_run, _ = run_forecasts(workers=2, batch_size=2)
+        self.assertEqual(set(DemandForecast.objects.values_list('run_at', flat=True)), {second_run})
+
+        run_at, forecasts = top_forecast_demand()
+        self.assertEqual(run_at, second_run)
+        self.assertEqual(forecasts[0].product, self.products[1])
+        # About 5 a day, after 63 days without demand
+        self.assertTrue(30 < forecasts[0].next_7_days < 40)
+        self.assertEqual(forecasts[1].next_7_days, 0)
+
+    def test_reports_ignore_a_run_in_progress(self):
+        # The first run ever, part way through: rows written but no completion marker
+        DemandForecast.objects.create(
+            run_at=timezone.now(), product=self.products[0], method='simple', start_date=timezone.localdate(),
+            next_7_days=1, horizon_total=1, history_days=90
+        )
+        self.assertEqual(top_forecast_demand(), (None, []))
+
+        run_at, _ = run_forecasts(workers=1)
+        self.assertEqual(DemandForecastRun.objects.get().run_at, run_at)
+        in_progress = run_at + timedelta(minutes=1)
+        DemandForecast.objects.create(
+            run_at=in_progress, product=self.products[0], method='simple', start_date=timezone.localdate(),
+            next_7_days=99, horizon_total=99, history_days=90
+        )
+        self.assertEqual(top_forecast_demand()[0], run_at)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.client.login(username='clerk', password='secret')
+        _, _, self.products = make_catalogue(product_count=5, quantity_in_stock=20)
+        Product.objects.filter(pk=self.products[0].pk).update(quantity_in_stock=0)
+        self.customer = make_customer()
+        self.order, _ = create_order_with_items(
+            {'order_type': 'sale', 'customer': self.customer.pk, 'status': 'pending'},
+            [{'product': p.pk, 'quantity': 2} for p in self.products[:2]], self.user
+        )
+
+    def read(self, url, params=None):
+        response = self.client.get(reverse(url), params or {})
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_product_csv_uses_list_filters(self):
+        rows = list(csv.DictReader(io.StringIO(self.read('export_products', {'stock_status': 'out_of_stock'}))))
+        self.assertEqual([row['sku'] for row in rows], [self.products[0].sku])
+        self.assertEqual(rows[0]['category'], 'Hardware')
+
+    def test_orders_carry_their_lines(self):
+        rows = list(csv.DictReader(io.StringIO(self.read('export_orders'))))
+        self.assertEqual([row['item_sku'] for row in rows], [p.sku for p in self.products[:2]])
+        self.assertEqual({row['order_number'] for row in rows}, {self.order.order_number})
+
+        documents = [json.loads(line) for line in self.read('export_orders', {'format': 'jsonl'}).splitlines()]
+        self.assertEqual(len(documents), 1)
+        self.assertEqual(documents[0]['customer'], 'Ada Lovelace')
+        self.assertEqual(len(documents[0]['items']), 2)
+        self.assertEqual(self.client.get(reverse('export_orders'), {'format': 'xml'}).status_code, 400)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def exported_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.read('export_products')
+                self.read('export_orders')
+            return len(queries)
+        baseline = exported_queries()
+        extra = [
+            Product(name=f'Extra {i}', sku=f'EXTRA-{i}', category=self.products[0].category,
+                    supplier=self.products[0].supplier, cost_price=1, selling_price=2)
+            for i in range(30)
+        ]
+        Product.objects.bulk_create(extra)
+        create_order_with_items(
+            {'order_type': 'sale', 'customer': self.customer.pk, 'status': 'pending'},
+            [{'product': p.pk, 'quantity': 1} for p in self.products], self.user
+        )
+        self.assertEqual(exported_queries(), baseline)
+
+    def test_command_writes_a_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'customers.jsonl')
+            call_command('export_data', 'customers', '--format', 'jsonl', '--output', path,
+                         '--filter', 'search=Ada')
+            with open(path) as handle:
+                self.assertEqual(json.loads(handle.readline())['email'], 'ada@example.test')
+
+
+class ProductImportTests(TestCase):
+    HEADER = 'sku,name,description,category,supplier,cost_price,selling_price,quantity_in_stock,' \
+             'minimum_stock_level,maximum_stock_level\n'
+
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.client.login(username='clerk', password='secret')
+        self.category, self.supplier, self.products = make_catalogue(product_count=2, quantity_in_stock=7)
+
+    def price_list(self, *lines):
+        return io.StringIO(self.HEADER + ''.join(line + '\n' for line in lines))
+
+    def test_upserts_on_sku_and_keeps_stock_of_existing_products(self):
+        result = import_products(self.price_list(
+            'WID-0000,Widget Zero,Renamed,hardware,ACME,6.00,9.50,999,5,500',
+            'NEW-0001,Gadget,Brand new,Hardware,Acme,2.00,3.00,40,10,100',
+        ), chunk_size=1)
+        self.assertEqual((result['rows'], result['created'], result['updated'], result['invalid']), (2, 1, 1, 0))
+
+        existing = Product.objects.get(sku='WID-0000')
+        self.assertEqual((existing.name, existing.selling_price), ('Widget Zero', Decimal('9.50')))
+        self.assertEqual(existing.quantity_in_stock, 7)
+        self.assertEqual(Product.objects.get(sku='NEW-0001').quantity_in_stock, 40)
+        self.assertEqual([p.sku for p in search_products('gadget')], ['NEW-0001'])
+        self.assertTrue(Product.objects.get(sku='NEW-0001').is_active)
+
+    def test_price_list_does_not_reactivate_products(self):
+        Product.objects.filter(sku='WID-0000').update(is_active=False)
+        result = import_products(self.price_list('WID-0000,Widget,,Hardware,Acme,6.00,9.50,1,5,500'))
+        self.assertEqual(result['updated'], 1)
+        product = Product.objects.get(sku='WID-0000')
+        self.assertEqual((product.is_active, product.selling_price), (False, Decimal('9.50')))
+
+    def test_invalid_rows_are_reported_with_their_line(self):
+        Supplier.objects.create(name='Gone', email='gone@example.test', is_active=False)
+        progress = []
+        result = import_products(self.price_list(
+            'BAD-0001,Thing,,Nope,Acme,1.00,2.00,1,1,1',
+            'BAD-0002,Thing,,Hardware,Gone,1.00,2.00,1,1,1',
+            'BAD-0003,Thing,,Hardware,Acme,-1,2.00,1,1,1',
+            'GOOD-0001,Thing,,Hardware,Acme,1.00,2.00,1,1,1',
+        ), progress=lambda report: progress.append(report['rows']))
+        self.assertEqual((result['created'], result['invalid']), (1, 3))
+        self.assertEqual([e['line'] for e in result['errors']], [2, 3, 4])
+        self.assertEqual([list(e['errors']) for e in result['errors']], [['category'], ['supplier'], ['cost_price']])
+        self.assertEqual(progress, [4])
+        self.assertFalse(Product.objects.filter(sku__startswith='BAD').exists())
+
+    def test_validation_does_not_query_per_row(self):
+        def queries_for(rows):
+            lines = [f'ROW-{i:04d},Row {i},,Hardware,Acme,1.00,2.00,1,1,1' for i in range(rows)]
+            with CaptureQueriesContext(connection) as queries:
+                import_products(self.price_list(*lines), chunk_size=1000)
+            return len(queries)
+        self.assertEqual(queries_for(5), queries_for(50))
+
+    def test_upload_view_and_missing_columns(self):
+        upload = io.BytesIO(self.price_list('UP-0001,Uploaded,,Hardware,Acme,1.00,2.00,3,1,10').getvalue().encode())
+        upload.name = 'prices.csv'
+        response = self.client.post(reverse('import_products'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+
+        bad = io.BytesIO(b'sku,price\nX,1\n')
+        bad.name = 'prices.csv'
+        response = self.client.post(reverse('import_products'), {'file': bad})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['failed_line'], 1)
+
+    def test_file_breaking_part_way_reports_what_was_written(self):
+        lines = [f'OK-{i:04d},Row {i},,Hardware,Acme,1.00,2.00,1,1,1' for i in range(300)]
+        body = self.price_list(*lines).getvalue().encode() + b'BAD-0001,\xff\xfe broken,,Hardware,Acme,1,2,1,1,1\n'
+        upload = io.BytesIO(body)
+        upload.name = 'prices.csv'
+        response = self.client.post(reverse('import_products'), {'file': upload})
+        self.assertEqual(response.status_code, 400)
+        report = response.json()
+        self.assertGreater(report['created'], 0)
+        self.assertEqual(report['created'], Product.objects.filter(sku__startswith='OK-').count())
+        self.assertLessEqual(report['failed_line'], 302)
+        self.assertIn('utf-8', report['error'])
+
+        result = import_products(self.price_list('CSV-0001,Fine,,Hardware,Acme,1,2,1,1,1', 'CSV-0002,' + 'x' * 200000))
+        self.assertEqual((result['created'], result['failed_line']), (1, 3))
+        self.assertIn('field larger than field limit', result['error'])
+
+
+class GlobalSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.client.login(username='clerk', password='secret')
+        _, self.supplier, (self.widget,) = make_catalogue(product_count=1)
+        self.customer = make_customer()
+        self.order, _ = create_order_with_items(
+            {'order_type': 'sale', 'customer': self.customer.pk, 'status': 'pending'},
+            [{'product': self.widget.pk, 'quantity': 1}], self.user
+        )
+
+    def search(self, query, **kwargs):
+        return [(r['type'], r['id']) for r in global_search(query, **kwargs)]
+
+    def test_typed_prefix_results_in_one_query(self):
+        with self.assertNumQueries(1):
+            results = global_search('ada')
+        self.assertEqual(results[0]['type'], 'customer')
+        self.assertEqual(results[0]['url'], reverse('customer_record', args=[self.customer.pk]))
+        # The order is found through its customer's name, ranked below the customer
+        self.assertEqual(self.search('ada'), [('customer', self.customer.pk), ('order', self.order.pk)])
+        self.assertEqual(self.search('acm'), [('supplier', self.supplier.pk)])
+        self.assertEqual(self.search('wid-00'), [('product', self.widget.pk)])
+        self.assertEqual(self.search(self.order.order_number[:5]), [('order', self.order.pk)])
+        self.assertEqual(self.search('ada', kinds=['order']), [('order', self.order.pk)])
+
+    def test_documents_follow_saves_renames_and_deletes(self):
+        self.customer.last_name = 'Byron'
+        self.customer.save()
+        self.assertIn(('order', self.order.pk), self.search('byron'))
+        self.assertEqual(self.search('lovelace'), [])
+
+        self.widget.is_active = False
+        self.widget.save()
+        self.assertEqual(self.search('widget'), [])
+        self.assertEqual(self.search('widget', include_inactive=True), [('product', self.widget.pk)])
+
+        self.order.delete()
+        self.assertFalse(SearchDocument.objects.filter(kind='order', object_id=self.order.pk).exists())
+        with self.assertNumQueries(2):
+            # An unchanged record is only compared against its document
+            self.assertFalse(index_document('customer', self.customer))
+
+    def test_bulk_reindex_and_order_filter(self):
+        SearchDocument.objects.all().delete()
+        reindex_documents('order', [self.order.pk, 999])
+        self.assertEqual(self.search('ada'), [('order', self.order.pk)])
+
+        _, orders = filter_orders({'search': 'lovel'})
+        self.assertEqual(list(orders), [self.order])
+        self.assertNotIn("'%", str(orders.query))
+
+    def test_view(self):
+        response = self.client.get(reverse('global_search'), {'q': 'acme', 'type': 'supplier,bogus'})
+        self.assertEqual([r['title'] for r in response.json()['results']], ['Acme'])
+
+        response = self.client.get(reverse('global_search'), {'q': 'acme', 'type': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PriceHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.client.login(username='clerk', password='secret')
+        _, _, (self.widget, self.gadget) = make_catalogue(product_count=2)
+
+    def series(self, product):
+        return list(product.price_changes.values_list('cost_price', 'selling_price'))
+
+    def test_changes_are_only_written_when_a_price_changes(self):
+        self.assertEqual(self.series(self.widget), [(Decimal('5.00'), Decimal('8.00'))])
+        widget = Product.objects.get(pk=self.widget.pk)
+        widget.name = 'Renamed'
+        widget.save()
+        widget.selling_price = Decimal('8.00')
+        widget.save()
+        self.assertEqual(len(self.series(widget)), 1)
+
+        widget.selling_price = Decimal('9.25')
+        widget.save()
+        # An instance that was not loaded from the database is compared with the series
+        Product(pk=widget.pk, name=widget.name, sku=widget.sku, category=widget.category, supplier=widget.supplier,
+                cost_price=Decimal('5.00'), selling_price=Decimal('9.25'), created_at=widget.created_at).save()
+        self.assertEqual(self.series(widget), [(Decimal('5.00'), Decimal('8.00')), (Decimal('5.00'), Decimal('9.25'))])
+
+    def test_import_appends_only_changed_prices(self):
+        header = 'sku,name,category,supplier,cost_price,selling_price,quantity_in_stock,' \
+                 'minimum_stock_level,maximum_stock_level\n'
+        import_products(io.StringIO(header + 'WID-0000,Widget 0,Hardware,Acme,5.00,8.00,0,10,1000\n'
+                                              'WID-0001,Widget 1,Hardware,Acme,5.00,7.50,0,10,1000\n'))
+        self.assertEqual(len(self.series(self.widget)), 1)
+        self.assertEqual(self.series(self.gadget)[-1], (Decimal('5.00'), Decimal('7.50')))
+
+    def test_series_is_downsampled_from_one_query(self):
+        start = timezone.now() - timedelta(days=10)
+        ProductPriceChange.objects.all().delete()
+        ProductPriceChange.objects.bulk_create([
+            ProductPriceChange(product=self.widget, changed_at=start - timedelta(days=1),
+                               cost_price=Decimal('4.00'), selling_price=Decimal('6.00'))
+        ] + [
+            ProductPriceChange(product=self.widget, changed_at=start + timedelta(hours=6 * i),
+                               cost_price=Decimal('5.00'), selling_price=Decimal(7 + i % 3))
+            for i in range(1, 40)
+        ])
+        end = start + timedelta(days=10)
+
+        with self.assertNumQueries(1):
+            series = price_series([self.widget.pk, self.gadget.pk], start, end, points=100)
+        entries, downsampled = series[self.widget.pk]
+        self.assertFalse(downsampled)
+        self.assertEqual((entries[0]['at'], entries[0]['selling_price']), (start, Decimal('6.00')))
+        self.assertEqual(len(entries), 40)
+        self.assertEqual(series[self.gadget.pk], ([], False))
+
+        entries, downsampled = price_series([self.widget.pk], start, end, points=5)[self.widget.pk]
+        self.assertTrue(downsampled)
+        self.assertEqual(len(entries), 5)
+        self.assertEqual((entries[0]['selling_low'], entries[0]['selling_high']), (Decimal('6.00'), Decimal('9.00')))
+
+    def test_api(self):
+        response = self.client.get(reverse('get_price_history'), {'sku': self.widget.sku, 'points': 10})
+        self.assertEqual(response.status_code, 200)
+        product = response.json()['products'][0]
+        self.assertEqual(product['product_id'], self.widget.pk)
+        self.assertEqual(product['points'][0]['selling_price'], '8.00')
+        self.assertEqual(self.client.get(reverse('get_price_history'), {'sku': 'NOPE'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('get_price_history'),
+                                         {'product': self.widget.pk, 'start': 'soon'}).status_code, 400)
+        for bad in ({'start': '2024-02-30'}, {'end': '2024-13-01'}):
+            response = self.client.get(reverse('get_price_history'), {'product': self.widget.pk, **bad})
+            self.assertEqual(response.status_code, 400, bad)
+
+        # A date as ``end`` covers that whole day, so a one-day range finds a change at midday
+        day = timezone.localdate() - timedelta(days=3)
+        ProductPriceChange.objects.create(product=self.widget, changed_at=timezone.make_aware(datetime.combine(day, time(12))),
+                                          cost_price=Decimal('5.00'), selling_price=Decimal('8.75'))
+        for params in ({'end': day.isoformat()}, {'start': day.isoformat(), 'end': day.isoformat()}):
+            response = self.client.get(reverse('get_price_history'), {'product': self.widget.pk, **params})
+            points = response.json()['products'][0]['points']
+            self.assertEqual(points[-1]['selling_price'], '8.75', params)
+
+
+@modify_settings(MIDDLEWARE={'append': 'website.middleware.QueryMetricsMiddleware'})
+class QueryMetricsTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        METRICS.reset()
+        self.user = User.objects.create_user('clerk', password='secret', is_staff=True)
+        self.client.login(username='clerk', password='secret')
+        _, _, self.products = make_catalogue(product_count=6)
+
+    def test_fingerprints_collapse_values(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'  AND n = 10"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s) AND name = 'yy' AND n = 2"),
+        )
+
+    def test_middleware_records_views_and_flags_repeated_queries(self):
+        self.client.get(reverse('product_list_api'))
+        self.client.get(reverse('product_list_api'))
+        totals = METRICS.snapshot()['product_list_api']
+        self.assertEqual(totals['requests'], 2)
+        self.assertEqual(totals['budget'], 3)
+        self.assertGreater(totals['queries'], 0)
+        self.assertEqual((totals['n_plus_one'], totals['over_budget']), (0, 0))
+
+        with QueryRecorder() as recorder:
+            for product in self.products:
+                Product.objects.get(pk=product.pk)
+        repeated = METRICS.record('loop', recorder, 0.01)
+        self.assertEqual(repeated[0][1], 6)
+        self.assertEqual(METRICS.snapshot()['loop']['n_plus_one'], 1)
+
+    def test_metrics_page_and_prometheus_endpoint(self):
+        self.client.get(reverse('product_list_api'))
+        self.assertContains(self.client.get(reverse('query_metrics')), 'product_list_api')
+        response = self.client.get(reverse('query_metrics_prometheus'))
+        self.assertIn('inventory_view_requests_total{view="product_list_api"} 1', response.content.decode())
+
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('query_metrics_prometheus')).status_code, 403)
+        with override_settings(QUERY_METRICS_TOKEN='scrape'):
+            response = self.client.get(reverse('query_metrics_prometheus'), HTTP_AUTHORIZATION='Bearer scrape')
+        self.assertEqual(response.status_code, 200)
+
+    def test_views_stay_within_their_query_budgets(self):
+        ids = ','.join(str(p.pk) for p in self.products)
+        self.assertWithinQueryBudget(reverse('check_stock'), {'ids': ids})
+        self.assertWithinQueryBudget(reverse('global_search'), {'q': 'wid'})
+        self.assertWithinQueryBudget(reverse('product_search_api'), {'q': 'wid'})
+        self.assertWithinQueryBudget(reverse('get_price_history'), {'sku': [p.sku for p in self.products]})
+        with self.assertRaisesMessage(AssertionError, 'over its budget of 1'):
+            self.assertWithinQueryBudget(reverse('check_stock'), {'ids': ids}, budget=1)
+
+
+class SyntheticDataTests(TestCase):
+    def test_generated_data_is_consistent_with_the_ledger(self):
+        user = User.objects.create_user('synth', password='x')
+        generator = SyntheticDataGenerator(user, seed=3, batch_size=10, days=30)
+        written = generator.run(products=20, customers=50, orders=30, movements=400)
+        self.assertEqual(written['products'], 20)
+        self.assertEqual(Customer.objects.count(), 50)
+        self.assertEqual(Order.objects.count(), 30)
+        self.assertEqual(ProductPriceChange.objects.count(), 20)
+
+        # Stock is the net of each product's movements and never negative
+        for product in Product.objects.all():
+            net = sum(m.delta for m in product.stock_movements.all())
+            self.assertEqual(product.quantity_in_stock, net)
+            self.assertGreaterEqual(net, 0)
+        rolled_up = StockMovementDailyRollup.objects.aggregate(n=Sum('movement_count'))['n']
+        self.assertEqual(rolled_up, StockMovement.objects.count())
+        self.assertGreaterEqual(StockMovement.objects.count(), 400)
+        self.assertGreater(StockMovementDailyRollup.objects.values('date').distinct().count(), 1)
+
+        for order in Order.objects.prefetch_related('items'):
+            self.assertEqual(order.total_amount, sum(item.total_price for item in order.items.all()))
+        oldest = Order.objects.order_by('created_at').first()
+        self.assertLess(oldest.created_at, timezone.now() - timedelta(days=20))
+        self.assertEqual(oldest.order_date, oldest.created_at)
+
+    def test_command_is_reproducible(self):
+        options = {'products': 5, 'customers': 5, 'orders': 3, 'movements': 30, 'stdout': io.StringIO()}
+        call_command('generate_synthetic_data', seed=7, **options)
+        first = list(StockMovement.objects.order_by('pk').values_list('product__sku', 'movement_type', 'quantity'))
+        for model in (Order, Customer, Supplier):
+            model.objects.all().delete()
+        call_command('generate_synthetic_data', seed=7, **options)
+        second = list(StockMovement.objects.order_by('pk').values_list('product__sku', 'movement_type', 'quantity'))
+        # The second run numbers its SKUs after the first, so compare everything else
+        self.assertEqual([row[1:] for row in first], [row[1:] for row in second])
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bench', password='x')
+        make_catalogue(product_count=3, quantity_in_stock=10)
+        make_customer()
+
+    def test_run_benchmarks_reports_every_scenario_and_rolls_back_writes(self):
+        movements, orders = StockMovement.objects.count(), Order.objects.count()
+        report = run_benchmarks(self.user, repeat=2, warmup=0)
+        results = report['results']
+        self.assertEqual(report['meta']['database']['products'], 3)
+        self.assertEqual(results['home']['status'], 200)
+        self.assertTrue(results['home']['rendered'])
+        self.assertEqual(results['home']['runs'], 2)
+        for name in ('product_list', 'order_list', 'inventory_reports', 'stock_movement_save', 'order_item_save'):
+            self.assertIn(name, results)
+            self.assertLessEqual(results[name]['min_ms'], results[name]['max_ms'])
+        self.assertGreater(results['order_item_save']['queries'], 0)
+        self.assertEqual((StockMovement.objects.count(), Order.objects.count()), (movements, orders))
+
+    def test_command_writes_json_and_compares_with_previous_run(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first, second = os.path.join(directory, 'a.json'), os.path.join(directory, 'b.json')
+            call_command('run_benchmarks', output=first, repeat=1, only=['home'], stdout=io.StringIO())
+            out = io.StringIO()
+            call_command('run_benchmarks', output=second, repeat=1, only=['home'], compare=first, stdout=out)
+            with open(first) as a, open(second) as b:
+                previous, current = json.load(a), json.load(b)
+        self.assertEqual(list(current['results']), ['home'])
+        [(name, before, after, ratio)] = compare_results(previous, current)
+        self.assertEqual((name, before, after), ('home', previous['results']['home']['median_ms'],
+                                                 current['results']['home']['median_ms']))
+        self.assertIn('->', out.getvalue())
@@ -51,6 +51,8 @@ urlpatterns = [
 
     path('stock-movements/', views.stock_movement_list, name='stock_movement_list'),
     path('stock-movement/add/', views.add_stock_movement, name='add_stock_movement'),
+    path('stock-movements/bulk/', views.bulk_stock_movements, name='bulk_stock_movements'),
+    path('stock-transfers/bulk/', views.bulk_stock_transfers, name='bulk_stock_transfers'),
     # Future: path('stock-movement/<int:pk>/', views.stock_movement_detail, name='stock_movement_detail'),
 
     # ========================================================================
@@ -60,6 +62,7 @@ urlpatterns = [
     path('orders/', views.order_list, name='order_list'),
     path('order/<int:pk>/', views.order_detail, name='order_detail'),
     path('order/add/', views.add_order, name='add_order'),
+    path('api/orders/create/', views.create_order_api, name='create_order_api'),
     # Future: path('order/<int:pk>/update/', views.update_order, name='update_order'),
     # Future: path('order/<int:pk>/delete/', views.delete_order, name='delete_order'),
 
@@ -81,20 +84,29 @@ urlpatterns = [
     # ========================================================================
 
     path('api/product-info/', views.get_product_info, name='get_product_info'),
+    path('api/customers/', views.customer_list_api, name='customer_list_api'),
+    path('api/stock-balance/', views.get_stock_balance, name='get_stock_balance'),
+    path('api/products/', views.product_list_api, name='product_list_api'),
+    path('api/products/search/', views.product_search_api, name='product_search_api'),
+    path('api/orders/', views.order_list_api, name='order_list_api'),
+    path('api/stock-movements/', views.stock_movement_list_api, name='stock_movement_list_api'),
+    path('api/stock-check/', views.check_stock, name='check_stock'),
+    path('api/price-history/', views.get_price_history, name='get_price_history'),
     # Future API endpoints:
     # path('api/customer-info/', views.get_customer_info, name='get_customer_info'),
-    # path('api/stock-check/', views.check_stock, name='check_stock'),
-    # path('api/price-history/', views.get_price_history, name='get_price_history'),
 
     # ========================================================================
     # DASHBOARD AND UTILITY URLS 
     # ========================================================================
 
     path('dashboard/', views.home, name='dashboard'),  # Alternative dashboard URL
-    # Future: path('search/', views.global_search, name='global_search'),
-    # Future: path('export/products/', views.export_products, name='export_products'),
-    # Future: path('export/customers/', views.export_customers, name='export_customers'),
-    # Future: path('import/products/', views.import_products, name='import_products'),
+    path('search/', views.global_search, name='global_search'),
+    path('export/products/', views.export_products, name='export_products'),
+    path('export/customers/', views.export_customers, name='export_customers'),
+    path('export/orders/', views.export_orders, name='export_orders'),
+    path('import/products/', views.import_products, name='import_products'),
+    path('metrics/queries/', views.query_metrics, name='query_metrics'),
+    path('metrics/queries/prometheus/', views.query_metrics_prometheus, name='query_metrics_prometheus'),
 
     # ========================================================================
     # WAREHOUSE MANAGEMENT URLS
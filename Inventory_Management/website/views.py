@@ -2,27 +2,47 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Sum, Count, F
-from django.http import JsonResponse, HttpResponse
-from django.core.paginator import Paginator
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
+from django.db.models import Q, Count, F, Max
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.utils import timezone
-from datetime import datetime, timedelta
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
+import csv
+import hmac
+import hashlib
 import json
 
 from .forms import (
     SignUpForm, CustomerForm, CategoryForm, SupplierForm, ProductForm,
     StockMovementForm, OrderForm, OrderItemForm, 
-    ProductSearchForm, CustomerSearchForm, OrderSearchForm
+    CustomerSearchForm, ReportDateRangeForm
 )
 from .models import (
     Customer, Product, Category, Supplier, StockMovement, Order, 
-    OrderItem, Warehouse, ProductLocation
+    OrderItem, Warehouse, ProductLocation, InsufficientLocationStock
 )
-
+from .stock import parse_movement_batch, ingest_stock_movements, transfer_stock
+from .orders import create_order_with_items, transition_orders
+from .dashboard import get_dashboard_stats
+from .pagination import KeysetPaginator, InvalidCursor
+from .filters import filter_products, filter_customers, filter_orders
+from .exports import stream_export
+from .imports import import_products as run_product_import
+from .search import search_products
+from .global_search import SEARCH_KINDS, global_search as run_global_search
+from .reports import movement_summary, top_products_by_movements, top_forecast_demand
+from .snapshots import balances_at, warehouse_balances_at
+from .price_history import DEFAULT_POINTS, price_series
+from .query_metrics import METRICS, n_plus_one_threshold, prometheus_text, query_budget
+from .stock_cache import get_stock
+
+@query_budget(10)
 def home(request):
     """Enhanced main dashboard with inventory overview and original CRM login"""
-    customers = Customer.objects.all()  # CHANGED FROM: Record.objects.all()
-
     # Handle login form submission (keep existing login logic)
     if request.method == 'POST' and not request.user.is_authenticated:
         username = request.POST['username']
@@ -39,37 +59,15 @@ def home(request):
     # ============ NEW INVENTORY DASHBOARD FEATURES ============
     # If user is authenticated, show enhanced dashboard
     if request.user.is_authenticated:
-        # Dashboard statistics
-        total_products = Product.objects.filter(is_active=True).count()
-        low_stock_products = Product.objects.filter(
-            quantity_in_stock__lte=F('minimum_stock_level'), 
-            is_active=True
-        ).count()
-        total_customers = Customer.objects.count()  # CHANGED FROM: Record
-        pending_orders = Order.objects.filter(status='pending').count()
-
-        # Recent activities for dashboard
-        recent_stock_movements = StockMovement.objects.select_related('product')[:5]
-        recent_orders = Order.objects.select_related('customer', 'supplier')[:5]
-        low_stock_items = Product.objects.filter(
-            quantity_in_stock__lte=F('minimum_stock_level'), 
-            is_active=True
-        ).select_related('category', 'supplier')[:10]
-
-        context = {
-            'customers': customers,  # Keep for original CRM table
-            'total_products': total_products,
-            'low_stock_products': low_stock_products,
-            'total_customers': total_customers,
-            'pending_orders': pending_orders,
-            'recent_stock_movements': recent_stock_movements,
-            'recent_orders': recent_orders,
-            'low_stock_items': low_stock_items,
-        }
+        # Dashboard statistics and recent activity come from a cached
+        # snapshot that model signals invalidate (see dashboard.py)
+        context = dict(get_dashboard_stats())
+        # Customer tables are loaded page by page from customer_list_api
+        context['customer_search_form'] = CustomerSearchForm()
         return render(request, 'inventory_dashboard.html', context)  # NEW TEMPLATE
     else:
         # ============ KEEP ORIGINAL LOGIN INTERFACE ============
-        return render(request, 'home.html', {'customers': customers})  # CHANGED: customers instead of records
+        return render(request, 'home.html')
 
 
 # ========================================================================
@@ -124,6 +122,13 @@ def customer_record(request, pk):
     }
     return render(request, 'customer_record.html', context)  # Same template name
 
+@query_budget(3)
+@login_required
+def customer_list_api(request):
+    """Paginated, searchable customer list for the dashboard (AJAX)"""
+    _, customers = filter_customers(request.GET)
+    return _keyset_json(request, customers, ('-created_at', '-id'), _customer_json, per_page=25)
+
 @login_required
 def delete_customer(request, pk):
     """Delete customer (was delete_record)"""
@@ -167,44 +172,62 @@ def update_customer(request, pk):
 @login_required
 def product_list(request):
     """Display all products with search and filtering"""
-    search_form = ProductSearchForm(request.GET or None)
-    products = Product.objects.select_related('category', 'supplier').filter(is_active=True)
-
-    # Apply search filters
-    if search_form.is_valid():
-        search = search_form.cleaned_data['search']
-        category = search_form.cleaned_data['category']
-        supplier = search_form.cleaned_data['supplier']
-        stock_status = search_form.cleaned_data['stock_status']
-
-        if search:
-            products = products.filter(
-                Q(name__icontains=search) | 
-                Q(sku__icontains=search) | 
-                Q(description__icontains=search)
-            )
-        if category:
-            products = products.filter(category=category)
-        if supplier:
-            products = products.filter(supplier=supplier)
-        if stock_status == 'low':
-            products = products.filter(quantity_in_stock__lte=F('minimum_stock_level'))
-        elif stock_status == 'out_of_stock':
-            products = products.filter(quantity_in_stock=0)
-        elif stock_status == 'in_stock':
-            products = products.filter(quantity_in_stock__gt=0)
-
-    # Pagination
-    paginator = Paginator(products, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    search_form, products = filter_products(request.GET)
+
+    # Cursor pagination: page N costs the same as page 1
+    paginator = KeysetPaginator(products, ordering=('name', 'id'), per_page=20)
+    page_obj = _keyset_page(paginator, request)
 
     context = {
         'page_obj': page_obj,
-        'search_form': search_form
+        'search_form': search_form,
+        'result_count': paginator.count()
     }
     return render(request, 'product_list.html', context)
 
+@query_budget(3)
+@login_required
+def product_list_api(request):
+    """Cursor-paginated product list as JSON (AJAX)"""
+    _, products = filter_products(request.GET)
+    return _keyset_json(request, products, ('name', 'id'), _product_json, per_page=20)
+
+@query_budget(5)
+@login_required
+def product_search_api(request):
+    """Ranked product search for typeahead fields (AJAX)"""
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    products = search_products(
+        request.GET.get('q', ''),
+        queryset=Product.objects.select_related('category', 'supplier').filter(is_active=True),
+        limit=limit
+    )
+    results = []
+    for product in products:
+        data = _product_json(product)
+        data['rank'] = product.search_rank
+        results.append(data)
+    return JsonResponse({'results': results})
+
+@query_budget(3)
+@login_required
+def global_search(request):
+    """Ranked typeahead results across customers, products, orders and suppliers (AJAX)"""
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    requested = request.GET.get('type', '')
+    kinds = [kind for kind in requested.split(',') if kind in SEARCH_KINDS]
+    if requested and not kinds:
+        # Searching every kind instead would silently widen a mistyped filter
+        return JsonResponse({'error': f"Unknown type '{requested}'; expected {', '.join(SEARCH_KINDS)}"}, status=400)
+    results = run_global_search(request.GET.get('q', ''), kinds=kinds or None, limit=limit)
+    return JsonResponse({'results': results})
+
 @login_required
 def product_detail(request, pk):
     """Display detailed product information"""
@@ -312,15 +335,20 @@ def add_supplier(request):
 @login_required
 def stock_movement_list(request):
     """Display all stock movements"""
-    movements = StockMovement.objects.select_related('product', 'created_by').order_by('-created_at')
+    movements = StockMovement.objects.select_related('product', 'created_by')
 
-    # Pagination
-    paginator = Paginator(movements, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Cursor pagination: page N costs the same as page 1
+    paginator = KeysetPaginator(movements, ordering=('-created_at', '-id'), per_page=25)
+    page_obj = _keyset_page(paginator, request)
 
     return render(request, 'stock_movement_list.html', {'page_obj': page_obj})
 
+@login_required
+def stock_movement_list_api(request):
+    """Cursor-paginated stock movement list as JSON (AJAX)"""
+    movements = StockMovement.objects.select_related('product', 'created_by')
+    return _keyset_json(request, movements, ('-created_at', '-id'), _movement_json, per_page=25)
+
 @login_required
 def add_stock_movement(request):
     """Record new stock movement"""
@@ -329,11 +357,69 @@ def add_stock_movement(request):
         if form.is_valid():
             movement = form.save(commit=False)
             movement.created_by = request.user
-            movement.save()
-            messages.success(request, f"Stock movement recorded for '{movement.product.name}'!")
-            return redirect('stock_movement_list')
+            try:
+                movement.save()
+            except InsufficientLocationStock:
+                form.add_error('quantity', "Not enough stock at the source warehouse.")
+            else:
+                messages.success(request, f"Stock movement recorded for '{movement.product.name}'!")
+                return redirect('stock_movement_list')
     return render(request, 'add_stock_movement.html', {'form': form})
 
+def _read_movement_batch(request):
+    """Rows of a CSV or JSON batch sent as a ``file`` upload or as the request body.
+
+    The format follows the file extension or content type unless ``?format=``
+    is given. Raises ``ValueError`` or ``csv.Error`` when the batch can't be
+    parsed.
+    """
+    upload = request.FILES.get('file')
+    if upload:
+        data = upload.read()
+        fmt = 'json' if upload.name.lower().endswith('.json') else 'csv'
+    else:
+        data = request.body
+        fmt = 'json' if request.content_type == 'application/json' else 'csv'
+    return parse_movement_batch(data, request.GET.get('format', fmt))
+
+@login_required
+def bulk_stock_movements(request):
+    """Ingest a CSV or JSON batch of stock movements (AJAX/API)"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST a CSV or JSON batch of movements'}, status=405)
+
+    try:
+        rows = _read_movement_batch(request)
+    except (ValueError, csv.Error) as exc:
+        return JsonResponse({'error': f'Could not parse batch: {exc}'}, status=400)
+
+    result = ingest_stock_movements(rows, request.user)
+    if result['created']:
+        status = 201
+    else:
+        status = 400 if result['errors'] else 200
+    return JsonResponse(result, status=status)
+
+@login_required
+def bulk_stock_transfers(request):
+    """Apply a CSV or JSON plan of inter-warehouse transfers atomically (AJAX/API)"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST a CSV or JSON plan of transfers'}, status=405)
+
+    try:
+        rows = _read_movement_batch(request)
+    except (ValueError, csv.Error) as exc:
+        return JsonResponse({'error': f'Could not parse plan: {exc}'}, status=400)
+
+    result = transfer_stock(rows, request.user)
+    if result['errors']:
+        status = 400
+    elif result['shortages']:
+        status = 409
+    else:
+        status = 201 if result['created'] else 200
+    return JsonResponse(result, status=status)
+
 
 # ========================================================================
 # ORDER MANAGEMENT VIEWS - ADD THESE
@@ -342,44 +428,26 @@ def add_stock_movement(request):
 @login_required
 def order_list(request):
     """Display all orders with search and filtering"""
-    search_form = OrderSearchForm(request.GET or None)
-    orders = Order.objects.select_related('customer', 'supplier', 'created_by').order_by('-created_at')
-
-    # Apply search filters
-    if search_form.is_valid():
-        search = search_form.cleaned_data['search']
-        order_type = search_form.cleaned_data['order_type']
-        status = search_form.cleaned_data['status']
-        date_from = search_form.cleaned_data['date_from']
-        date_to = search_form.cleaned_data['date_to']
-
-        if search:
-            orders = orders.filter(
-                Q(order_number__icontains=search) |
-                Q(customer__first_name__icontains=search) |
-                Q(customer__last_name__icontains=search) |
-                Q(supplier__name__icontains=search)
-            )
-        if order_type:
-            orders = orders.filter(order_type=order_type)
-        if status:
-            orders = orders.filter(status=status)
-        if date_from:
-            orders = orders.filter(order_date__gte=date_from)
-        if date_to:
-            orders = orders.filter(order_date__lte=date_to)
-
-    # Pagination
-    paginator = Paginator(orders, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    search_form, orders = filter_orders(request.GET)
+
+    # Cursor pagination: page N costs the same as page 1
+    paginator = KeysetPaginator(orders, ordering=('-created_at', '-id'), per_page=20)
+    page_obj = _keyset_page(paginator, request)
 
     context = {
         'page_obj': page_obj,
-        'search_form': search_form
+        'search_form': search_form,
+        'result_count': paginator.count()
     }
     return render(request, 'order_list.html', context)
 
+@query_budget(3)
+@login_required
+def order_list_api(request):
+    """Cursor-paginated order list as JSON (AJAX)"""
+    _, orders = filter_orders(request.GET)
+    return _keyset_json(request, orders, ('-created_at', '-id'), _order_json, per_page=20)
+
 @login_required
 def order_detail(request, pk):
     """Display detailed order information"""
@@ -404,6 +472,31 @@ def add_order(request):
             return redirect('order_detail', pk=order.id)
     return render(request, 'add_order.html', {'form': form})
 
+@login_required
+def create_order_api(request):
+    """Create an order with all of its lines from one JSON payload (AJAX/API)"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST a JSON order with its items'}, status=405)
+    try:
+        payload = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Request body must be valid JSON'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Request body must be a JSON object'}, status=400)
+
+    lines = payload.pop('items', None)
+    payload.setdefault('status', 'pending')
+    order, errors = create_order_with_items(payload, lines, request.user)
+    if errors:
+        return JsonResponse({'success': False, 'errors': errors}, status=400)
+    return JsonResponse({
+        'success': True,
+        'id': order.id,
+        'order_number': order.order_number,
+        'total_amount': str(order.total_amount),
+        'item_count': len(lines),
+    }, status=201)
+
 
 # ========================================================================
 # REPORTS AND ANALYTICS VIEWS - ADD THESE
@@ -423,55 +516,403 @@ def inventory_reports(request):
         is_active=True
     ).count()
 
-    # Recent movements summary
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
-
-    recent_movements = StockMovement.objects.filter(
-        created_at__date__gte=week_ago
-    ).values('movement_type').annotate(
-        count=Count('id'),
-        total_quantity=Sum('quantity')
-    )
+    # Movement summary and top products for the requested range (last 7
+    # days by default), read from the daily rollup instead of the ledger
+    date_form = ReportDateRangeForm(request.GET or None)
+    date_to = timezone.localdate()
+    date_from = date_to - timedelta(days=7)
+    if date_form.is_valid():
+        date_from = date_form.cleaned_data['date_from'] or date_from
+        date_to = date_form.cleaned_data['date_to'] or date_to
 
-    # Top products by movement activity
-    top_products = Product.objects.annotate(
-        movement_count=Count('stock_movements')
-    ).order_by('-movement_count')[:10]
+    recent_movements = movement_summary(date_from, date_to)
+    top_products = top_products_by_movements(date_from, date_to)
+    forecast_run_at, forecasts = top_forecast_demand()
 
     context = {
         'total_products': total_products,
         'low_stock_count': low_stock_count,
         'out_of_stock_count': out_of_stock_count,
         'recent_movements': recent_movements,
-        'top_products': top_products
+        'top_products': top_products,
+        'forecasts': forecasts,
+        'forecast_run_at': forecast_run_at,
+        'date_form': date_form,
+        'date_from': date_from,
+        'date_to': date_to
     }
     return render(request, 'inventory_reports.html', context)
 
 
+# ========================================================================
+# STREAMING EXPORTS
+# ========================================================================
+
+def _export_response(request, kind):
+    """Stream an export in ``?format=csv`` (default) or ``jsonl``, honouring the list filters"""
+    fmt = request.GET.get('format', 'csv')
+    params = request.GET.copy()
+    params.pop('format', None)
+    try:
+        chunks = stream_export(kind, fmt, params)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    filename = f"{kind}-{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@login_required
+def export_products(request):
+    """Export products matching the product list filters"""
+    return _export_response(request, 'products')
+
+@login_required
+def export_customers(request):
+    """Export customers matching the customer search filters"""
+    return _export_response(request, 'customers')
+
+@login_required
+def export_orders(request):
+    """Export orders matching the order list filters, with their lines"""
+    return _export_response(request, 'orders')
+
+
+# ========================================================================
+# BULK IMPORT
+# ========================================================================
+
+@login_required
+def import_products(request):
+    """Upsert products from an uploaded CSV price list (``file``); returns the import report"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST a CSV file as "file"'}, status=405)
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'No file uploaded'}, status=400)
+    result = run_product_import(upload.file)
+    # A file that breaks part way is still reported: earlier chunks are already written
+    return JsonResponse(result, status=400 if 'error' in result else 200)
+
+
+# ========================================================================
+# QUERY METRICS
+# ========================================================================
+
+@staff_member_required
+def query_metrics(request):
+    """Per-view query counts, database and wall time, and likely N+1s (staff only)"""
+    if request.method == 'POST' and request.POST.get('reset'):
+        METRICS.reset()
+        messages.success(request, "Query metrics reset.")
+        return redirect('query_metrics')
+    views = sorted(METRICS.snapshot().items(), key=lambda item: -item[1]['db_seconds'])
+    return render(request, 'query_metrics.html', {
+        'views': views,
+        'n_plus_one_threshold': n_plus_one_threshold(),
+    })
+
+def query_metrics_prometheus(request):
+    """Query metrics in the Prometheus text format, for staff or a QUERY_METRICS_TOKEN bearer"""
+    token = getattr(settings, 'QUERY_METRICS_TOKEN', None)
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if not authorized and token:
+        # Compared as bytes: compare_digest rejects str with non-ASCII characters
+        authorized = hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+    if not authorized:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# ========================================================================
+# CURSOR PAGINATION AND JSON HELPERS
+# ========================================================================
+
+def _keyset_page(paginator, request):
+    """Page for the request's ``cursor``; a stale or bad cursor restarts at page 1"""
+    try:
+        return paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return paginator.page()
+
+def _keyset_json(request, queryset, ordering, serialize, per_page):
+    """JSON response for one keyset page.
+
+    Accepts ``cursor``, ``limit`` (max 100) and ``count`` (``1`` for a capped
+    count, ``exact`` for a full COUNT(*)); counting is skipped by default.
+    """
+    try:
+        per_page = min(max(int(request.GET.get('limit', per_page)), 1), 100)
+    except ValueError:
+        pass
+    paginator = KeysetPaginator(queryset, ordering=ordering, per_page=per_page)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    data = {
+        'results': [serialize(obj) for obj in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+        'has_next': page.has_next,
+        'has_previous': page.has_previous,
+    }
+    if request.GET.get('count'):
+        count = paginator.count(exact=request.GET['count'] == 'exact')
+        data['count'] = count.value
+        data['count_is_exact'] = count.is_exact
+    return JsonResponse(data)
+
+def _customer_json(customer):
+    return {
+        'id': customer.id,
+        'first_name': customer.first_name,
+        'last_name': customer.last_name,
+        'email': customer.email,
+        'phone': customer.phone,
+        'address': customer.address,
+        'city': customer.city,
+        'state': customer.state,
+        'zipcode': customer.zipcode,
+        'customer_type': customer.customer_type,
+        'customer_type_display': customer.get_customer_type_display(),
+        'created_at': customer.created_at.isoformat(),
+    }
+
+def _product_json(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'sku': product.sku,
+        'category': product.category.name,
+        'supplier': product.supplier.name,
+        'selling_price': str(product.selling_price),
+        'stock_quantity': product.quantity_in_stock,
+        'is_low_stock': product.is_low_stock,
+    }
+
+def _order_json(order):
+    party = order.customer or order.supplier
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'order_type': order.order_type,
+        'status': order.status,
+        'party': str(party) if party else None,
+        'total_amount': str(order.total_amount),
+        'order_date': order.order_date.isoformat(),
+    }
+
+def _movement_json(movement):
+    return {
+        'id': movement.id,
+        'product_id': movement.product_id,
+        'product': movement.product.name,
+        'sku': movement.product.sku,
+        'movement_type': movement.movement_type,
+        'quantity': movement.quantity,
+        'reference': movement.reference,
+        'created_by': movement.created_by.username,
+        'created_at': movement.created_at.isoformat(),
+    }
+
+
 # ========================================================================
 # AJAX VIEWS FOR DYNAMIC FUNCTIONALITY - ADD THESE
 # ========================================================================
 
 @login_required
 def get_product_info(request):
-    """Get product information for AJAX requests"""
+    """Get product information for AJAX requests, served from the stock cache"""
     product_id = request.GET.get('product_id')
     if product_id:
-        try:
-            product = Product.objects.get(id=product_id)
-            data = {
-                'name': product.name,
-                'sku': product.sku,
-                'selling_price': str(product.selling_price),
-                'stock_quantity': product.quantity_in_stock,
-                'is_low_stock': product.is_low_stock
-            }
-            return JsonResponse(data)
-        except Product.DoesNotExist:
+        entry = get_stock(product_ids=[product_id]).get(int(product_id)) if product_id.isdigit() else None
+        if entry is None:
             return JsonResponse({'error': 'Product not found'}, status=404)
+        data = {
+            'name': entry['name'],
+            'sku': entry['sku'],
+            'selling_price': entry['selling_price'],
+            'stock_quantity': entry['on_hand'],
+            'reserved_quantity': entry['reserved'],
+            'available_quantity': entry['available'],
+            'is_low_stock': entry['is_low_stock']
+        }
+        return JsonResponse(data)
     return JsonResponse({'error': 'No product ID provided'}, status=400)
 
+STOCK_CHECK_MAX_ITEMS = 500
+
+
+def _stock_check_keys(request):
+    """Product ids and SKUs from repeated or comma separated params, or a JSON body"""
+    if request.method == 'POST':
+        payload = json.loads(request.body or b'{}')
+        if not isinstance(payload, dict):
+            raise ValueError('Request body must be a JSON object')
+        ids, skus = payload.get('ids') or [], payload.get('skus') or []
+        if not isinstance(ids, list) or not isinstance(skus, list):
+            raise ValueError('"ids" and "skus" must be lists')
+    else:
+        ids = [value for param in request.GET.getlist('ids') for value in param.split(',')]
+        skus = [value for param in request.GET.getlist('skus') for value in param.split(',')]
+    ids = sorted({int(str(pk).strip()) for pk in ids if str(pk).strip().isdigit()})
+    skus = sorted({str(sku).strip() for sku in skus if str(sku).strip()})
+    return ids, skus
+
+
+@query_budget(4)
+@login_required
+def check_stock(request):
+    """Name, price and stock for many products at once (AJAX)
+
+    Pass ``ids`` and/or ``skus`` as repeated or comma separated GET params,
+    or POST them as JSON lists. Responses carry an ETag built from the
+    products' ``updated_at``; a matching revalidation is answered with 304
+    after a single aggregate query. There is no Last-Modified: its whole
+    seconds would hide a second write within the same second.
+    """
+    if request.method not in ('GET', 'HEAD', 'POST'):
+        return JsonResponse({'error': 'Use GET or POST'}, status=405)
+    try:
+        ids, skus = _stock_check_keys(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    if not ids and not skus:
+        return JsonResponse({'error': 'Provide product ids or skus'}, status=400)
+    if len(ids) + len(skus) > STOCK_CHECK_MAX_ITEMS:
+        return JsonResponse({'error': f'At most {STOCK_CHECK_MAX_ITEMS} products per request'}, status=400)
+
+    products = Product.objects.filter(Q(id__in=ids) | Q(sku__in=skus))
+    state = products.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    last_modified = state['last_modified']
+    fingerprint = f"{ids}|{skus}|{state['count']}|{last_modified.isoformat() if last_modified else ''}"
+    etag = quote_etag(hashlib.md5(fingerprint.encode(), usedforsecurity=False).hexdigest())
+
+    if request.method != 'POST':
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+    rows = products.values_list(
+        'id', 'sku', 'name', 'selling_price', 'quantity_in_stock', 'minimum_stock_level', 'is_active'
+    ).order_by('id')
+    results, found_ids, found_skus = [], set(), set()
+    for pk, sku, name, selling_price, quantity, minimum, is_active in rows:
+        found_ids.add(pk)
+        found_skus.add(sku)
+        results.append({
+            'id': pk,
+            'sku': sku,
+            'name': name,
+            'selling_price': str(selling_price),
+            'stock_quantity': quantity,
+            'is_low_stock': quantity <= minimum,
+            'is_active': is_active,
+        })
+    response = JsonResponse({
+        'products': results,
+        'missing': {
+            'ids': [pk for pk in ids if pk not in found_ids],
+            'skus': [sku for sku in skus if sku not in found_skus],
+        },
+    })
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _parse_moment(value, end_of_day=False):
+    """Aware datetime from an ISO datetime or date (a date means its start, or its end).
+
+    Returns None for anything else, including well formed but impossible
+    values such as 2024-02-30.
+    """
+    try:
+        # A date first: parse_datetime also accepts one, as midnight, on Python 3.11+
+        day = parse_date(value)
+        if day is not None:
+            moment = datetime.combine(day, time.max if end_of_day else time.min)
+        else:
+            moment = parse_datetime(value)
+    except ValueError:
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+@login_required
+def get_stock_balance(request):
+    """Point-in-time stock balances from the nearest snapshot (AJAX)
+
+    ``at`` is an ISO datetime, or a date meaning the end of that day. Pass
+    ``product`` one or more times to limit the products, and
+    ``warehouses=1`` for the per-warehouse breakdown of the last snapshot.
+    """
+    at = _parse_moment(request.GET.get('at', ''), end_of_day=True)
+    if at is None:
+        return JsonResponse({'error': 'Provide "at" as an ISO date or datetime'}, status=400)
+
+    product_ids = [pk for pk in request.GET.getlist('product') if pk.isdigit()] or None
+    balances = balances_at(at, product_ids)
+    data = {
+        'at': at.isoformat(),
+        'balances': [{'product_id': pk, 'quantity': quantity} for pk, quantity in sorted(balances.items())],
+    }
+    if request.GET.get('warehouses'):
+        run, locations = warehouse_balances_at(at, product_ids)
+        data['warehouse_snapshot_at'] = run.isoformat() if run else None
+        data['warehouses'] = [
+            {'product_id': product_id, 'warehouse_id': warehouse_id, 'quantity': quantity}
+            for (product_id, warehouse_id), quantity in sorted(locations.items())
+        ]
+    return JsonResponse(data)
+
+@query_budget(4)
+@login_required
+def get_price_history(request):
+    """Downsampled cost and selling price series for products over a date range (AJAX)
+
+    Pass ``product`` ids and/or ``sku`` values (up to 500), ``start`` and
+    ``end`` as ISO dates or datetimes (default: the last 90 days) and
+    ``points``, the most entries to return per product.
+    """
+    end = _parse_moment(request.GET['end'], end_of_day=True) if request.GET.get('end') else timezone.now()
+    start = _parse_moment(request.GET['start']) if request.GET.get('start') else None
+    if end is not None and not request.GET.get('start'):
+        start = end - timedelta(days=90)
+    if start is None or end is None or start > end:
+        return JsonResponse({'error': 'Provide "start" and "end" as ISO dates or datetimes, start first'}, status=400)
+    try:
+        points = int(request.GET.get('points', DEFAULT_POINTS))
+    except ValueError:
+        return JsonResponse({'error': '"points" must be a number'}, status=400)
+
+    product_ids = {int(pk) for pk in request.GET.getlist('product') if pk.isdigit()}
+    skus = request.GET.getlist('sku')
+    if skus:
+        product_ids.update(Product.objects.filter(sku__in=skus).values_list('id', flat=True))
+    if not product_ids or len(product_ids) > 500:
+        return JsonResponse({'error': 'Provide between 1 and 500 products'}, status=400)
+
+    series = price_series(sorted(product_ids), start, end, points)
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'products': [
+            {
+                'product_id': product_id,
+                'downsampled': downsampled,
+                'points': [
+                    {key: value.isoformat() if key == 'at' else str(value) for key, value in entry.items()}
+                    for entry in entries
+                ],
+            }
+            for product_id, (entries, downsampled) in series.items()
+        ],
+    })
+
 @login_required
 def update_order_status(request, pk):
     """Update order status via AJAX"""
@@ -479,8 +920,9 @@ def update_order_status(request, pk):
         order = get_object_or_404(Order, id=pk)
         new_status = request.POST.get('status')
         if new_status in dict(Order.ORDER_STATUS):
-            order.status = new_status
-            order.save()
+            result = transition_orders([order.pk], new_status, request.user)
+            if result['rejected']:
+                return JsonResponse({'success': False, 'message': result['rejected'][0]['error']}, status=409)
             return JsonResponse({'success': True, 'message': f'Order status updated to {new_status}'})
     return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
 